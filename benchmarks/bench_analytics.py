@@ -0,0 +1,73 @@
+"""
+Analytics Benchmark
+
+Author: Jairus Martinez
+Date: 10/17/2026
+
+Times StreamAnalytics.compute over a synthetic multi-year history (default
+2000 activities of 20 to 120 minutes at 1 Hz, ~9M samples), and checks the
+best efforts of a few activities against a plain Python loop.
+
+CLI command: python benchmarks/bench_analytics.py [n_activities]
+"""
+import os
+import sys
+import time
+import numpy as np
+import pyarrow as pa
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parentdir)
+from src.transformers.analytics import StreamAnalytics
+
+def make_history(n_activities: int, seed: int = 0) -> pa.Table:
+    """Long-format streams table of n_activities synthetic activities"""
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(20 * 60, 120 * 60, n_activities)
+    activity_ids = np.repeat(np.arange(n_activities, dtype=np.int64), lengths)
+    starts = np.cumsum(lengths) - lengths
+    offset = np.arange(lengths.sum()) - np.repeat(starts, lengths)
+
+    speed = rng.uniform(2.0, 9.0, lengths.sum())
+    distance = np.cumsum(speed)
+    distance -= np.repeat(distance[starts] - speed[starts], lengths)
+    return pa.table({
+        'activity_id': activity_ids,
+        'offset': offset.astype(np.int32),
+        'time': offset.astype(np.int32),
+        'distance': distance,
+        'heartrate': rng.integers(100, 195, lengths.sum()).astype(np.int32),
+        'watts': rng.integers(0, 400, lengths.sum()).astype(np.int32),
+    })
+
+def best_duration_loop(time: np.ndarray, distance: np.ndarray, window: float) -> float:
+    """Reference: fastest time to cover `window` meters, one sample at a time"""
+    best = np.inf
+    j = 0
+    for i in range(len(distance)):
+        while j < len(distance) and distance[j] - distance[i] < window:
+            j += 1
+        if j == len(distance):
+            break
+        best = min(best, time[j] - time[i])
+    return best
+
+def main():
+    n_activities = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    history = make_history(n_activities)
+    analytics = StreamAnalytics()
+
+    start = time.perf_counter()
+    derived = analytics.compute(history)
+    elapsed = time.perf_counter() - start
+
+    df = history.to_pandas()
+    for activity_id in derived['id'][:3]:
+        samples = df[df['activity_id'] == activity_id]
+        expected = best_duration_loop(samples['time'].to_numpy(), samples['distance'].to_numpy(), 1000.0)
+        assert derived.loc[derived['id'] == activity_id, 'best_1k_s'].item() == expected
+
+    print(f'activities: {n_activities}, samples: {history.num_rows:,}')
+    print(f'StreamAnalytics.compute : {elapsed:.2f} s ({history.num_rows / elapsed:,.0f} samples/sec)')
+
+if __name__ == '__main__':
+    main()
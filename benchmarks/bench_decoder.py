@@ -0,0 +1,54 @@
+"""
+Decoder Benchmark
+
+Author: Jairus Martinez
+Date: 10/17/2026
+
+Compares rows/sec of the current extract path (json + pd.json_normalize +
+drop) against ActivityDecoder (orjson when installed + columnar decode).
+
+CLI command: python benchmarks/bench_decoder.py [n_rows]
+"""
+import json
+import os
+import sys
+import time
+import pandas as pd
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, parentdir)
+from src.commons.decoders import ActivityDecoder, orjson
+from tests.fixtures import make_summary_activity
+
+COLS_TO_DROP = ['map.summary_polyline', 'athlete.resource_state', 'resource_state', 'map.resource_state',
+                'start_latlng', 'end_latlng']
+
+def best_of(fn, repeat: int = 5) -> float:
+    """Best wall time of `repeat` runs"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    payload = json.dumps([make_summary_activity(i) for i in range(n_rows)]).encode('utf-8')
+    decoder = ActivityDecoder(COLS_TO_DROP)
+
+    def baseline():
+        return pd.json_normalize(json.loads(payload)).drop(columns=COLS_TO_DROP)
+
+    def fast():
+        return decoder.decode_bytes(payload)
+
+    pd.testing.assert_frame_equal(baseline(), fast())
+
+    baseline_s = best_of(baseline)
+    fast_s = best_of(fast)
+    print(f'rows: {n_rows}, orjson: {orjson is not None}')
+    print(f'json + json_normalize : {n_rows / baseline_s:>12,.0f} rows/sec')
+    print(f'ActivityDecoder       : {n_rows / fast_s:>12,.0f} rows/sec ({baseline_s / fast_s:.1f}x)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Backfill Module:
+
+Author: Jairus Martinez
+Date: 10/17/2026
+
+This module contains the chunked, concurrent loader used to upload the
+full activity history into a new BigQuery table.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from .checkpoints import CheckpointStore
+
+class BackfillLoader():
+    """
+    Loads a large history as date-ranged chunks with a bounded pool of
+    concurrent load jobs, checkpointing every finished chunk.
+
+    The first chunk creates the table (so partitioning/clustering are set
+    once), the rest are appended concurrently. A chunk is marked started
+    before its load job and done after it; on resume, done chunks are
+    skipped and chunks that were started but never marked done are loaded
+    with a MERGE on id, since their job may have landed before the crash.
+
+    Attributes:
+        - checkpoint_store: CheckpointStore keeping the finished chunks
+        - max_workers: number of concurrent load jobs [default = 4]
+        - chunk_by: chunk size, 'year', 'month' or 'day' [default = 'month']
+    Methods:
+        - chunks: splits a dataframe into date-ranged chunks
+        - in_progress: checks if a backfill of a table was interrupted
+        - load: loads a dataframe chunk by chunk
+    """
+    CHUNK_FORMATS = {'year': '%Y', 'month': '%Y-%m', 'day': '%Y-%m-%d'}
+
+    def __init__(self, checkpoint_store: CheckpointStore, max_workers: int = 4, chunk_by: str = 'month'):
+        """
+        Constructor for BackfillLoader class
+
+        :param checkpoint_store: CheckpointStore keeping the finished chunks
+        :param max_workers: number of concurrent load jobs [default = 4]
+        :param chunk_by: chunk size, 'year', 'month' or 'day' [default = 'month']
+        """
+        if chunk_by not in self.CHUNK_FORMATS:
+            raise ValueError(f'chunk_by must be one of {tuple(self.CHUNK_FORMATS)}, got {chunk_by!r}')
+        self.checkpoint_store = checkpoint_store
+        self.max_workers = max(1, int(max_workers))
+        self.chunk_by = chunk_by
+        self._logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def _name(table_id: str) -> str:
+        return f'backfill_load:{table_id}'
+
+    def chunks(self, df: pd.DataFrame, date_col_name: str) -> list:
+        """
+        Splits a dataframe into date-ranged chunks.
+
+        :param df: dataframe to split
+        :param date_col_name: name of the date col
+        :return chunks: list of (key, dataframe), oldest first
+        """
+        keys = pd.to_datetime(df[date_col_name]).dt.strftime(self.CHUNK_FORMATS[self.chunk_by]).fillna('undated')
+        return [(key, chunk) for key, chunk in df.groupby(keys.values, sort=True)]
+
+    def in_progress(self, table_id: str) -> bool:
+        """
+        Checks if a backfill of a table was started and not finished.
+
+        :param table_id: 'project.dataset.table'
+        """
+        return self.checkpoint_store.load(self._name(table_id)).get('status') == 'running'
+
+    def _mark(self, table_id: str, key: str, status: str):
+        """Adds a chunk key to the 'started' or 'done' list of the checkpoint"""
+        def add(state):
+            keys = state.setdefault(status, [])
+            if key not in keys:
+                keys.append(key)
+            return state
+        self.checkpoint_store.update(self._name(table_id), add)
+
+    def _load_chunk(self, bqc, table_id: str, key: str, df: pd.DataFrame, how: str, on_chunk=None) -> int:
+        """Loads one chunk ('upload', 'append' or 'merge') and checkpoints it"""
+        self._mark(table_id, key, 'started')
+        if how == 'upload':
+            bqc.upload_table(table_id, df)
+        elif how == 'merge':
+            bqc.merge_into_table(table_id, df)
+        else:
+            bqc.append_to_table(table_id, df)
+        self._mark(table_id, key, 'done')
+        if on_chunk is not None:
+            on_chunk(df)
+        self._logger.info('Backfill chunk %s loaded (%s rows, %s).', key, len(df), how)
+        return len(df)
+
+    def load(self, bqc, table_id: str, df: pd.DataFrame, date_col_name: str, on_chunk=None) -> int:
+        """
+        Loads a dataframe chunk by chunk, resuming an interrupted backfill.
+
+        :param bqc: BigQueryConnector
+        :param table_id: 'project.dataset.table'
+        :param df: dataframe to load
+        :param date_col_name: name of the date col to chunk by
+        :param on_chunk: function called with every loaded chunk [default = None]
+        :return rows: number of rows loaded by this call
+        """
+        name = self._name(table_id)
+        _, dataset_name, table_name = table_id.split('.')
+        table_exists = bqc.table_exists(dataset_name, table_name)
+
+        state = self.checkpoint_store.load(name)
+        if not table_exists and state:
+            self._logger.warning('Table %s not found, discarding its backfill checkpoint.', table_id)
+            state = {}
+        done = set(state.get('done', []))
+        started = set(state.get('started', [])) - done
+
+        pending = [(key, chunk) for key, chunk in self.chunks(df, date_col_name) if key not in done]
+        self.checkpoint_store.save(name, {**state, 'status': 'running', 'chunk_by': self.chunk_by,
+                                          'done': sorted(done), 'started': sorted(started | done)})
+        if done:
+            self._logger.info('Resuming backfill of %s: %s chunks done, %s to go.', table_id, len(done), len(pending))
+
+        loaded = 0
+        if pending and not table_exists:
+            key, chunk = pending.pop(0)
+            loaded += self._load_chunk(bqc, table_id, key, chunk, 'upload', on_chunk)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                executor.submit(self._load_chunk, bqc, table_id, key, chunk,
+                                'merge' if key in started else 'append', on_chunk)
+                for key, chunk in pending
+            ]
+        # every chunk ran; finished ones are checkpointed even if another failed
+        errors = [future.exception() for future in futures if future.exception() is not None]
+        if errors:
+            self._logger.error('%s of %s backfill chunks failed, rerun to resume.', len(errors), len(futures))
+            raise errors[0]
+        loaded += sum(future.result() for future in futures)
+
+        self.checkpoint_store.update(name, lambda state: {**state, 'status': 'done'})
+        self._logger.info('Backfill of %s complete.', table_id)
+        return loaded
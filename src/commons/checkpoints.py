@@ -0,0 +1,103 @@
+"""
+Checkpoints Module:
+
+Author: Jairus Martinez
+Date: 10/17/2026
+
+This module contains the JSON checkpoint store used to resume long jobs
+(backfills) after an interruption.
+"""
+import json
+import logging
+import os
+import threading
+
+class CheckpointStore():
+    """
+    Keeps the progress of named jobs in one JSON file.
+
+    Every save rewrites the file atomically (temp file, fsync, rename), so
+    a crash leaves either the previous or the new checkpoint, never a
+    partial one. Saves from several threads are serialized.
+
+    Attributes:
+        - path: path to the JSON file
+    Methods:
+        - load: saved state of a job
+        - save: saves the state of a job
+        - update: applies a function to the state of a job and saves the result
+        - clear: drops the state of a job
+    """
+    def __init__(self, path: str):
+        """
+        Constructor for CheckpointStore class
+
+        :param path: path to the JSON file
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        self._logger = logging.getLogger(__name__)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _read(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write(self, checkpoints: dict):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoints, f, indent=2, sort_keys=True, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def load(self, name: str) -> dict:
+        """
+        Saved state of a job.
+
+        :param name: job name, e.g. 'backfill_load:project.dataset.table'
+        :return state: dict, empty if nothing is saved
+        """
+        with self._lock:
+            return self._read().get(name, {})
+
+    def save(self, name: str, state: dict):
+        """
+        Saves the state of a job.
+
+        :param name: job name
+        :param state: JSON-serializable dict
+        """
+        with self._lock:
+            checkpoints = self._read()
+            checkpoints[name] = state
+            self._write(checkpoints)
+
+    def update(self, name: str, func) -> dict:
+        """
+        Applies a function to the state of a job and saves the result, as
+        one step (safe to call from several threads).
+
+        :param name: job name
+        :param func: function taking the current state dict and returning the new one
+        :return state: the new state
+        """
+        with self._lock:
+            state = func(self.load(name))
+            self.save(name, state)
+            return state
+
+    def clear(self, name: str):
+        """
+        Drops the state of a job.
+
+        :param name: job name
+        """
+        with self._lock:
+            checkpoints = self._read()
+            if checkpoints.pop(name, None) is not None:
+                self._write(checkpoints)
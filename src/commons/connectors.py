@@ -10,9 +10,25 @@ import pandas as pd
 import logging
 from google.cloud import bigquery
 from google.cloud.exceptions import NotFound
+from google.oauth2 import service_account
 import pyarrow
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+import uuid
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from .rate_limiter import StravaRateLimiter
+from .token_cache import TokenCache
+from .response_cache import ResponseCache
+from .decoders import loads
+from .schemas import SchemaRegistry
+from .metadata_cache import TableMetadataCache
+from .query_cache import QueryResultCache
+
+try:
+    from google.cloud import bigquery_storage
+except ImportError:  # optional, reads stream REST pages instead
+    bigquery_storage = None
 
 class StravaAPIConnector():
     """
@@ -22,59 +38,242 @@ class StravaAPIConnector():
         - strava_auth_url: strava authorization url
         - strava_activities_url: strava athlete activities url
         - strava_payload: dict containing client_id, client_secret, refresh_token, grant_type
+        - session: pooled requests.Session shared by all API calls (keep-alive, gzip, retries)
+        - rate_limiter: optional StravaRateLimiter that schedules API calls within the rate limits
+        - token_cache: optional TokenCache that reuses access tokens until shortly before expiry
+        - response_cache: optional ResponseCache that keeps the raw pages returned by get_dataset (write-only, read by --replay)
+        - strava_api_url: base url of the Strava API (for per-activity endpoints)
 
     Methods:
         - get_header: get the header needed for API authorization to retrieve data
         - get_dataset: get dataset from iterated page
+        - get_activity: get the detailed representation of one activity
+        - get_streams: get the raw sample streams (time, latlng, heartrate, ...) of one activity
+        - rate_budget: current Strava rate budget
         - newest_data: filters for the freshest data
         - append_to_table: append data to an existing table in BigQuery
         - table_exists: checks to see if a table exists
         - query_table: queries table as a dataframe
     """
-    def __init__(self, strava_auth_url: str, strava_activities_url: str, strava_payload: dict):
+    RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+    TOKEN_REFRESH_MARGIN = 300
+    STRAVA_API_URL = 'https://www.strava.com/api/v3'
+    STREAM_KEYS = ('time', 'distance', 'latlng', 'altitude', 'velocity_smooth', 'heartrate',
+                   'cadence', 'watts', 'temp', 'moving', 'grade_smooth')
+
+    def __init__(self, strava_auth_url: str, strava_activities_url: str, strava_payload: dict,
+                 pool_size: int = 10, max_retries: int = 3, backoff_factor: float = 0.5,
+                 rate_limiter: StravaRateLimiter = None, token_cache: TokenCache = None,
+                 response_cache: ResponseCache = None, strava_api_url: str = None):
         """
         Constructor for StravaAPIConnector class
 
         :param strava_auth_url: strava authorization url
         :param strava_activities_url: strava athlete activities url
         :param strava_payload: dict containing client_id, client_secret, refresh_token, grant_type
+        :param pool_size: max pooled connections, should match the largest concurrency of the page, detail and
+            stream workers sharing the session [default = 10]
+        :param max_retries: retries on connection errors and 429/5xx responses [default = 3]
+        :param backoff_factor: base of the exponential backoff between retries in seconds [default = 0.5]
+        :param rate_limiter: optional StravaRateLimiter shared by all API calls [default = None]
+        :param token_cache: optional TokenCache shared with other workers [default = None]
+        :param response_cache: optional ResponseCache the raw pages are written to [default = None]
+        :param strava_api_url: base url of the Strava API [default = STRAVA_API_URL]
         """
         self.strava_auth_url = strava_auth_url
         self.strava_activities_url = strava_activities_url
+        self.strava_api_url = (strava_api_url or self.STRAVA_API_URL).rstrip('/')
         self.strava_payload = strava_payload
-        
+        self.session = self._build_session(pool_size, max_retries, backoff_factor)
+        self.rate_limiter = rate_limiter
+        self.token_cache = token_cache
+        self.response_cache = response_cache
+        self._token = None
+        self._logger = logging.getLogger(__name__)
+
+    def _build_session(self, pool_size: int, max_retries: int, backoff_factor: float) -> requests.Session:
+        """
+        Builds a keep-alive session with a bounded connection pool and
+        exponential backoff (with jitter) on transient failures.
+
+        :param pool_size: max pooled connections per host
+        :param max_retries: retries on connection errors and 429/5xx responses
+        :param backoff_factor: base of the exponential backoff between retries in seconds
+        :return session: configured requests.Session
+        """
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            backoff_jitter=backoff_factor,
+            status_forcelist=self.RETRY_STATUS_CODES,
+            # the token exchange is a POST, retry it as well
+            allowed_methods=None,
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max(1, pool_size),
+                              max_retries=retry, pool_block=True)
+
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({'Accept-Encoding': 'gzip, deflate', 'Connection': 'keep-alive'})
+        return session
+
+    def _token_is_fresh(self, token: dict) -> bool:
+        """
+        Checks if an access token is valid for at least TOKEN_REFRESH_MARGIN more seconds.
+
+        :param token: dict with access_token and expires_at
+        """
+        if not token or 'expires_at' not in token:
+            return False
+        return token['expires_at'] - self.TOKEN_REFRESH_MARGIN > datetime.now().timestamp()
+
+    def _exchange_token(self, refresh_token: str = None) -> dict:
+        """
+        Exchanges a refresh token for a new access token.
+
+        :param refresh_token: rotated refresh token, defaults to the one in strava_payload
+        :return token: dict with access_token, expires_at and refresh_token
+        """
+        payload = self.strava_payload
+        if refresh_token is not None:
+            payload = {**self.strava_payload, 'refresh_token': refresh_token}
+
+        # send request 
+        res = self.session.post(self.strava_auth_url,data=payload,
+                                verify=False, timeout=(10,10))
+
+        if res.status_code != 200:
+            self._logger.error('Token request failed with status %s', res.status_code)
+            raise requests.HTTPError(f'Strava token request failed with status {res.status_code}',
+                                     response=res)
+        return res.json()
+
     def get_header(self) -> dict:
         """
         Method to get the header needed for authorization to retrieve data.
 
+        The access token is reused until shortly before it expires, from memory
+        or from the token cache when one is set.
+
         :return header: dict containing authorization and access_token 
         :rtype dict: 
+        :raises requests.HTTPError: if the token request is not successful
         """ 
-        # send request 
-        res = requests.post(self.strava_auth_url,data=self.strava_payload,
-                            verify=False, timeout=(10,10))
-        
-        if res.status_code == 200:
-            access_token = res.json()['access_token']
-            header = {'Authorization': 'Bearer ' + access_token}
-            return header
-    
-    def get_dataset(self, actv_per_page: int, request_page_number: int, header: dict) -> list:
+        if self._token_is_fresh(self._token):
+            pass
+        elif self.token_cache is not None:
+            client_id = self.strava_payload.get('client_id')
+            token = self.token_cache.get(client_id)
+            if not self.token_cache.is_fresh(token):
+                token = self.token_cache.refresh(client_id, self._exchange_token)
+            self._token = token
+        else:
+            self._token = self._exchange_token()
+
+        header = {'Authorization': 'Bearer ' + self._token['access_token']}
+        return header
+
+    def _get(self, url: str, header: dict, params: dict = None) -> requests.Response:
+        """
+        Sends a GET request to the Strava API, waiting for rate budget first
+        and syncing the budget from the response headers.
+
+        :param url: endpoint url
+        :param header: dict containing authorization and access_token
+        :param params: query params
+        :return res: requests.Response
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+
+        res = self.session.get(url, headers=header, params=params, timeout=(10,10))
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.update(res.headers)
+        return res
+
+    def rate_budget(self) -> dict:
+        """
+        Returns the current Strava rate budget (None without a rate limiter).
+
+        :return budget: dict with limits, usage, remaining requests and reset times
+        """
+        if self.rate_limiter is None:
+            return None
+        return self.rate_limiter.budget()
+
+    def get_dataset(self, actv_per_page: int, request_page_number: int, header: dict,
+                    after: int = None, before: int = None) -> list:
         """
         Method to get dataset from iterated page
 
         :param actv_per_page: the number of activities per page to extract from
         :param request_page_numer: iterated page number to extract from
         :param header: dict containing authorization and access_token
+        :param after: only return activities that started after this epoch timestamp [default = None]
+        :param before: only return activities that started before this epoch timestamp [default = None]
         :return dataset: list containing activities as dicts
         """
         # set the params to be able to extract from requests.get
         param = {'per_page': actv_per_page, 'page':request_page_number}
-        dataset = (
-            requests.get(self.strava_activities_url, headers=header,
-                        params=param, timeout=(10,10)).json()
-            )
+        if after is not None:
+            param['after'] = after
+        if before is not None:
+            param['before'] = before
+        dataset = loads(self._get(self.strava_activities_url, header, param).content)
+
+        # live runs only write the cache, since the same params return new activities
+        # on every run; pages are read back by --replay. Error responses are dicts.
+        if self.response_cache is not None and isinstance(dataset, list):
+            self.response_cache.put(self.strava_activities_url, param, self.strava_payload.get('client_id'), dataset)
         return dataset
+
+    def get_activity(self, activity_id: int, header: dict, include_all_efforts: bool = False) -> dict:
+        """
+        Method to get the detailed representation of one activity
+        (calories, splits, laps, segment efforts, device info, ...).
+
+        :param activity_id: id of the activity
+        :param header: dict containing authorization and access_token
+        :param include_all_efforts: include all segment efforts [default = False]
+        :return activity: DetailedActivity dict, None if the activity is gone or private (404)
+        :raises requests.HTTPError: on any other unsuccessful response
+        """
+        url = f'{self.strava_api_url}/activities/{int(activity_id)}'
+        res = self._get(url, header, {'include_all_efforts': str(include_all_efforts).lower()})
+
+        if res.status_code == 404:
+            self._logger.warning('Activity %s not found, skipping its detail.', activity_id)
+            return None
+        if res.status_code != 200:
+            raise requests.HTTPError(f'Strava activity request failed with status {res.status_code}',
+                                     response=res)
+        return loads(res.content)
+
+    def get_streams(self, activity_id: int, header: dict, keys=STREAM_KEYS) -> dict:
+        """
+        Method to get the sample streams of one activity, keyed by type.
+
+        :param activity_id: id of the activity
+        :param header: dict containing authorization and access_token
+        :param keys: stream types to request [default = STREAM_KEYS]
+        :return streams: dict of type -> {'data': [...], 'series_type', 'original_size', 'resolution'},
+            None if the activity is gone or private (404)
+        :raises requests.HTTPError: on any other unsuccessful response
+        """
+        url = f'{self.strava_api_url}/activities/{int(activity_id)}/streams'
+        res = self._get(url, header, {'keys': ','.join(keys), 'key_by_type': 'true'})
+
+        if res.status_code == 404:
+            self._logger.warning('Streams of activity %s not found, skipping them.', activity_id)
+            return None
+        if res.status_code != 200:
+            raise requests.HTTPError(f'Strava streams request failed with status {res.status_code}',
+                                     response=res)
+        return loads(res.content)
 class BigQueryConnector():
     """
     Class for interacting with BigQuery data wharehouse
@@ -83,23 +282,79 @@ class BigQueryConnector():
         - service_account_json: Google service account credentials/meta
         - location: location of cloud dataset [default = 'US']
         - timeout: timeout param for dataset_ref
+        - load_format: 'dataframe' (load_table_from_dataframe) or 'parquet' (Parquet buffer with a pinned schema)
+        - schema_registry: SchemaRegistry pinning the schema of each table for the Parquet load path
+        - parquet_compression: Parquet codec of the load payloads
+        - partition_field: date col new tables are time-partitioned on (None = unpartitioned)
+        - partition_type: partition granularity, 'DAY', 'MONTH' or 'YEAR'
+        - cluster_fields: cols new tables are clustered by
+        - metadata_cache: TableMetadataCache of existence/schema/partitioning/modified time (shareable between connectors)
+        - query_cache: optional QueryResultCache serving query_table results while the table is unchanged
     Methods:
         - create_dataset: create a new dataset in BigQuery
         - upload_table: upload a table to dataset in project
-        - newest_data: 
+        - newest_data: filters for the freshest data
+        - append_to_table: append data to an existing table in BigQuery
+        - table_exists: checks to see if a table exists
+        - table_metadata: cached existence, schema, partitioning and modified time of a table
+        - invalidate: drops the cached metadata of a table
+        - query_table: queries table as a dataframe
+        - query_arrow: queries table as an Arrow table
+        - query_batches: streams the result of a query as Arrow record batches or dataframe chunks
+        - read_table: streams (selected cols of) a table without a query job
+        - latest_timestamp: newest value of a date col in a table
+        - merge_into_table: upserts data into a table through a staging table and one MERGE
+        - partition_filter: WHERE condition on a date col that prunes partitions
+        - load_parquet: appends a Parquet file to a table as one load job
+        - delete_rows: deletes the rows whose key is in a list of values
+        - add_columns: adds the cols of a dataframe that a table does not have yet
+        - freshness_query: partition-pruned query of the latest ids to compare for freshness
     
     """
-    def __init__(self, service_account_json: dict, location: str = 'US', timeout: int = 30):
+    LOAD_FORMATS = ('dataframe', 'parquet')
+    # partition_id formats of INFORMATION_SCHEMA.PARTITIONS
+    PARTITION_ID_FORMATS = {'DAY': '%Y%m%d', 'MONTH': '%Y%m', 'YEAR': '%Y'}
+    # staging tables of a crashed merge are dropped by BigQuery after this
+    STAGING_TTL = timedelta(days=1)
+
+    def __init__(self, service_account_json: dict, location: str = 'US', timeout: int = 30,
+                 load_format: str = 'dataframe', schema_registry: SchemaRegistry = None,
+                 parquet_compression: str = 'snappy', partition_field: str = None, partition_type: str = 'DAY',
+                 cluster_fields: tuple = ('sport_type', 'id'), metadata_cache: TableMetadataCache = None,
+                 query_cache: QueryResultCache = None):
         """
         Constructor for BigQueryConnector class
 
         :param service_account_json: Google service account credentials/meta
         :param location: location of cloud dataset [default = 'US']
         :param timeout: timeout param for dataset_ref   
+        :param load_format: 'dataframe' or 'parquet' [default = 'dataframe']
+        :param schema_registry: SchemaRegistry for the Parquet load path [default = None, in-memory registry]
+        :param parquet_compression: Parquet codec of the load payloads [default = 'snappy']
+        :param partition_field: date col new tables are time-partitioned on [default = None, unpartitioned]
+        :param partition_type: 'DAY', 'MONTH' or 'YEAR' [default = 'DAY']
+        :param cluster_fields: cols new partitioned tables are clustered by [default = ('sport_type', 'id')]
+        :param metadata_cache: TableMetadataCache to use, share one between connectors [default = None, own cache]
+        :param query_cache: QueryResultCache for query_table results [default = None, no caching]
         """
+        if load_format not in self.LOAD_FORMATS:
+            raise ValueError(f'load_format must be one of {self.LOAD_FORMATS}, got {load_format!r}')
+        if partition_type not in self.PARTITION_ID_FORMATS:
+            raise ValueError(f'partition_type must be one of {tuple(self.PARTITION_ID_FORMATS)}, got {partition_type!r}')
         self.service_account_json = service_account_json
         self.location = location
         self.timeout = timeout
+        self.load_format = load_format
+        self.schema_registry = schema_registry if schema_registry is not None else SchemaRegistry()
+        self.parquet_compression = parquet_compression
+        self.partition_field = partition_field
+        self.partition_type = partition_type
+        self.cluster_fields = list(cluster_fields or [])
+        self._read_client = None
+        self._unpartitioned_tables = set()
+        self.metadata_cache = metadata_cache if metadata_cache is not None else TableMetadataCache()
+        self.query_cache = query_cache
+        self._logger = logging.getLogger(__name__)
         # initialize GCS client
         self.client = bigquery.Client.from_service_account_info(service_account_json)
 
@@ -126,22 +381,106 @@ class BigQueryConnector():
         :param table_id: 'project.dataset.table' referring to table within dataset within project
         :param df: pd.DataFrame containing dataframe to upload into table
         """
-        # create table for upload
-        job = self.client.load_table_from_dataframe(df, table_id)
+        # create table for upload (partitioned/clustered when partition_field is set)
+        job = self._load_dataframe(table_id, df, create_partitioned=True)
         # upload table to dataset
-        job.result()
+        try:
+            job.result()
+        finally:
+            self.invalidate(table_id)
 
         return True
+
+    def _load_dataframe(self, table_id: str, df: pd.DataFrame, write_disposition: str = None,
+                        schema_table_id: str = None, create_partitioned: bool = False):
+        """
+        Starts a load job for a dataframe in the configured load_format.
+
+        With 'parquet' the dataframe is serialized to a compressed Parquet
+        buffer with the table's pinned schema (synced with the existing
+        table's schema) and loaded with an explicit schema, so no type
+        inference happens on either side.
+
+        :param table_id: 'project.dataset.table' to load into
+        :param df: pd.DataFrame to load
+        :param write_disposition: e.g. 'WRITE_APPEND' [default = None, BigQuery default]
+        :param schema_table_id: table whose pinned schema is used [default = None, table_id]
+        :param create_partitioned: partition/cluster the table if the load creates it [default = False]
+        :return job: bigquery.LoadJob
+        """
+        job_config = bigquery.LoadJobConfig()
+        if write_disposition:
+            job_config.write_disposition = write_disposition
+        if write_disposition == 'WRITE_APPEND':
+            # cols add_columns could not type (all null) are added by the append itself
+            job_config.schema_update_options = [bigquery.SchemaUpdateOption.ALLOW_FIELD_ADDITION]
+        if create_partitioned and self.partition_field:
+            job_config.time_partitioning = bigquery.TimePartitioning(type_=self.partition_type, field=self.partition_field)
+            columns = set(df.columns.str.replace('.', '_'))
+            clustering_fields = [col for col in self.cluster_fields if col in columns]
+            if clustering_fields:
+                job_config.clustering_fields = clustering_fields
+
+        if self.load_format == 'dataframe':
+            return self.client.load_table_from_dataframe(df, table_id, job_config=job_config)
+
+        schema_table_id = schema_table_id or table_id
+        table_schema = self.table_metadata(schema_table_id)['schema']
+        fields = self.schema_registry.schema_for(schema_table_id, df, table_schema)
+        self._widen_columns(schema_table_id, fields, table_schema)
+        fields = [field for field in fields if field['name'] in set(df.columns.str.replace('.', '_'))]
+        buffer = self.schema_registry.to_parquet(df, fields, compression=self.parquet_compression)
+
+        job_config.source_format = bigquery.SourceFormat.PARQUET
+        job_config.schema = SchemaRegistry.to_bigquery(fields)
+        parquet_options = bigquery.ParquetOptions()
+        parquet_options.enable_list_inference = True
+        job_config.parquet_options = parquet_options
+        self._logger.debug('Loading %s rows (%s bytes of Parquet) into %s.', len(df), buffer.getbuffer().nbytes, table_id)
+        return self.client.load_table_from_file(buffer, table_id, job_config=job_config)
     
-    def newest_data(self, df: pd.DataFrame, df_to_compare: pd.DataFrame, date_col_name: str):
+    def _widen_columns(self, table_id: str, fields: list, table_schema: list):
+        """
+        Widens INTEGER cols of an existing table that the pinned schema
+        widened to FLOAT, so fractional values load without truncation.
+
+        :param table_id: 'project.dataset.table' referring to the existing table
+        :param fields: pinned fields about to be loaded
+        :param table_schema: list of bigquery.SchemaField of the table
+        """
+        table_types = {field['name']: field['type'] for field in SchemaRegistry.from_bigquery(table_schema)}
+        widened = [field['name'] for field in fields
+                   if field['type'] == 'FLOAT' and table_types.get(field['name']) == 'INTEGER']
+        if not widened:
+            return
+        alter = ', '.join(f'ALTER COLUMN `{col}` SET DATA TYPE FLOAT64' for col in widened)
+        try:
+            self.client.query(f"ALTER TABLE `{table_id}` {alter}").result()
+        finally:
+            self.invalidate(table_id)
+        self._logger.info('Widened cols %s of %s to FLOAT.', widened, table_id)
+
+    def newest_data(self, df: pd.DataFrame, df_to_compare: pd.DataFrame = None, date_col_name: str = None,
+                    known_ids: set = None):
         """
         This method filters for the freshest data.
 
+        With known_ids (from the local StateStore) the filter is an exact
+        membership check and no comparison data is needed from BigQuery.
+
         :param df: dataframe containing the extracted data
         :param df_to_copmare: dataframe to compare to (from BigQuery)
         :param date_col_name: name of the date col to asses freshness by 
+        :param known_ids: set of activity ids already in the table [default = None]
         :returns: filtered dataframe
         """
+        if known_ids is not None:
+            return df[~df['id'].isin(known_ids)]
+        if df_to_compare.empty:
+            # nothing in the pruned window (e.g. the newest partition is older than it)
+            self._logger.info('No rows to compare for freshness, filtering on id only.')
+            return df[~df['id'].isin(df_to_compare['id'])]
+
         # grab the latest date (latest date - 1 day)
         latest_date = pd.to_datetime(df_to_compare[date_col_name]).sort_index().dt.date[0] - timedelta(days=7)
 
@@ -159,40 +498,430 @@ class BigQueryConnector():
         # make sure no '.' in col names
         df.columns = df.columns.str.replace('.', '_')
         
-        # Set job configuration to append data to the existing table
-        job_config = bigquery.LoadJobConfig(write_disposition='WRITE_APPEND')
-
         # Create a job to append data to the existing table
-        job = self.client.load_table_from_dataframe(df, table_id, job_config=job_config)
+        job = self._load_dataframe(table_id, df, write_disposition='WRITE_APPEND')
 
         # Wait for the job to complete
-        job.result()
+        try:
+            job.result()
+        finally:
+            self.invalidate(table_id)
 
         return True
     
     def table_exists(self, dataset_name: str, table_name: str):
         """
-        Checks to see if a table exists.
+        Checks to see if a table exists (cached, see table_metadata).
 
         :param dataset_name: name of dataset
         :param table_name: name of table
         """
-        dataset = self.client.dataset(dataset_name)
-        table_ref = dataset.table(table_name)
-        try:
-            self.client.get_table(table_ref)
-            return True
-        except NotFound:
-            return False
+        return self.table_metadata(f'{self.client.project}.{dataset_name}.{table_name}')['exists']
+
+    def table_metadata(self, table_id: str) -> dict:
+        """
+        Existence, schema, partitioning and last modified time of a table,
+        served from the metadata cache (one get_table call per TTL).
+
+        :param table_id: 'project.dataset.table' referring to table within dataset within project
+        :return metadata: dict with exists, schema, time_partitioning, clustering_fields, modified and num_rows
+        """
+        def load():
+            try:
+                table = self.client.get_table(table_id)
+            except NotFound:
+                return {'exists': False, 'schema': [], 'time_partitioning': None, 'clustering_fields': None,
+                        'modified': None, 'num_rows': None}
+            return {'exists': True, 'schema': list(table.schema), 'time_partitioning': table.time_partitioning,
+                    'clustering_fields': table.clustering_fields, 'modified': table.modified,
+                    'num_rows': table.num_rows}
+        return self.metadata_cache.get(table_id, load)
+
+    def invalidate(self, table_id: str):
+        """
+        Drops the cached metadata of a table (called after our own writes).
+
+        :param table_id: 'project.dataset.table' referring to table within dataset within project
+        """
+        self.metadata_cache.invalidate(table_id)
+        # table_exists keys by the client's default project
+        _, dataset_name, table_name = table_id.split('.')
+        self.metadata_cache.invalidate(f'{self.client.project}.{dataset_name}.{table_name}')
         
-    def query_table(self, sql_query: str) -> pd.DataFrame:
+    def query_table(self, sql_query: str, table_id: str = None) -> pd.DataFrame:
         """
         Queries table as a dataframe.
 
+        With a query_cache and the table_id the query reads, the result is
+        cached keyed by the sql text and the table's last modified time, so
+        repeating a query on an unchanged table submits no job. The modified
+        time is read fresh (not from the metadata cache), so writes by other
+        processes miss the cache too.
+
         :param sql_query: sql query to grab table data
+        :param table_id: 'project.dataset.table' the query reads, enables the query cache [default = None]
         :return df: table as dataframe
         """
+        modified = None
+        if self.query_cache is not None and table_id is not None:
+            try:
+                # one metadata call, no job; table_metadata may be up to metadata_ttl_seconds old
+                modified = self.client.get_table(table_id).modified
+            except NotFound:
+                modified = None
+            if modified is not None:
+                df = self.query_cache.get(sql_query, modified)
+                if df is not None:
+                    self._logger.info('Query result served from cache (%s unchanged since %s).', table_id, modified)
+                    return df
+
         # run the query
         query_job = self.client.query(sql_query)
+        df = query_job.to_dataframe()
+
+        if modified is not None:
+            self.query_cache.put(sql_query, modified, df)
+        return df
+
+    def _bqstorage_client(self):
+        """BigQuery Storage read client (shared), None if google-cloud-bigquery-storage is not installed"""
+        if bigquery_storage is None:
+            return None
+        if self._read_client is None:
+            # same service account as the BigQuery client
+            credentials = service_account.Credentials.from_service_account_info(self.service_account_json)
+            self._read_client = bigquery_storage.BigQueryReadClient(credentials=credentials)
+        return self._read_client
+
+    def _iter_rows(self, rows, as_dataframe: bool):
+        """Streams a RowIterator as Arrow record batches or dataframe chunks"""
+        for batch in rows.to_arrow_iterable(bqstorage_client=self._bqstorage_client()):
+            if batch.num_rows == 0:
+                continue
+            yield batch.to_pandas() if as_dataframe else batch
+
+    def query_arrow(self, sql_query: str, max_results: int = None) -> pyarrow.Table:
+        """
+        Queries table as an Arrow table (no pandas conversion).
+
+        :param sql_query: sql query to grab table data
+        :param max_results: max number of rows to read [default = None, all]
+        :return table: query result as pyarrow.Table
+        """
+        rows = self.client.query(sql_query).result(max_results=max_results)
+        return rows.to_arrow(bqstorage_client=self._bqstorage_client(), create_bqstorage_client=False)
+
+    def query_batches(self, sql_query: str, max_results: int = None, page_size: int = None, as_dataframe: bool = True):
+        """
+        Streams the result of a query batch by batch, so memory is bounded
+        by the batch size instead of the result size. Uses the BigQuery
+        Storage read API when installed, else REST pages.
+
+        :param sql_query: sql query to grab table data
+        :param max_results: max number of rows to read [default = None, all]
+        :param page_size: rows per REST page [default = None, BigQuery default]
+        :param as_dataframe: yield pd.DataFrame chunks instead of pyarrow.RecordBatch [default = True]
+        :return: iterator of pd.DataFrame or pyarrow.RecordBatch
+        """
+        rows = self.client.query(sql_query).result(max_results=max_results, page_size=page_size)
+        yield from self._iter_rows(rows, as_dataframe)
+
+    def read_table(self, table_id: str, columns: list = None, max_results: int = None, page_size: int = None,
+                   as_dataframe: bool = True):
+        """
+        Streams a table batch by batch without a query job (no bytes are
+        billed as scanned), reading only the selected cols.
+
+        :param table_id: 'project.dataset.table' referring to table within dataset within project
+        :param columns: col names to read [default = None, all cols]
+        :param max_results: max number of rows to read [default = None, all]
+        :param page_size: rows per REST page [default = None, BigQuery default]
+        :param as_dataframe: yield pd.DataFrame chunks instead of pyarrow.RecordBatch [default = True]
+        :return: iterator of pd.DataFrame or pyarrow.RecordBatch
+        """
+        selected_fields = None
+        if columns is not None:
+            schema = {field.name: field for field in self.table_metadata(table_id)['schema']}
+            missing = [col for col in columns if col not in schema]
+            if missing:
+                raise ValueError(f'Cols not in {table_id}: {missing}')
+            selected_fields = [schema[col] for col in columns]
+
+        rows = self.client.list_rows(table_id, selected_fields=selected_fields, max_results=max_results,
+                                     page_size=page_size)
+        yield from self._iter_rows(rows, as_dataframe)
+
+    def latest_timestamp(self, table_id: str, date_col_name: str):
+        """
+        Gets the newest value of a date col in a table (the ingestion watermark).
+
+        On a table partitioned on date_col_name, the newest partition is read
+        from INFORMATION_SCHEMA.PARTITIONS (metadata only) and MAX() only
+        scans that partition, so the cost does not grow with history.
+
+        :param table_id: 'project.dataset.table' referring to table within dataset within project
+        :param date_col_name: name of the date col
+        :return latest: newest date as a pd.Timestamp, None if the table is empty
+        """
+        where = ''
+        if date_col_name == self.partition_field and self._is_partitioned(table_id):
+            newest_partition = self._newest_partition(table_id)
+            if newest_partition is not None:
+                where = f" WHERE {self.partition_filter(table_id, date_col_name, newest_partition)}"
+
+        sql_query = f"SELECT MAX({date_col_name}) AS latest FROM `{table_id}`{where}"
+        df = self.query_table(sql_query, table_id=table_id)
+
+        if df.empty or pd.isna(df['latest'].iloc[0]):
+            return None
+        return pd.Timestamp(df['latest'].iloc[0])
+
+    def _is_partitioned(self, table_id: str) -> bool:
+        """
+        Checks that an existing table is time-partitioned. Partitioning only
+        applies to tables created by this connector, an existing unpartitioned
+        table is not migrated (warned once per table).
+        """
+        metadata = self.table_metadata(table_id)
+        if metadata['time_partitioning'] is not None:
+            return True
+        if metadata['exists'] and table_id not in self._unpartitioned_tables:
+            self._unpartitioned_tables.add(table_id)
+            self._logger.warning('%s is not partitioned, partitioning only applies to new tables. Recreate it '
+                                 '(CREATE TABLE ... PARTITION BY ... AS SELECT) to prune scans.', table_id)
+        return False
+
+    def _newest_partition(self, table_id: str):
+        """Start of the newest non-empty partition of a table, None if there is none"""
+        project_name, dataset_name, table_name = table_id.split('.')
+        sql_query = f"""
+        SELECT MAX(partition_id) AS partition_id
+        FROM `{project_name}.{dataset_name}.INFORMATION_SCHEMA.PARTITIONS`
+        WHERE table_name = '{table_name}'
+        AND partition_id NOT IN ('__NULL__', '__UNPARTITIONED__')
+        AND total_rows > 0
+        """
+        df = self.query_table(sql_query, table_id=table_id)
+        if df.empty or pd.isna(df['partition_id'].iloc[0]):
+            return None
+        return pd.to_datetime(df['partition_id'].iloc[0], format=self.PARTITION_ID_FORMATS[self.partition_type])
+
+    def load_parquet(self, table_id: str, path: str, partition_field: str = None, cluster_fields: list = None):
+        """
+        Appends a Parquet file to a table as one load job, with the schema
+        taken from the file. If the load creates the table, it is partitioned
+        and clustered as given.
+
+        :param table_id: 'project.dataset.table' referring to table within dataset within project
+        :param path: path of the Parquet file
+        :param partition_field: DATE/TIMESTAMP col the table is day-partitioned on [default = None]
+        :param cluster_fields: cols the table is clustered by [default = None]
+        :return rows: number of rows loaded
+        """
+        job_config = bigquery.LoadJobConfig(source_format=bigquery.SourceFormat.PARQUET,
+                                            write_disposition='WRITE_APPEND')
+        if partition_field:
+            job_config.time_partitioning = bigquery.TimePartitioning(type_='DAY', field=partition_field)
+        if cluster_fields:
+            job_config.clustering_fields = list(cluster_fields)
+
+        with open(path, 'rb') as f:
+            job = self.client.load_table_from_file(f, table_id, job_config=job_config)
+            try:
+                job.result()
+            finally:
+                self.invalidate(table_id)
+        return job.output_rows
+
+    def delete_rows(self, table_id: str, key_col: str, values: list, date_col_name: str = None, since=None) -> int:
+        """
+        Deletes the rows whose key is in a list of values (used to make
+        reloads idempotent). A date col and `since` prune the partitions scanned.
+
+        :param table_id: 'project.dataset.table' referring to table within dataset within project
+        :param key_col: name of the key col
+        :param values: int key values to delete
+        :param date_col_name: partition col to prune on [default = None]
+        :param since: earliest date of the rows to delete [default = None]
+        :return deleted: number of rows deleted
+        """
+        if len(values) == 0:
+            return 0
+        keys = ', '.join(str(int(value)) for value in values)
+        sql_query = f"DELETE FROM `{table_id}` WHERE `{key_col}` IN ({keys})"
+        if date_col_name is not None and since is not None:
+            sql_query += f" AND {self.partition_filter(table_id, date_col_name, since)}"
+
+        query_job = self.client.query(sql_query)
+        try:
+            query_job.result()
+        finally:
+            self.invalidate(table_id)
+        return query_job.num_dml_affected_rows or 0
+
+    def add_columns(self, table_id: str, df: pd.DataFrame) -> list:
+        """
+        Adds the cols of a dataframe that an existing table does not have yet
+        (as NULLABLE/REPEATED cols, existing rows get NULL).
+
+        :param table_id: 'project.dataset.table' referring to table within dataset within project
+        :param df: dataframe whose cols the table needs
+        :return added: names of the added cols
+        """
+        table = self.client.get_table(table_id)
+        known = {field.name for field in table.schema}
+        new_fields = [field for field in self.schema_registry.infer(df) if field['name'] not in known]
+        if not new_fields:
+            return []
+
+        table.schema = list(table.schema) + SchemaRegistry.to_bigquery(new_fields)
+        try:
+            self.client.update_table(table, ['schema'])
+        finally:
+            self.invalidate(table_id)
+        added = [field['name'] for field in new_fields]
+        self._logger.info('Added cols %s to %s.', added, table_id)
+        return added
+
+    def partition_filter(self, table_id: str, date_col_name: str, since, alias: str = None) -> str:
+        """
+        WHERE condition keeping rows on or after `since`. The literal is a
+        constant of the col's own type, so BigQuery prunes the partitions
+        before it.
+
+        :param table_id: 'project.dataset.table' referring to table within dataset within project
+        :param date_col_name: name of the date col
+        :param since: earliest date to keep
+        :param alias: table alias to qualify the col with [default = None]
+        :return condition: e.g. "`date` >= TIMESTAMP('2024-01-01 00:00:00')"
+        """
+        since = pd.Timestamp(since)
+        if since.tzinfo is not None:
+            since = since.tz_convert('UTC').tz_localize(None)
+
+        field_types = {field.name: field.field_type for field in self.table_metadata(table_id)['schema']}
+        field_type = field_types.get(date_col_name, 'TIMESTAMP')
+        if field_type == 'DATE':
+            literal = f"DATE('{since:%Y-%m-%d}')"
+        else:
+            literal = f"{field_type}('{since:%Y-%m-%d %H:%M:%S}')"
+
+        col = f'{alias}.`{date_col_name}`' if alias else f'`{date_col_name}`'
+        return f'{col} >= {literal}'
+
+    def freshness_query(self, table_id: str, date_col_name: str, since=None, lookback_days: int = 7,
+                        columns: tuple = ('id', 'name'), limit: int = 50) -> str:
+        """
+        Builds the query of the latest ids to compare for freshness
+        (see newest_data). On a table partitioned on date_col_name, only
+        rows from `lookback_days` before the watermark are read, which
+        covers everything newest_data keeps. Otherwise the query is the
+        single bounded select of the newest `limit` rows, so no watermark
+        job runs first.
+
+        :param table_id: 'project.dataset.table' referring to table within dataset within project
+        :param date_col_name: name of the date col
+        :param since: earliest date to read [default = None, watermark - lookback_days]
+        :param lookback_days: days before the watermark to read [default = 7]
+        :param columns: cols to select besides date_col_name [default = ('id', 'name')]
+        :param limit: rows read from an unpartitioned table without since [default = 50]
+        :return sql_query: sql query
+        """
+        select_cols = ', '.join([*columns, date_col_name])
+        partitioned = date_col_name == self.partition_field and self._is_partitioned(table_id)
+        if since is None and not partitioned:
+            return f"""
+        SELECT DISTINCT {select_cols}
+        FROM `{table_id}`
+        ORDER BY {date_col_name} DESC
+        LIMIT {limit};
+        """
+
+        if since is None:
+            latest = self.latest_timestamp(table_id, date_col_name)
+            if latest is not None:
+                since = latest.floor('D') - timedelta(days=lookback_days)
+
+        where = ''
+        if since is not None:
+            where = f"\n        WHERE {self.partition_filter(table_id, date_col_name, since)}"
+
+        return f"""
+        SELECT DISTINCT {select_cols}
+        FROM `{table_id}`{where}
+        ORDER BY {date_col_name} DESC;
+        """
+
+    @staticmethod
+    def _is_distinct(col: str, field) -> str:
+        """
+        MERGE condition that is true when a col differs between the target (T)
+        and staged (S) row, nulls included.
+
+        :param col: col name
+        :param field: bigquery.SchemaField of the col in the target table
+        :return condition: sql condition
+        """
+        # arrays, structs, json and geographies have no equality, compare their json text
+        if field.mode == 'REPEATED' or field.field_type in ('RECORD', 'STRUCT', 'JSON', 'GEOGRAPHY'):
+            return f'TO_JSON_STRING(T.`{col}`) IS DISTINCT FROM TO_JSON_STRING(S.`{col}`)'
+        return f'T.`{col}` IS DISTINCT FROM S.`{col}`'
+
+    def merge_into_table(self, table_id: str, df: pd.DataFrame, key_cols=('id',), insert: bool = True) -> int:
+        """
+        Upserts data into an existing table: the batch is loaded into a
+        temporary staging table, then one MERGE on the key cols updates
+        matching rows whose values changed and inserts the rest. Dedup is
+        exact for any batch size and no rows have to be downloaded for
+        comparison. The staging table expires after STAGING_TTL in case a
+        crashed run cannot drop it.
+
+        :param table_id: 'project.dataset.table' referring to the existing table within dataset within project
+        :param df: pd.DataFrame containing data to merge into the table
+        :param key_cols: col names identifying a row [default = ('id',)]
+        :param insert: insert unmatched rows, False only updates existing rows [default = True]
+        :return affected: number of rows inserted or changed (0 if the table already held the batch)
+        """
+        key_cols = [key_cols] if isinstance(key_cols, str) else list(key_cols)
+
+        # make sure no '.' in col names
+        df.columns = df.columns.str.replace('.', '_')
+        # MERGE fails if one target row matches several source rows
+        df = df.drop_duplicates(subset=key_cols, keep='first')
+
+        target_fields = {field.name: field for field in self.table_metadata(table_id)['schema']}
+        target_cols = list(target_fields)
+        columns = [col for col in df.columns if col in set(target_cols)]
+        extra_cols = [col for col in df.columns if col not in set(target_cols)]
+        if extra_cols:
+            self._logger.warning('Cols not in %s are not merged: %s', table_id, extra_cols)
+
+        staging_id = f"{table_id}_staging_{uuid.uuid4().hex[:12]}"
+        staging = bigquery.Table(staging_id)
+        staging.expires = datetime.now(timezone.utc) + self.STAGING_TTL
+        try:
+            self.client.create_table(staging)
+            self._load_dataframe(staging_id, df[columns], write_disposition='WRITE_TRUNCATE',
+                                 schema_table_id=table_id).result()
+
+            update_cols = [col for col in columns if col not in key_cols]
+            # no date filter: an edited start time moves the existing row to any partition
+            on_clause = ' AND '.join(f'T.`{col}` = S.`{col}`' for col in key_cols)
+            insert_cols = ', '.join(f'`{col}`' for col in columns)
+            insert_values = ', '.join(f'S.`{col}`' for col in columns)
+            sql_query = f"MERGE `{table_id}` T\nUSING `{staging_id}` S\nON {on_clause}\n"
+            if update_cols:
+                update_set = ', '.join(f'`{col}` = S.`{col}`' for col in update_cols)
+                # unchanged rows are not rewritten, nor counted as affected
+                changed = ' OR '.join(self._is_distinct(col, target_fields[col]) for col in update_cols)
+                sql_query += f"WHEN MATCHED AND ({changed}) THEN UPDATE SET {update_set}\n"
+            if insert:
+                sql_query += f"WHEN NOT MATCHED THEN INSERT ({insert_cols}) VALUES ({insert_values})"
+
+            query_job = self.client.query(sql_query)
+            query_job.result()
+            return query_job.num_dml_affected_rows or 0
+        finally:
+            self.client.delete_table(staging_id, not_found_ok=True)
+            self.invalidate(table_id)
 
-        return query_job.to_dataframe()
\ No newline at end of file
@@ -0,0 +1,223 @@
+"""
+Decoders Module:
+
+Author: Jairus Martinez
+Date: 10/17/2026
+
+This module contains the schema-aware decoder that turns Strava activity
+JSON into a columnar dataframe without pd.json_normalize.
+"""
+import json
+import logging
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib parser is used instead
+    orjson = None
+
+def loads(payload):
+    """
+    Parses JSON bytes/str with orjson when installed, else the stdlib parser.
+
+    :param payload: JSON document as bytes or str
+    :return: parsed JSON
+    """
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+class ActivityDecoder():
+    """
+    Decodes lists of Strava SummaryActivity records into a dataframe with
+    only the columns that survive `cols_to_drop`.
+
+    Columns are built directly as NumPy arrays from the known (flattened)
+    activity schema. If a batch holds fields the schema does not know, the
+    whole batch falls back to pd.json_normalize so nothing is lost.
+
+    Attributes:
+        - cols_to_drop: flattened col names (e.g. 'map.summary_polyline') to leave out
+        - columns: flattened col names that are decoded
+        - dropped: cols_to_drop the schema knows, never built by the decoder
+    Methods:
+        - decode: decodes a list of activity dicts
+        - decode_bytes: parses and decodes a raw JSON response body
+    """
+    # flattened SummaryActivity fields -> kind ('num', 'bool', 'str' or 'obj')
+    SCHEMA = {
+        'resource_state': 'num',
+        'athlete.id': 'num',
+        'athlete.resource_state': 'num',
+        'name': 'str',
+        'distance': 'num',
+        'moving_time': 'num',
+        'elapsed_time': 'num',
+        'total_elevation_gain': 'num',
+        'type': 'str',
+        'sport_type': 'str',
+        'workout_type': 'num',
+        'id': 'num',
+        'start_date': 'str',
+        'start_date_local': 'str',
+        'timezone': 'str',
+        'utc_offset': 'num',
+        'location_city': 'str',
+        'location_state': 'str',
+        'location_country': 'str',
+        'achievement_count': 'num',
+        'kudos_count': 'num',
+        'comment_count': 'num',
+        'athlete_count': 'num',
+        'photo_count': 'num',
+        'map.id': 'str',
+        'map.summary_polyline': 'str',
+        'map.resource_state': 'num',
+        'trainer': 'bool',
+        'commute': 'bool',
+        'manual': 'bool',
+        'private': 'bool',
+        'visibility': 'str',
+        'flagged': 'bool',
+        'gear_id': 'str',
+        'start_latlng': 'obj',
+        'end_latlng': 'obj',
+        'average_speed': 'num',
+        'max_speed': 'num',
+        'average_cadence': 'num',
+        'average_temp': 'num',
+        'average_watts': 'num',
+        'max_watts': 'num',
+        'weighted_average_watts': 'num',
+        'kilojoules': 'num',
+        'device_watts': 'bool',
+        'has_heartrate': 'bool',
+        'average_heartrate': 'num',
+        'max_heartrate': 'num',
+        'heartrate_opt_out': 'bool',
+        'display_hide_heartrate_option': 'bool',
+        'elev_high': 'num',
+        'elev_low': 'num',
+        'upload_id': 'num',
+        'upload_id_str': 'str',
+        'external_id': 'str',
+        'from_accepted_tag': 'bool',
+        'pr_count': 'num',
+        'total_photo_count': 'num',
+        'has_kudoed': 'bool',
+        'suffer_score': 'num',
+    }
+
+    def __init__(self, cols_to_drop: list):
+        """
+        Constructor for ActivityDecoder class
+
+        :param cols_to_drop: flattened col names to leave out
+        """
+        self.cols_to_drop = list(cols_to_drop)
+        self.columns = [col for col in self.SCHEMA if col not in set(self.cols_to_drop)]
+        self.dropped = [col for col in self.cols_to_drop if col in self.SCHEMA]
+        self._nested = {}
+        for col in self.SCHEMA:
+            if '.' in col:
+                parent, child = col.split('.', 1)
+                self._nested.setdefault(parent, set()).add(child)
+        self._top_level = {col for col in self.SCHEMA if '.' not in col} | set(self._nested)
+        self._logger = logging.getLogger(__name__)
+
+    def _scan_fields(self, records: list):
+        """
+        Collects the flattened field names that appear in a batch.
+
+        :param records: list of activity dicts
+        :return: (fields known to the schema, fields the schema does not know)
+        """
+        keys = set()
+        for record in records:
+            keys.update(record)
+        unexpected = keys - self._top_level
+        seen = keys & self._top_level
+
+        for parent, children in self._nested.items():
+            nested_keys = set()
+            for record in records:
+                value = record.get(parent)
+                if isinstance(value, dict):
+                    nested_keys.update(value)
+                elif value is not None:
+                    unexpected.add(parent)
+            unexpected.update(f'{parent}.{child}' for child in nested_keys - children)
+            seen.update(f'{parent}.{child}' for child in nested_keys & children)
+        return seen, unexpected
+
+    @staticmethod
+    def _to_array(values: list, kind: str) -> np.ndarray:
+        """
+        Converts one column of python values to a NumPy array, inferring the
+        numeric dtype like pandas does (ints stay int64, nulls promote to float64).
+        """
+        if kind == 'num':
+            arr = np.array(values)
+            if arr.dtype.kind in 'iufb':
+                return arr
+            # all-null cols stay object, like pandas
+            if values.count(None) < len(values):
+                return np.array(values, dtype=np.float64)
+        if kind == 'bool':
+            arr = np.array(values)
+            if arr.dtype.kind == 'b':
+                return arr
+        # strings, lists, bools with nulls and all-null cols stay python objects
+        arr = np.empty(len(values), dtype=object)
+        arr[:] = values
+        return arr
+
+    def decode(self, records: list) -> pd.DataFrame:
+        """
+        Decodes a list of activity dicts into a dataframe of the kept columns.
+
+        :param records: list of activity dicts (a page from get_dataset)
+        :returns: dataframe with flattened col names, like pd.json_normalize
+        :rtype: pd.DataFrame
+        """
+        if len(records) == 0:
+            return pd.DataFrame()
+
+        seen, unexpected = self._scan_fields(records)
+        if unexpected:
+            self._logger.warning('Unexpected activity fields %s, falling back to json_normalize.', sorted(unexpected))
+            return pd.json_normalize(records).drop(columns=self.dropped, errors='ignore')
+
+        missing = np.nan
+        empty = {}
+        data = {}
+        for col in [col for col in self.columns if col in seen]:
+            if '.' in col:
+                parent, child = col.split('.', 1)
+                values = [(record.get(parent) or empty).get(child, missing) for record in records]
+            else:
+                values = [record.get(col, missing) for record in records]
+
+            data[col] = self._to_array(values, self.SCHEMA[col])
+
+        # keep the field order of the payload, like json_normalize (nested fields last)
+        first = records[0]
+        order = [key for key, value in first.items() if not isinstance(value, dict)]
+        for key, value in first.items():
+            if isinstance(value, dict):
+                order.extend(f'{key}.{child}' for child in value)
+        order = [col for col in order if col in data]
+        order += [col for col in data if col not in set(order)]
+
+        return pd.DataFrame({col: data[col] for col in order}, copy=False)
+
+    def decode_bytes(self, payload) -> pd.DataFrame:
+        """
+        Parses a raw JSON response body and decodes it.
+
+        :param payload: response body as bytes or str
+        :returns: dataframe with flattened col names
+        :rtype: pd.DataFrame
+        """
+        return self.decode(loads(payload))
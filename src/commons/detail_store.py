@@ -0,0 +1,96 @@
+"""
+Detail Store Module:
+
+Author: Jairus Martinez
+Date: 10/17/2026
+
+This module contains the local sqlite store of detailed Strava activities.
+"""
+import gzip
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+class DetailStore():
+    """
+    Keeps the DetailedActivity JSON of every activity fetched from
+    /activities/{id}, gzip-compressed in a sqlite file, so each detail is
+    fetched from Strava only once.
+
+    Attributes:
+        - path: path to the sqlite file
+    Methods:
+        - missing: ids without a stored detail
+        - get_many: stored details of a list of ids
+        - put: stores the detail of an activity
+    """
+    def __init__(self, path: str, clock=time.time):
+        """
+        Constructor for DetailStore class
+
+        :param path: path to the sqlite file
+        :param clock: function returning the current epoch time in seconds
+        """
+        self.path = path
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._logger = logging.getLogger(__name__)
+
+        with closing(self._connect()) as conn, conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS details (
+                    id INTEGER PRIMARY KEY,
+                    fetched_at REAL NOT NULL,
+                    payload BLOB NOT NULL
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=60)
+
+    def _select(self, conn: sqlite3.Connection, columns: str, ids: list):
+        """Rows of the given ids, queried in batches under sqlite's variable limit"""
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            placeholders = ', '.join('?' * len(batch))
+            yield from conn.execute(f'SELECT {columns} FROM details WHERE id IN ({placeholders})', batch)
+
+    def missing(self, ids) -> list:
+        """
+        Ids without a stored detail, in the given order.
+
+        :param ids: activity ids
+        :return ids: list of ids to fetch
+        """
+        ids = [int(activity_id) for activity_id in dict.fromkeys(ids)]
+        with closing(self._connect()) as conn:
+            stored = {row[0] for row in self._select(conn, 'id', ids)}
+        return [activity_id for activity_id in ids if activity_id not in stored]
+
+    def get_many(self, ids) -> dict:
+        """
+        Stored details of a list of ids.
+
+        :param ids: activity ids
+        :return details: dict of id -> detail dict (ids without a detail are left out)
+        """
+        ids = [int(activity_id) for activity_id in dict.fromkeys(ids)]
+        with closing(self._connect()) as conn:
+            return {row[0]: json.loads(gzip.decompress(row[1])) for row in self._select(conn, 'id, payload', ids)}
+
+    def put(self, detail: dict):
+        """
+        Stores the detail of an activity.
+
+        :param detail: DetailedActivity dict (must have an 'id')
+        """
+        payload = gzip.compress(json.dumps(detail).encode('utf-8'), mtime=0)
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute('INSERT OR REPLACE INTO details (id, fetched_at, payload) VALUES (?, ?, ?)',
+                         (int(detail['id']), self._clock(), payload))
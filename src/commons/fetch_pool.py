@@ -0,0 +1,85 @@
+"""
+Fetch Pool Module:
+
+Author: Jairus Martinez
+Date: 10/17/2026
+
+This module contains the bounded, budget-capped pool of concurrent Strava
+API fetches shared by the page, detail and stream extractors.
+"""
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+class FetchPool():
+    """
+    Runs a fetch function over items with at most `concurrency` calls in
+    flight, results in item order.
+
+    The next item is only submitted once a result is taken, so items are
+    pulled lazily (an endless iterator is fine) and the rate limiter of the
+    connector paces the calls. Closing the iteration early cancels the
+    calls still queued. With a connector, `allowance` caps a run at the
+    remaining daily budget minus budget_reserve.
+
+    Attributes:
+        - concurrency: number of calls in flight [default = 4]
+        - strava_api_connector: StravaAPIConnector whose rate budget caps a run [default = None]
+        - budget_reserve: daily requests left untouched for the rest of the job [default = 0]
+    Methods:
+        - allowance: number of fetches that fit in the remaining daily budget
+        - map: yields (item, result) pairs of the fetch function
+    """
+    def __init__(self, concurrency: int = 4, strava_api_connector=None, budget_reserve: int = 0):
+        """
+        Constructor for FetchPool class
+
+        :param concurrency: number of calls in flight [default = 4]
+        :param strava_api_connector: StravaAPIConnector whose rate budget caps a run [default = None]
+        :param budget_reserve: daily requests left untouched for the rest of the job [default = 0]
+        """
+        self.concurrency = max(1, int(concurrency))
+        self.strava_api_connector = strava_api_connector
+        self.budget_reserve = budget_reserve
+        self._logger = logging.getLogger(__name__)
+
+    def allowance(self, wanted: int) -> int:
+        """
+        Number of fetches that fit in the remaining daily budget.
+
+        :param wanted: number of fetches to run
+        :return allowed: wanted, capped at the daily requests remaining minus budget_reserve
+        """
+        budget = self.strava_api_connector.rate_budget() if self.strava_api_connector is not None else None
+        if budget is None:
+            return wanted
+        return max(0, min(wanted, budget['daily_remaining'] - self.budget_reserve))
+
+    def map(self, func, items):
+        """
+        Yields (item, func(item)) pairs in item order, keeping at most
+        `concurrency` calls in flight.
+
+        :param func: fetch function taking one item
+        :param items: iterable of items
+        :return pairs: generator of (item, result)
+        """
+        items = iter(items)
+        in_flight = deque()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            try:
+                for item in items:
+                    in_flight.append((item, executor.submit(func, item)))
+                    if len(in_flight) == self.concurrency:
+                        break
+                while in_flight:
+                    item, future = in_flight.popleft()
+                    yield item, future.result()
+
+                    # the consumer may stop after any result, so the next call is only queued now
+                    for item in items:
+                        in_flight.append((item, executor.submit(func, item)))
+                        break
+            finally:
+                for _, pending in in_flight:
+                    pending.cancel()
@@ -0,0 +1,230 @@
+"""
+Load Buffer Module:
+
+Author: Jairus Martinez
+Date: 10/17/2026
+
+This module contains the local write-ahead buffer that coalesces small
+appends into one BigQuery load job.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+class LoadBuffer():
+    """
+    Write-ahead buffer of Parquet segments per BigQuery table.
+
+    Every `append` writes one segment atomically (temp file, fsync,
+    rename), so a segment on disk is always complete. A flush first writes
+    a manifest naming the segments it covers, loads them as one job and
+    only then deletes them and the manifest. The load is a MERGE on id
+    (or the upload that creates the table), so if the process dies
+    mid-flush, replaying the manifest on the next flush cannot duplicate
+    activities: delivery is exactly-once by id.
+
+    Attributes:
+        - path: directory holding the segments and manifests
+        - max_rows: buffered rows that trigger a flush [default = 1000]
+        - max_bytes: buffered bytes that trigger a flush [default = 16MB]
+        - max_age_seconds: age of the oldest segment that triggers a flush [default = 3600]
+    Methods:
+        - append: buffers a dataframe for a table
+        - pending: rows, bytes and age of what is buffered for a table
+        - should_flush: checks if any threshold is crossed
+        - flush: loads the buffered segments of a table as one job
+        - buffered_ids: ids waiting in the buffer of a table
+    """
+    SEGMENT_SUFFIX = '.parquet'
+    MANIFEST_SUFFIX = '.manifest.json'
+
+    def __init__(self, path: str, max_rows: int = 1000, max_bytes: int = 16 * 1024 * 1024,
+                 max_age_seconds: int = 3600, clock=time.time):
+        """
+        Constructor for LoadBuffer class
+
+        :param path: directory holding the segments and manifests
+        :param max_rows: buffered rows that trigger a flush [default = 1000]
+        :param max_bytes: buffered bytes that trigger a flush [default = 16MB]
+        :param max_age_seconds: age of the oldest segment that triggers a flush [default = 3600]
+        :param clock: function returning the current epoch time in seconds
+        """
+        self.path = path
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._logger = logging.getLogger(__name__)
+        os.makedirs(path, exist_ok=True)
+
+    def _table_dir(self, table_id: str) -> str:
+        table_dir = os.path.join(self.path, table_id)
+        os.makedirs(table_dir, exist_ok=True)
+        return table_dir
+
+    @staticmethod
+    def _atomic_write(path: str, data: bytes):
+        """Writes a file so it is either complete or absent after a crash"""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        if hasattr(os, 'O_DIRECTORY'):
+            dir_fd = os.open(os.path.dirname(path), os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    def _segments(self, table_id: str) -> list:
+        """Segment file names of a table, oldest first"""
+        table_dir = self._table_dir(table_id)
+        return sorted(name for name in os.listdir(table_dir) if name.endswith(self.SEGMENT_SUFFIX))
+
+    def _manifests(self, table_id: str) -> list:
+        table_dir = self._table_dir(table_id)
+        return sorted(name for name in os.listdir(table_dir) if name.endswith(self.MANIFEST_SUFFIX))
+
+    def append(self, table_id: str, df: pd.DataFrame) -> str:
+        """
+        Buffers a dataframe for a table as one Parquet segment.
+
+        :param table_id: 'project.dataset.table' the data is for
+        :param df: dataframe to buffer (must have an 'id' col)
+        :return segment: file name of the segment
+        """
+        df = df.rename(columns=lambda col: col.replace('.', '_'))
+        sink = pa.BufferOutputStream()
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), sink, compression='snappy')
+
+        # created-at (ms) first so names sort oldest first
+        segment = f'{int(self._clock() * 1000):013d}-{uuid.uuid4().hex[:8]}{self.SEGMENT_SUFFIX}'
+        with self._lock:
+            self._atomic_write(os.path.join(self._table_dir(table_id), segment), sink.getvalue().to_pybytes())
+        self._logger.info('Buffered %s rows for %s.', len(df), table_id)
+        return segment
+
+    def pending(self, table_id: str) -> dict:
+        """
+        Rows, bytes and age (seconds) of what is buffered for a table.
+
+        :param table_id: 'project.dataset.table'
+        :return pending: dict with segments, rows, bytes and age_seconds
+        """
+        table_dir = self._table_dir(table_id)
+        segments = self._segments(table_id)
+        rows = sum(pq.read_metadata(os.path.join(table_dir, segment)).num_rows for segment in segments)
+        size = sum(os.path.getsize(os.path.join(table_dir, segment)) for segment in segments)
+        age = 0
+        if segments:
+            age = self._clock() - int(segments[0].split('-')[0]) / 1000
+        return {'segments': len(segments), 'rows': rows, 'bytes': size, 'age_seconds': age}
+
+    def should_flush(self, table_id: str) -> bool:
+        """
+        Checks if the buffer of a table crossed the row, byte or age threshold
+        (or holds a manifest left by an interrupted flush).
+
+        :param table_id: 'project.dataset.table'
+        """
+        return bool(self._manifests(table_id)) or self._over_threshold(table_id)
+
+    def buffered_ids(self, table_id: str) -> set:
+        """
+        Ids waiting in the buffer of a table (pending segments, including
+        those of an interrupted flush). Only the id col is read.
+
+        :param table_id: 'project.dataset.table'
+        :return ids: set of activity ids
+        """
+        table_dir = self._table_dir(table_id)
+        ids = set()
+        for segment in self._segments(table_id):
+            ids.update(pq.read_table(os.path.join(table_dir, segment), columns=['id']).column('id').to_pylist())
+        return ids
+
+    def _load(self, table_id: str, segments: list, bqc, on_load=None) -> int:
+        """
+        Loads segments as one job: MERGE on id, or an upload if the table
+        does not exist yet. on_load(df) is called once the job succeeded.
+        """
+        table_dir = self._table_dir(table_id)
+        frames = [pq.read_table(os.path.join(table_dir, segment)).to_pandas()
+                  for segment in segments if os.path.exists(os.path.join(table_dir, segment))]
+        if not frames:
+            return 0
+        # later segments hold the newer version of an activity
+        df = pd.concat(frames, ignore_index=True).drop_duplicates(subset='id', keep='last')
+
+        _, dataset_name, table_name = table_id.split('.')
+        if bqc.table_exists(dataset_name, table_name):
+            bqc.add_columns(table_id, df)
+            bqc.merge_into_table(table_id, df)
+        else:
+            bqc.upload_table(table_id, df)
+        if on_load is not None:
+            on_load(df)
+        return len(df)
+
+    def _finish(self, table_id: str, manifest: str, segments: list):
+        """Deletes the flushed segments, then the manifest"""
+        table_dir = self._table_dir(table_id)
+        for segment in segments:
+            try:
+                os.remove(os.path.join(table_dir, segment))
+            except FileNotFoundError:
+                pass
+        os.remove(os.path.join(table_dir, manifest))
+
+    def flush(self, table_id: str, bqc, force: bool = False, on_load=None) -> int:
+        """
+        Loads the buffered segments of a table into BigQuery as one job.
+        Manifests left by an interrupted flush are replayed first.
+
+        :param table_id: 'project.dataset.table'
+        :param bqc: BigQueryConnector
+        :param force: flush even if no threshold is crossed [default = False]
+        :param on_load: called with the loaded dataframe after each successful job, e.g. to
+            record the load in the state store [default = None]
+        :return rows: number of rows loaded
+        """
+        with self._lock:
+            table_dir = self._table_dir(table_id)
+            loaded = 0
+
+            # replay flushes that did not finish
+            for manifest in self._manifests(table_id):
+                with open(os.path.join(table_dir, manifest), encoding='utf-8') as f:
+                    segments = json.load(f)['segments']
+                self._logger.warning('Replaying interrupted flush %s (%s segments).', manifest, len(segments))
+                loaded += self._load(table_id, segments, bqc, on_load)
+                self._finish(table_id, manifest, segments)
+
+            segments = self._segments(table_id)
+            if not segments or not (force or self._over_threshold(table_id)):
+                return loaded
+
+            manifest = f'{int(self._clock() * 1000):013d}-{uuid.uuid4().hex[:8]}{self.MANIFEST_SUFFIX}'
+            self._atomic_write(os.path.join(table_dir, manifest),
+                               json.dumps({'table_id': table_id, 'segments': segments}).encode('utf-8'))
+            loaded += self._load(table_id, segments, bqc, on_load)
+            self._finish(table_id, manifest, segments)
+            self._logger.info('Flushed %s segments (%s rows) into %s.', len(segments), loaded, table_id)
+            return loaded
+
+    def _over_threshold(self, table_id: str) -> bool:
+        pending = self.pending(table_id)
+        if pending['segments'] == 0:
+            return False
+        return (pending['rows'] >= self.max_rows
+                or pending['bytes'] >= self.max_bytes
+                or pending['age_seconds'] >= self.max_age_seconds)
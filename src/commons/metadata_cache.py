@@ -0,0 +1,71 @@
+"""
+Metadata Cache Module:
+
+Author: Jairus Martinez
+Date: 10/17/2026
+
+This module contains the in-process TTL cache of BigQuery table metadata.
+"""
+import logging
+import threading
+import time
+
+class TableMetadataCache():
+    """
+    TTL cache of table metadata (existence, schema, partitioning, last
+    modified time), so repeated checks in a run cost one get_table call per
+    table. Missing tables are cached too. Writers call `invalidate` after
+    their own writes; one instance can be shared by every connector (tables,
+    athletes) in a process.
+
+    Attributes:
+        - ttl_seconds: seconds an entry is served [default = 300]
+    Methods:
+        - get: cached metadata of a table, fetched with a loader on a miss
+        - invalidate: drops the entry of a table
+        - clear: drops every entry
+    """
+    def __init__(self, ttl_seconds: float = 300, clock=time.monotonic):
+        """
+        Constructor for TableMetadataCache class
+
+        :param ttl_seconds: seconds an entry is served [default = 300]
+        :param clock: function returning a monotonic time in seconds
+        """
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._logger = logging.getLogger(__name__)
+
+    def get(self, table_id: str, loader) -> dict:
+        """
+        Cached metadata of a table, fetched with `loader` on a miss or after the TTL.
+
+        :param table_id: 'project.dataset.table'
+        :param loader: function returning the metadata dict of the table
+        :return metadata: dict with exists, schema, time_partitioning, clustering_fields, modified and num_rows
+        """
+        with self._lock:
+            entry = self._entries.get(table_id)
+            if entry is not None and self._clock() - entry[0] < self.ttl_seconds:
+                return entry[1]
+
+        metadata = loader()
+        with self._lock:
+            self._entries[table_id] = (self._clock(), metadata)
+        return metadata
+
+    def invalidate(self, table_id: str):
+        """
+        Drops the entry of a table (call after writing to it).
+
+        :param table_id: 'project.dataset.table'
+        """
+        with self._lock:
+            self._entries.pop(table_id, None)
+
+    def clear(self):
+        """Drops every entry"""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,144 @@
+"""
+Query Cache Module:
+
+Author: Jairus Martinez
+Date: 10/17/2026
+
+This module contains the on-disk cache for BigQuery query results.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+class QueryResultCache():
+    """
+    Stores query results as Parquet files keyed by the SQL text and the
+    last modified time of the table it reads.
+
+    Any write to the table changes its modified time and therefore the key,
+    so stale results are never served; they just age out. Files are
+    evicted least recently used first (mtime is bumped on every hit) once
+    the cache holds more than max_entries files or max_bytes.
+
+    Attributes:
+        - cache_dir: directory holding the cached results
+        - max_bytes: total size before the least recently used results are evicted [default = None (unbounded)]
+        - max_entries: number of results before the least recently used are evicted [default = None (unbounded)]
+    Methods:
+        - get: cached result of a query (None on a miss)
+        - put: caches the result of a query
+        - evict: drops least recently used results above max_entries/max_bytes
+    """
+    SUFFIX = '.parquet'
+
+    def __init__(self, cache_dir: str, max_bytes: int = None, max_entries: int = None, clock=time.time):
+        """
+        Constructor for QueryResultCache class
+
+        :param cache_dir: directory holding the cached results
+        :param max_bytes: total size before the least recently used results are evicted [default = None (unbounded)]
+        :param max_entries: number of results before the least recently used are evicted [default = None (unbounded)]
+        :param clock: function returning the current epoch time in seconds
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._logger = logging.getLogger(__name__)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(sql_query: str, modified) -> str:
+        """
+        Builds the cache key of a query.
+
+        :param sql_query: sql text
+        :param modified: last modified time of the table the query reads
+        :return key: sha256 hex digest
+        """
+        raw = f'{pd.Timestamp(modified).isoformat()}\n{sql_query.strip()}'
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + self.SUFFIX)
+
+    def get(self, sql_query: str, modified) -> pd.DataFrame:
+        """
+        Gets the cached result of a query.
+
+        :param sql_query: sql text
+        :param modified: last modified time of the table the query reads
+        :return df: cached result, None on a miss
+        """
+        path = self._path(self.key(sql_query, modified))
+        try:
+            df = pq.read_table(path).to_pandas()
+        except (FileNotFoundError, OSError, pa.ArrowInvalid):
+            return None
+
+        now = self._clock()
+        os.utime(path, (now, now))
+        return df
+
+    def put(self, sql_query: str, modified, df: pd.DataFrame):
+        """
+        Caches the result of a query.
+
+        :param sql_query: sql text
+        :param modified: last modified time of the table the query reads
+        :param df: query result
+        """
+        # write to a temp file and rename so readers never see a partial result
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pq.write_table(pa.Table.from_pandas(df), f, compression='snappy')
+            path = self._path(self.key(sql_query, modified))
+            os.replace(tmp_path, path)
+            now = self._clock()
+            os.utime(path, (now, now))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        if self.max_bytes is not None or self.max_entries is not None:
+            self.evict()
+
+    def evict(self):
+        """
+        Drops the least recently used results until the cache fits in
+        max_entries and max_bytes.
+        """
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(self.SUFFIX):
+                    path = os.path.join(self.cache_dir, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+            entries.sort()
+
+            count = len(entries)
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                over_entries = self.max_entries is not None and count > self.max_entries
+                over_bytes = self.max_bytes is not None and total > self.max_bytes
+                if not (over_entries or over_bytes):
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                count -= 1
+                total -= size
@@ -0,0 +1,160 @@
+"""
+Rate Limiter Module:
+
+Author: Jairus Martinez
+Date: 10/17/2026
+
+This module contains the scheduler that keeps Strava API calls inside the
+15-minute and daily rate limits.
+"""
+import logging
+import threading
+import time
+
+class StravaRateLimiter():
+    """
+    Token-bucket scheduler for the Strava API rate limits.
+
+    Strava resets the short-term quota at natural 15-minute boundaries (UTC)
+    and the daily quota at midnight UTC. Every request takes one token from
+    both buckets, and the buckets are corrected from the X-RateLimit-* headers
+    on every response.
+
+    Attributes:
+        - short_limit: requests allowed per 15-minute window
+        - daily_limit: requests allowed per day
+        - short_usage: requests used in the current 15-minute window
+        - daily_usage: requests used in the current day
+        - safety_margin: tokens held back from each bucket
+    Methods:
+        - acquire: block until a request can be sent, then take a token
+        - update: sync limits/usage from the response headers
+        - budget: current limits, usage, remaining requests and reset times
+    """
+    SHORT_WINDOW = 15 * 60
+    DAILY_WINDOW = 24 * 60 * 60
+
+    def __init__(self, short_limit: int = 200, daily_limit: int = 2000, safety_margin: int = 0,
+                 clock=time.time, sleep=time.sleep):
+        """
+        Constructor for StravaRateLimiter class
+
+        :param short_limit: requests allowed per 15-minute window [default = 200]
+        :param daily_limit: requests allowed per day [default = 2000]
+        :param safety_margin: tokens held back from each bucket [default = 0]
+        :param clock: function returning the current epoch time in seconds
+        :param sleep: function used to wait for a window reset
+        """
+        self.short_limit = short_limit
+        self.daily_limit = daily_limit
+        self.safety_margin = safety_margin
+        self.short_usage = 0
+        self.daily_usage = 0
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._logger = logging.getLogger(__name__)
+
+        now = self._clock()
+        self._short_window_start = now - now % self.SHORT_WINDOW
+        self._daily_window_start = now - now % self.DAILY_WINDOW
+
+    def _roll_windows(self, now: float):
+        """
+        Resets usage for any window that has passed.
+
+        :param now: current epoch time in seconds
+        """
+        if now - self._short_window_start >= self.SHORT_WINDOW:
+            self._short_window_start = now - now % self.SHORT_WINDOW
+            self.short_usage = 0
+        if now - self._daily_window_start >= self.DAILY_WINDOW:
+            self._daily_window_start = now - now % self.DAILY_WINDOW
+            self.daily_usage = 0
+
+    def _seconds_until_available(self, now: float) -> float:
+        """
+        Seconds until both buckets have a token (0 if one is available now).
+
+        :param now: current epoch time in seconds
+        """
+        if self.daily_usage + self.safety_margin >= self.daily_limit:
+            return self._daily_window_start + self.DAILY_WINDOW - now
+        if self.short_usage + self.safety_margin >= self.short_limit:
+            return self._short_window_start + self.SHORT_WINDOW - now
+        return 0
+
+    def acquire(self):
+        """
+        Blocks until a request fits in the remaining budget, then takes a token.
+
+        The wait is computed under the lock but slept without it, so update()
+        and budget() from other workers are not held up for the whole wait.
+        """
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._roll_windows(now)
+                wait = self._seconds_until_available(now)
+                if wait <= 0:
+                    self.short_usage += 1
+                    self.daily_usage += 1
+                    return
+            self._logger.info('Strava rate limit reached. Sleeping %.1fs until the window resets.', wait)
+            self._sleep(wait)
+
+    def update(self, headers):
+        """
+        Syncs limits and usage from a Strava response.
+
+        Reads the X-RateLimit-Limit/X-RateLimit-Usage headers ("15min,daily")
+        and, when present, the stricter X-ReadRateLimit-* pair.
+
+        :param headers: response headers
+        """
+        pairs = []
+        for prefix in ('X-RateLimit', 'X-ReadRateLimit'):
+            limit = headers.get(f'{prefix}-Limit')
+            usage = headers.get(f'{prefix}-Usage')
+            if limit and usage:
+                try:
+                    short_limit, daily_limit = (int(v) for v in limit.split(','))
+                    short_usage, daily_usage = (int(v) for v in usage.split(','))
+                except ValueError:
+                    self._logger.warning('Could not parse %s headers: %s / %s', prefix, limit, usage)
+                    continue
+                pairs.append((short_limit, daily_limit, short_usage, daily_usage))
+        if not pairs:
+            return
+
+        with self._lock:
+            self._roll_windows(self._clock())
+            # the most constrained pair of limits wins
+            short_limit, daily_limit, short_usage, daily_usage = min(
+                pairs, key=lambda p: min(p[0] - p[2], p[1] - p[3]))
+            self.short_limit = short_limit
+            self.daily_limit = daily_limit
+            # local usage also counts requests still in flight
+            self.short_usage = max(self.short_usage, short_usage)
+            self.daily_usage = max(self.daily_usage, daily_usage)
+
+    def budget(self) -> dict:
+        """
+        Returns the current rate budget.
+
+        :return budget: dict with limits, usage, remaining requests and seconds until each window resets
+        :rtype: dict
+        """
+        with self._lock:
+            now = self._clock()
+            self._roll_windows(now)
+            return {
+                'short_limit': self.short_limit,
+                'short_usage': self.short_usage,
+                'short_remaining': max(0, self.short_limit - self.short_usage),
+                'short_reset_in': self._short_window_start + self.SHORT_WINDOW - now,
+                'daily_limit': self.daily_limit,
+                'daily_usage': self.daily_usage,
+                'daily_remaining': max(0, self.daily_limit - self.daily_usage),
+                'daily_reset_in': self._daily_window_start + self.DAILY_WINDOW - now,
+            }
@@ -0,0 +1,202 @@
+"""
+Response Cache Module:
+
+Author: Jairus Martinez
+Date: 10/17/2026
+
+This module contains the on-disk cache for raw Strava API responses.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+class ResponseCache():
+    """
+    Stores raw Strava API pages as gzip-compressed NDJSON files.
+
+    Each file is keyed by endpoint, request params and athlete. The first
+    line holds the request metadata and every following line one record, so
+    cached pages can be listed and replayed without an index file.
+
+    Attributes:
+        - cache_dir: directory holding the cached pages
+        - ttl_seconds: seconds a page is served from the cache [default = None (no expiry)]
+        - max_bytes: total size of the cache before the least recently used pages are evicted
+          [default = None (unbounded)]
+    Methods:
+        - get: cached records for a request (None on a miss)
+        - put: caches the records of a request
+        - evict: drops expired pages, then least recently used pages above max_bytes
+        - replay: yields every cached page of an endpoint
+    """
+    SUFFIX = '.ndjson.gz'
+
+    def __init__(self, cache_dir: str, ttl_seconds: int = None, max_bytes: int = None, clock=time.time):
+        """
+        Constructor for ResponseCache class
+
+        :param cache_dir: directory holding the cached pages
+        :param ttl_seconds: seconds a page is served from the cache [default = None (no expiry)]
+        :param max_bytes: total size of the cache before the least recently used pages are evicted
+        :param clock: function returning the current epoch time in seconds
+        """
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._logger = logging.getLogger(__name__)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(endpoint: str, params: dict, athlete: str) -> str:
+        """
+        Builds the cache key of a request.
+
+        :param endpoint: endpoint url
+        :param params: request params
+        :param athlete: athlete (or client) id the request was made for
+        :return key: sha256 hex digest
+        """
+        raw = json.dumps([endpoint, params or {}, str(athlete)], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + self.SUFFIX)
+
+    def _is_expired(self, meta: dict) -> bool:
+        if self.ttl_seconds is None:
+            return False
+        return self._clock() - meta.get('created_at', 0) > self.ttl_seconds
+
+    @staticmethod
+    def _read(path: str):
+        """Reads a cached page as (metadata, records)"""
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            meta = json.loads(f.readline())
+            records = [json.loads(line) for line in f if line.strip()]
+        return meta, records
+
+    def get(self, endpoint: str, params: dict, athlete: str) -> list:
+        """
+        Gets the cached records of a request.
+
+        :param endpoint: endpoint url
+        :param params: request params
+        :param athlete: athlete (or client) id the request was made for
+        :return records: list of dicts, None on a miss or expired page
+        """
+        path = self._path(self.key(endpoint, params, athlete))
+        try:
+            meta, records = self._read(path)
+        except (FileNotFoundError, EOFError, OSError, ValueError):
+            return None
+
+        if self._is_expired(meta):
+            self._remove(path)
+            return None
+
+        # the ttl runs from created_at, so mtime is free to track recent use
+        # (atime is unreliable on noatime mounts)
+        now = self._clock()
+        os.utime(path, (now, now))
+        return records
+
+    def put(self, endpoint: str, params: dict, athlete: str, records: list):
+        """
+        Caches the records of a request.
+
+        :param endpoint: endpoint url
+        :param params: request params
+        :param athlete: athlete (or client) id the request was made for
+        :param records: list of dicts returned by the API
+        """
+        meta = {'endpoint': endpoint, 'params': params or {}, 'athlete': str(athlete),
+                'created_at': self._clock()}
+
+        # write to a temp file and rename so readers never see a partial page
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as f:
+                f.write((json.dumps(meta, default=str) + '\n').encode('utf-8'))
+                for record in records:
+                    f.write((json.dumps(record) + '\n').encode('utf-8'))
+            path = self._path(self.key(endpoint, params, athlete))
+            os.replace(tmp_path, path)
+            os.utime(path, (meta['created_at'], meta['created_at']))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        if self.max_bytes is not None or self.ttl_seconds is not None:
+            self.evict()
+
+    def _entries(self) -> list:
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(self.SUFFIX):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        """
+        Drops expired pages, then the least recently used pages until the
+        cache fits in max_bytes.
+        """
+        with self._lock:
+            entries = sorted(self._entries())
+            if self.ttl_seconds is not None:
+                # mtime >= created_at, so anything untouched for the ttl is expired
+                cutoff = self._clock() - self.ttl_seconds
+                for _, _, path in [e for e in entries if e[0] < cutoff]:
+                    self._remove(path)
+                entries = [e for e in entries if e[0] >= cutoff]
+
+            if self.max_bytes is not None:
+                total = sum(size for _, size, _ in entries)
+                for _, size, path in entries:
+                    if total <= self.max_bytes:
+                        break
+                    self._remove(path)
+                    total -= size
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def replay(self, endpoint: str, athlete: str = None):
+        """
+        Yields every cached page of an endpoint, oldest first, ignoring the ttl.
+
+        :param endpoint: endpoint url
+        :param athlete: only replay pages of this athlete [default = None (all)]
+        :return: generator of (params, records)
+        """
+        pages = []
+        for _, _, path in self._entries():
+            try:
+                meta, records = self._read(path)
+            except (FileNotFoundError, EOFError, OSError, ValueError):
+                self._logger.warning('Skipping unreadable cache file: %s', path)
+                continue
+            if meta.get('endpoint') != endpoint:
+                continue
+            if athlete is not None and meta.get('athlete') != str(athlete):
+                continue
+            pages.append((meta.get('created_at', 0), meta.get('params', {}).get('page', 0), meta, records))
+
+        for _, _, meta, records in sorted(pages, key=lambda p: (p[0], p[1])):
+            yield meta['params'], records
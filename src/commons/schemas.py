@@ -0,0 +1,255 @@
+"""
+Schemas Module:
+
+Author: Jairus Martinez
+Date: 10/17/2026
+
+This module contains the registry of pinned, versioned BigQuery table
+schemas and the Parquet serializer used by the Parquet load path.
+"""
+import io
+import json
+import logging
+import os
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from google.cloud import bigquery
+
+# BigQuery type -> Arrow type
+ARROW_TYPES = {
+    'INTEGER': pa.int64(),
+    'FLOAT': pa.float64(),
+    'BOOLEAN': pa.bool_(),
+    'STRING': pa.string(),
+    'TIMESTAMP': pa.timestamp('us', tz='UTC'),
+    'DATETIME': pa.timestamp('us'),
+    'DATE': pa.date32(),
+}
+# standard sql type names -> the names used in pinned schemas
+TYPE_ALIASES = {'INT64': 'INTEGER', 'FLOAT64': 'FLOAT', 'BOOL': 'BOOLEAN'}
+
+class SchemaRegistry():
+    """
+    Pins the BigQuery schema of each table and versions it.
+
+    The pin is seeded from the schema of the existing table, so a new
+    process never re-infers a type the table already has; the table wins
+    over a stale pin. For a new table the first load infers the schema from
+    the dataframe. Later loads reuse the pinned types, so a page where a col
+    is all-null (e.g. elev_high) still loads with the pinned type instead of
+    whatever pandas inferred. All-null cols are never pinned. A col that was
+    never seen before is added as a new NULLABLE field and bumps the version.
+    The only type change is widening INTEGER to FLOAT when a col receives
+    fractional values (e.g. average_watts), so they are never truncated.
+    With a path, every table's versions are kept in `<path>/<table_id>.json`
+    so the pin survives between runs.
+
+    Attributes:
+        - path: directory holding the schema files [default = None, in memory only]
+    Methods:
+        - infer: infers BigQuery fields from a dataframe
+        - from_bigquery: fields of a BigQuery table schema
+        - schema_for: pinned schema for a table, extended with new cols of df
+        - version: current schema version of a table
+        - to_parquet: serializes a dataframe to Parquet with a pinned schema
+    """
+    def __init__(self, path: str = None):
+        """
+        Constructor for SchemaRegistry class
+
+        :param path: directory holding the schema files [default = None, in memory only]
+        """
+        self.path = path
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._logger = logging.getLogger(__name__)
+        if path:
+            os.makedirs(path, exist_ok=True)
+
+    def _file(self, table_id: str) -> str:
+        return os.path.join(self.path, f'{table_id}.json')
+
+    def _load(self, table_id: str) -> list:
+        """Versions of a table, read from disk once"""
+        if table_id not in self._versions:
+            versions = []
+            if self.path and os.path.exists(self._file(table_id)):
+                with open(self._file(table_id), encoding='utf-8') as f:
+                    versions = json.load(f)['versions']
+            self._versions[table_id] = versions
+        return self._versions[table_id]
+
+    def _save(self, table_id: str):
+        """Writes the versions of a table atomically"""
+        if not self.path:
+            return
+        tmp_path = self._file(table_id) + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'table_id': table_id, 'versions': self._versions[table_id]}, f, indent=2)
+        os.replace(tmp_path, self._file(table_id))
+
+    @staticmethod
+    def _field_type(series: pd.Series) -> tuple:
+        """(BigQuery type, mode) of a dataframe col"""
+        dtype = series.dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            return SchemaRegistry._field_type(pd.Series(dtype.categories))
+        if pd.api.types.is_bool_dtype(dtype):
+            return 'BOOLEAN', 'NULLABLE'
+        if pd.api.types.is_integer_dtype(dtype):
+            return 'INTEGER', 'NULLABLE'
+        if pd.api.types.is_float_dtype(dtype):
+            return 'FLOAT', 'NULLABLE'
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            return ('TIMESTAMP' if getattr(dtype, 'tz', None) is not None else 'DATETIME'), 'NULLABLE'
+        if pd.api.types.is_string_dtype(dtype) and not pd.api.types.is_object_dtype(dtype):
+            return 'STRING', 'NULLABLE'
+
+        # object cols: look at the first non-null value
+        values = series.dropna()
+        if values.empty:
+            return 'STRING', 'NULLABLE'
+        value = values.iloc[0]
+        if isinstance(value, (list, tuple)):
+            items = [item for row in values for item in row]
+            if items and all(isinstance(item, int) and not isinstance(item, bool) for item in items):
+                return 'INTEGER', 'REPEATED'
+            return 'FLOAT', 'REPEATED'
+        if isinstance(value, bool):
+            return 'BOOLEAN', 'NULLABLE'
+        if isinstance(value, int):
+            return 'INTEGER', 'NULLABLE'
+        if isinstance(value, float):
+            return 'FLOAT', 'NULLABLE'
+        return 'STRING', 'NULLABLE'
+
+    def infer(self, df: pd.DataFrame) -> list:
+        """
+        Infers BigQuery fields from a dataframe. All-null cols carry no type
+        and are left out.
+
+        :param df: dataframe to infer from ('.' in col names are replaced with '_')
+        :return fields: list of {'name', 'type', 'mode'} dicts
+        """
+        fields = []
+        for col in df.columns:
+            if not df[col].notna().any():
+                continue
+            field_type, mode = self._field_type(df[col])
+            fields.append({'name': col.replace('.', '_'), 'type': field_type, 'mode': mode})
+        return fields
+
+    @staticmethod
+    def from_bigquery(schema: list) -> list:
+        """
+        Fields of a BigQuery table schema (types without an Arrow mapping are left out).
+
+        :param schema: list of bigquery.SchemaField
+        :return fields: list of {'name', 'type', 'mode'} dicts
+        """
+        fields = []
+        for field in schema:
+            field_type = TYPE_ALIASES.get(field.field_type, field.field_type)
+            if field_type in ARROW_TYPES:
+                fields.append({'name': field.name, 'type': field_type, 'mode': field.mode or 'NULLABLE'})
+        return fields
+
+    def schema_for(self, table_id: str, df: pd.DataFrame, table_schema: list = None) -> list:
+        """
+        Pinned schema for a table, synced with the existing table's schema and
+        extended with cols of df it does not have yet.
+
+        :param table_id: 'project.dataset.table'
+        :param df: dataframe about to be loaded
+        :param table_schema: list of bigquery.SchemaField of the existing table [default = None, new table]
+        :return fields: list of {'name', 'type', 'mode'} dicts of the current version
+        """
+        with self._lock:
+            versions = self._load(table_id)
+            fields = [dict(field) for field in versions[-1]['fields']] if versions else []
+            pinned = {field['name']: field for field in fields}
+            changed = []
+            # the table is the source of truth for the cols it already has
+            for field in self.from_bigquery(table_schema or []):
+                if field['name'] not in pinned:
+                    fields.append(field)
+                    pinned[field['name']] = field
+                    changed.append(field['name'])
+                elif pinned[field['name']] != field:
+                    pinned[field['name']].update(field)
+                    changed.append(field['name'])
+            for field in self.infer(df):
+                current = pinned.get(field['name'])
+                if current is None:
+                    fields.append(field)
+                    pinned[field['name']] = field
+                    changed.append(field['name'])
+                elif (current['type'], field['type']) == ('INTEGER', 'FLOAT') and current['mode'] == field['mode'] == 'NULLABLE':
+                    # fractional values would be truncated by an INTEGER col
+                    current['type'] = 'FLOAT'
+                    changed.append(field['name'])
+            if changed:
+                versions.append({'version': len(versions) + 1, 'fields': fields})
+                self._save(table_id)
+                self._logger.info('Pinned schema v%s for %s (changed %s).', len(versions), table_id, changed)
+            return fields
+
+    def version(self, table_id: str) -> int:
+        """
+        Current schema version of a table.
+
+        :param table_id: 'project.dataset.table'
+        :return version: 0 if nothing is pinned yet
+        """
+        with self._lock:
+            return len(self._load(table_id))
+
+    @staticmethod
+    def to_bigquery(fields: list) -> list:
+        """List of bigquery.SchemaField for the given fields"""
+        return [bigquery.SchemaField(field['name'], field['type'], mode=field['mode']) for field in fields]
+
+    @staticmethod
+    def to_arrow(fields: list) -> pa.Schema:
+        """Arrow schema for the given fields"""
+        arrow_fields = []
+        for field in fields:
+            arrow_type = ARROW_TYPES[field['type']]
+            if field['mode'] == 'REPEATED':
+                arrow_type = pa.list_(arrow_type)
+            arrow_fields.append(pa.field(field['name'], arrow_type, nullable=field['mode'] != 'REQUIRED'))
+        return pa.schema(arrow_fields)
+
+    def to_parquet(self, df: pd.DataFrame, fields: list, compression: str = 'snappy') -> io.BytesIO:
+        """
+        Serializes a dataframe to Parquet with the pinned schema.
+
+        Cols are written in schema order and cast to the pinned types; cols
+        the schema has but df lacks are written as nulls. No pandas metadata
+        is stored, so equal frames give byte-identical payloads.
+
+        :param df: dataframe to serialize ('.' in col names are replaced with '_')
+        :param fields: list of {'name', 'type', 'mode'} dicts
+        :param compression: Parquet codec [default = 'snappy']
+        :return buffer: BytesIO positioned at the start of the Parquet file
+        """
+        df = df.rename(columns=lambda col: col.replace('.', '_'))
+        arrow_schema = self.to_arrow(fields)
+
+        columns = []
+        for field in arrow_schema:
+            if field.name not in df.columns:
+                columns.append(pa.nulls(len(df), type=field.type))
+                continue
+            series = df[field.name]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                series = series.astype(object)
+            columns.append(pa.Array.from_pandas(series, type=field.type))
+        table = pa.Table.from_arrays(columns, schema=arrow_schema)
+
+        buffer = io.BytesIO()
+        pq.write_table(table, buffer, compression=compression)
+        buffer.seek(0)
+        return buffer
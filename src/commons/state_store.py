@@ -0,0 +1,184 @@
+"""
+State Store Module:
+
+Author: Jairus Martinez
+Date: 10/17/2026
+
+This module contains the local sqlite store that tracks what has already
+been ingested into BigQuery (activity ids, watermark and run metadata).
+"""
+import logging
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime
+import pandas as pd
+
+class StateStore():
+    """
+    Embedded record of the activities loaded into each BigQuery table.
+
+    After every successful load the ids and dates are written here, so the
+    next run can answer "what's new" and "what's the watermark" without a
+    query job. If the store drifts from the warehouse (manual edits, a lost
+    file), `reconcile` rebuilds it from the table.
+
+    Attributes:
+        - path: path to the sqlite file
+    Methods:
+        - record_load: records the ids/dates of a successful load and the run metadata
+        - known_ids: set of ingested activity ids for a table
+        - watermark: newest ingested date for a table
+        - is_empty: checks if nothing is recorded for a table
+        - last_run: metadata of the latest recorded run for a table
+        - reconcile: replaces the recorded ids/dates of a table with the table contents
+    """
+    def __init__(self, path: str):
+        """
+        Constructor for StateStore class
+
+        :param path: path to the sqlite file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._known_ids = {}
+        self._logger = logging.getLogger(__name__)
+
+        with closing(self._connect()) as conn, conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS activities (
+                    table_id TEXT NOT NULL,
+                    id INTEGER NOT NULL,
+                    start_date TEXT,
+                    PRIMARY KEY (table_id, id)
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    table_id TEXT NOT NULL,
+                    finished_at TEXT NOT NULL,
+                    mode TEXT NOT NULL,
+                    row_count INTEGER NOT NULL,
+                    watermark TEXT
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=60)
+
+    @staticmethod
+    def _rows(df: pd.DataFrame, date_col_name: str) -> list:
+        """(id, ISO date) pairs of a dataframe, dates sort lexically"""
+        ids = df['id'].astype('int64').tolist()
+        if date_col_name in df.columns:
+            dates = pd.to_datetime(df[date_col_name]).dt.strftime('%Y-%m-%d %H:%M:%S').tolist()
+        else:
+            dates = [None] * len(ids)
+        return list(zip(ids, dates))
+
+    def record_load(self, table_id: str, df: pd.DataFrame, date_col_name: str, mode: str = 'append'):
+        """
+        Records the ids/dates of a successful load and the run metadata.
+
+        :param table_id: 'project.dataset.table' the data was loaded into
+        :param df: dataframe that was loaded
+        :param date_col_name: name of the date col
+        :param mode: how the data was loaded (upload, append, merge, ...) [default = 'append']
+        """
+        rows = self._rows(df, date_col_name)
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO activities (table_id, id, start_date) VALUES (?, ?, ?)',
+                [(table_id, activity_id, date) for activity_id, date in rows]
+            )
+            watermark = conn.execute('SELECT MAX(start_date) FROM activities WHERE table_id = ?',
+                                     (table_id,)).fetchone()[0]
+            conn.execute(
+                'INSERT INTO runs (table_id, finished_at, mode, row_count, watermark) VALUES (?, ?, ?, ?, ?)',
+                (table_id, datetime.now().isoformat(timespec='seconds'), mode, len(rows), watermark)
+            )
+            if table_id in self._known_ids:
+                self._known_ids[table_id].update(activity_id for activity_id, _ in rows)
+
+    def known_ids(self, table_id: str) -> set:
+        """
+        Set of ingested activity ids for a table (loaded once, then kept in sync).
+
+        :param table_id: 'project.dataset.table'
+        :return ids: set of activity ids
+        """
+        with self._lock:
+            if table_id not in self._known_ids:
+                with closing(self._connect()) as conn:
+                    self._known_ids[table_id] = {
+                        row[0] for row in conn.execute('SELECT id FROM activities WHERE table_id = ?', (table_id,))
+                    }
+            return self._known_ids[table_id]
+
+    def watermark(self, table_id: str):
+        """
+        Newest ingested date for a table.
+
+        :param table_id: 'project.dataset.table'
+        :return latest: pd.Timestamp, None if nothing is recorded
+        """
+        with closing(self._connect()) as conn:
+            latest = conn.execute('SELECT MAX(start_date) FROM activities WHERE table_id = ?',
+                                  (table_id,)).fetchone()[0]
+        return None if latest is None else pd.Timestamp(latest)
+
+    def is_empty(self, table_id: str) -> bool:
+        """
+        Checks if nothing is recorded for a table.
+
+        :param table_id: 'project.dataset.table'
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT 1 FROM activities WHERE table_id = ? LIMIT 1', (table_id,)).fetchone()
+        return row is None
+
+    def last_run(self, table_id: str) -> dict:
+        """
+        Metadata of the latest recorded run for a table.
+
+        :param table_id: 'project.dataset.table'
+        :return run: dict with run_id, finished_at, mode, row_count and watermark, None if no runs
+        """
+        with closing(self._connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute('SELECT * FROM runs WHERE table_id = ? ORDER BY run_id DESC LIMIT 1',
+                               (table_id,)).fetchone()
+        return None if row is None else dict(row)
+
+    def reconcile(self, table_id: str, df, date_col_name: str) -> int:
+        """
+        Replaces the recorded ids/dates of a table with the table contents.
+
+        :param table_id: 'project.dataset.table'
+        :param df: dataframe (or iterator of dataframe chunks) with the id and date cols of every row in the table
+        :param date_col_name: name of the date col
+        :return count: number of ids recorded
+        """
+        chunks = [df] if isinstance(df, pd.DataFrame) else df
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute('DELETE FROM activities WHERE table_id = ?', (table_id,))
+            for chunk in chunks:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO activities (table_id, id, start_date) VALUES (?, ?, ?)',
+                    [(table_id, activity_id, date) for activity_id, date in self._rows(chunk, date_col_name)]
+                )
+            count, watermark = conn.execute('SELECT COUNT(*), MAX(start_date) FROM activities WHERE table_id = ?',
+                                            (table_id,)).fetchone()
+            conn.execute(
+                'INSERT INTO runs (table_id, finished_at, mode, row_count, watermark) VALUES (?, ?, ?, ?, ?)',
+                (table_id, datetime.now().isoformat(timespec='seconds'), 'reconcile', count, watermark)
+            )
+            self._known_ids.pop(table_id, None)
+        self._logger.info('Reconciled state for %s: %s activities.', table_id, count)
+        return count
@@ -0,0 +1,126 @@
+"""
+Token Cache Module:
+
+Author: Jairus Martinez
+Date: 10/17/2026
+
+This module contains the sqlite-backed cache for Strava OAuth tokens.
+"""
+import logging
+import sqlite3
+import time
+from contextlib import closing
+
+class TokenCache():
+    """
+    Caches Strava access tokens, their expiry and the rotated refresh token.
+
+    The cache is a sqlite file so several workers (threads or processes)
+    can share it. Refreshes run inside an exclusive (BEGIN IMMEDIATE)
+    transaction, so only one worker exchanges the refresh token while the
+    others wait and then reuse the new access token.
+
+    Attributes:
+        - path: path to the sqlite file
+        - refresh_margin: seconds before expires_at at which a token is treated as expired
+    Methods:
+        - get: cached token for a client id
+        - is_fresh: checks if a cached token can still be used
+        - refresh: returns a fresh token, exchanging the refresh token if needed
+    """
+    def __init__(self, path: str, refresh_margin: int = 300, clock=time.time):
+        """
+        Constructor for TokenCache class
+
+        :param path: path to the sqlite file
+        :param refresh_margin: seconds before expires_at at which a token is treated as expired [default = 300]
+        :param clock: function returning the current epoch time in seconds
+        """
+        self.path = path
+        self.refresh_margin = refresh_margin
+        self._clock = clock
+        self._logger = logging.getLogger(__name__)
+
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS tokens (
+                    client_id TEXT PRIMARY KEY,
+                    access_token TEXT NOT NULL,
+                    expires_at INTEGER NOT NULL,
+                    refresh_token TEXT
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        """Opens a connection in autocommit mode (transactions are explicit)"""
+        return sqlite3.connect(self.path, timeout=60, isolation_level=None)
+
+    @staticmethod
+    def _read(conn: sqlite3.Connection, client_id: str) -> dict:
+        row = conn.execute(
+            'SELECT access_token, expires_at, refresh_token FROM tokens WHERE client_id = ?',
+            (client_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {'access_token': row[0], 'expires_at': row[1], 'refresh_token': row[2]}
+
+    def get(self, client_id: str) -> dict:
+        """
+        Gets the cached token for a client id.
+
+        :param client_id: Strava app client id
+        :return token: dict with access_token, expires_at and refresh_token, None if not cached
+        """
+        with closing(self._connect()) as conn:
+            return self._read(conn, str(client_id))
+
+    def is_fresh(self, token: dict) -> bool:
+        """
+        Checks if a cached token can still be used.
+
+        :param token: dict with access_token and expires_at
+        """
+        return token is not None and token['expires_at'] - self.refresh_margin > self._clock()
+
+    def refresh(self, client_id: str, exchange) -> dict:
+        """
+        Returns a fresh token for a client id, calling `exchange` only if the
+        cached token is missing or about to expire.
+
+        :param client_id: Strava app client id
+        :param exchange: function taking the cached refresh token (or None) and returning
+            a dict with access_token, expires_at and refresh_token
+        :return token: dict with access_token, expires_at and refresh_token
+        """
+        client_id = str(client_id)
+        with closing(self._connect()) as conn:
+            # take the write lock before re-checking so only one worker refreshes
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                cached = self._read(conn, client_id)
+                if self.is_fresh(cached):
+                    conn.execute('COMMIT')
+                    return cached
+
+                self._logger.info('Access token missing or expiring. Refreshing...')
+                token = exchange(cached['refresh_token'] if cached else None)
+                conn.execute(
+                    """
+                    INSERT INTO tokens (client_id, access_token, expires_at, refresh_token)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(client_id) DO UPDATE SET
+                        access_token = excluded.access_token,
+                        expires_at = excluded.expires_at,
+                        refresh_token = excluded.refresh_token
+                    """,
+                    (client_id, token['access_token'], int(token['expires_at']), token.get('refresh_token'))
+                )
+                conn.execute('COMMIT')
+                return token
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
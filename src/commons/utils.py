@@ -6,6 +6,12 @@ Date: 12/21/2023
 
 This module contains any utility functions needed for the ETL code.
 """
+import logging
+import time
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+
 class UnitConversion():
     """
     Class to convert units in Strava Data
@@ -59,4 +65,240 @@ class UnitConversion():
         :rtype: float 
         """
         mph = x * 2.23694
-        return round(mph, 2)    
+        return round(mph, 2)
+
+class ConversionEngine():
+    """
+    Applies a declarative list of unit conversions to a dataframe in one pass.
+
+    Each spec entry is a dict with the column, the unit (a UnitConversion
+    method name) and the rounding precision. All converted columns are copied
+    into one contiguous float64 block, scaled and rounded with in-place NumPy
+    ufuncs, then written back, so the cost no longer grows with one
+    temporary per column per step.
+
+    Attributes:
+        - spec: list of {'column', 'unit', 'precision'} dicts
+    Methods:
+        - apply: converts the spec columns of a dataframe
+    """
+    # unit -> (divisor, multiplier), matching the UnitConversion methods
+    UNITS = {
+        'sec_to_min': (60.0, 1.0),
+        'meters_to_miles': (1609.344, 1.0),
+        'meters_to_feet': (1.0, 3.28084),
+        'mps_to_mph': (1.0, 2.23694),
+    }
+
+    DEFAULT_SPEC = [
+        {'column': 'distance', 'unit': 'meters_to_miles', 'precision': 2},
+        {'column': 'moving_time', 'unit': 'sec_to_min', 'precision': 2},
+        {'column': 'elapsed_time', 'unit': 'sec_to_min', 'precision': 2},
+        {'column': 'total_elevation_gain', 'unit': 'meters_to_feet', 'precision': 2},
+        {'column': 'average_speed', 'unit': 'mps_to_mph', 'precision': 2},
+        {'column': 'max_speed', 'unit': 'mps_to_mph', 'precision': 2},
+        {'column': 'elev_high', 'unit': 'meters_to_feet', 'precision': 2},
+        {'column': 'elev_low', 'unit': 'meters_to_feet', 'precision': 2},
+    ]
+
+    def __init__(self, spec: list = None):
+        """
+        Constructor for ConversionEngine class
+
+        :param spec: list of {'column', 'unit', 'precision'} dicts [default = DEFAULT_SPEC]
+        :raises ValueError: if a spec entry uses an unknown unit
+        """
+        self.spec = spec if spec is not None else self.DEFAULT_SPEC
+        for entry in self.spec:
+            if entry['unit'] not in self.UNITS:
+                raise ValueError(f"Unknown unit '{entry['unit']}' for column '{entry['column']}'. "
+                                 f"Expected one of {sorted(self.UNITS)}.")
+        self._logger = logging.getLogger(__name__)
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Converts the spec columns of a dataframe. Columns missing from the
+        dataframe (e.g. elev_high on a page of indoor activities) are skipped.
+
+        :param df: dataframe to convert
+        :returns: dataframe with converted columns
+        :rtype: pd.DataFrame
+        """
+        # sort by precision so each rounding group is a contiguous slice of the block
+        entries = sorted((e for e in self.spec if e['column'] in df.columns),
+                         key=lambda e: e.get('precision', 2))
+        skipped = [e['column'] for e in self.spec if e['column'] not in df.columns]
+        if skipped:
+            self._logger.debug('Skipping conversions for missing cols: %s', skipped)
+        if not entries:
+            return df
+
+        columns = [e['column'] for e in entries]
+        divisors = np.array([self.UNITS[e['unit']][0] for e in entries])
+        multipliers = np.array([self.UNITS[e['unit']][1] for e in entries])
+
+        # column-major so every column (and every precision group) is contiguous
+        block = np.empty((len(df), len(columns)), dtype=np.float64, order='F')
+        for j, col in enumerate(columns):
+            block[:, j] = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+
+        np.divide(block, divisors, out=block)
+        np.multiply(block, multipliers, out=block)
+
+        start = 0
+        precisions = [e.get('precision', 2) for e in entries]
+        while start < len(entries):
+            end = start
+            while end < len(entries) and precisions[end] == precisions[start]:
+                end += 1
+            group = block[:, start:end]
+            np.round(group, precisions[start], out=group)
+            start = end
+
+        converted = pd.DataFrame(block, index=df.index, columns=columns, copy=False)
+        df[columns] = converted
+        return df
+
+class DtypeOptimizer():
+    """
+    Shrinks a transformed activity dataframe to compact dtypes.
+
+    Integers are downcast to the smallest signed type that holds them,
+    low-cardinality strings are dictionary-encoded as categoricals, the
+    remaining strings use the Arrow-backed string dtype and nullable bools
+    use the 'boolean' dtype. Floats are only downcast to float32 when asked,
+    since the rounded values are not exactly representable in float32.
+
+    Attributes:
+        - category_ratio: max unique/rows ratio for a string col to be dictionary-encoded
+        - downcast_floats: downcast float64 cols to float32
+    Methods:
+        - optimize: converts a dataframe to the compact dtypes and logs memory before/after
+        - memory_usage: deep memory usage of a dataframe in bytes
+    """
+    def __init__(self, category_ratio: float = 0.5, downcast_floats: bool = False):
+        """
+        Constructor for DtypeOptimizer class
+
+        :param category_ratio: max unique/rows ratio for a string col to be dictionary-encoded [default = 0.5]
+        :param downcast_floats: downcast float64 cols to float32 [default = False]
+        """
+        self.category_ratio = category_ratio
+        self.downcast_floats = downcast_floats
+        self._logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def memory_usage(df: pd.DataFrame) -> int:
+        """
+        Deep memory usage of a dataframe in bytes.
+
+        :param df: dataframe to measure
+        """
+        return int(df.memory_usage(deep=True).sum())
+
+    def optimize(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Converts a dataframe to compact dtypes and logs memory before/after.
+
+        :param df: dataframe to optimize
+        :returns: dataframe with compact dtypes
+        :rtype: pd.DataFrame
+        """
+        before = self.memory_usage(df)
+        converted = {}
+        for name, col in df.items():
+            if pd.api.types.is_bool_dtype(col) or isinstance(col.dtype, pd.CategoricalDtype):
+                continue
+            if pd.api.types.is_integer_dtype(col):
+                converted[name] = pd.to_numeric(col, downcast='integer')
+            elif pd.api.types.is_float_dtype(col):
+                if self.downcast_floats:
+                    converted[name] = pd.to_numeric(col, downcast='float')
+            elif pd.api.types.is_object_dtype(col) or pd.api.types.is_string_dtype(col):
+                types = col.dropna().map(type)
+                # lists (e.g. start_latlng), mixed and all-null cols are left alone
+                if len(types) == 0:
+                    continue
+                if types.eq(bool).all():
+                    converted[name] = col.astype('boolean')
+                elif types.eq(str).all():
+                    if col.nunique() <= self.category_ratio * len(col):
+                        converted[name] = col.astype('category')
+                    else:
+                        converted[name] = col.astype(pd.StringDtype('pyarrow'))
+
+        if converted:
+            df = df.assign(**converted)
+        after = self.memory_usage(df)
+        self._logger.info('Optimized dtypes: %.1f KB -> %.1f KB (%.0f%% smaller).',
+                          before / 1024, after / 1024, 100 * (1 - after / before) if before else 0)
+        return df
+
+
+class ProgressTracker():
+    """
+    Tracks the progress of a long job and estimates its ETA from the
+    throughput measured in this run (units finished before a resume count
+    towards progress, not towards the rate).
+
+    Attributes:
+        - total: number of units (e.g. backfill windows) in the job
+        - done: number of units finished
+        - items: number of items (e.g. activities) processed in this run
+    Methods:
+        - update: records finished units
+        - rate: measured units per second
+        - eta_seconds: estimated seconds left
+        - report: one-line progress summary
+    """
+    def __init__(self, total: int, done: int = 0, unit: str = 'windows', clock=time.monotonic):
+        """
+        Constructor for ProgressTracker class
+
+        :param total: number of units in the job
+        :param done: number of units already finished (e.g. before a resume) [default = 0]
+        :param unit: name of a unit in the report [default = 'windows']
+        :param clock: function returning a monotonic time in seconds
+        """
+        self.total = total
+        self.done = done
+        self.items = 0
+        self.unit = unit
+        self._clock = clock
+        self._started_at = clock()
+        self._done_at_start = done
+
+    def update(self, units: int = 1, items: int = 0):
+        """
+        Records finished units.
+
+        :param units: number of units finished [default = 1]
+        :param items: number of items they held [default = 0]
+        """
+        self.done += units
+        self.items += items
+
+    def rate(self) -> float:
+        """Measured units per second in this run (0 before the first unit)"""
+        elapsed = self._clock() - self._started_at
+        finished = self.done - self._done_at_start
+        return finished / elapsed if elapsed > 0 and finished > 0 else 0.0
+
+    def eta_seconds(self):
+        """Estimated seconds left, None until a rate has been measured"""
+        rate = self.rate()
+        if rate == 0:
+            return None
+        return max(self.total - self.done, 0) / rate
+
+    def report(self) -> str:
+        """
+        One-line progress summary.
+
+        :return report: e.g. '3/12 windows (25%), 150 activities, 0.10 windows/s, ETA 0:01:30'
+        """
+        percent = 100 * self.done / self.total if self.total else 100
+        eta = self.eta_seconds()
+        eta = 'unknown' if eta is None else str(timedelta(seconds=round(eta)))
+        return (f'{self.done}/{self.total} {self.unit} ({percent:.0f}%), {self.items} activities, '
+                f'{self.rate():.2f} {self.unit}/s, ETA {eta}')
@@ -5,16 +5,51 @@ import time
 import datetime
 import yaml
 from commons.connectors import StravaAPIConnector, BigQueryConnector
+from commons.rate_limiter import StravaRateLimiter
+from commons.token_cache import TokenCache
+from commons.response_cache import ResponseCache
+from commons.state_store import StateStore
+from commons.load_buffer import LoadBuffer
+from commons.checkpoints import CheckpointStore
+from commons.backfill import BackfillLoader
+from commons.schemas import SchemaRegistry
+from commons.metadata_cache import TableMetadataCache
+from commons.query_cache import QueryResultCache
+from commons.detail_store import DetailStore
 from commons.slack_notifications import SlackNotifications
 from transformers.strava_etl import StravaETL
+from transformers.enrichment import DetailEnricher
+from transformers.streams import StreamsExtractor
+from transformers.analytics import StreamAnalytics
+from transformers.spatial import PolylineDecoder
+from transformers.children import ChildTableBuilder
 
 def parse_config():
-    """Parse YAML config file from CLI arg input"""
+    """Parse YAML config file and options from CLI arg input"""
     parser = argparse.ArgumentParser(description='Run the Strava EL Job.')
     parser.add_argument('config', help='A configuration file in YAML format.')
+    parser.add_argument('command', nargs='?', default='run', choices=['run', 'reconcile', 'flush', 'backfill', 'enrich', 'streams', 'analytics', 'near'],
+                        help='run: the ETL job (default), reconcile: rebuild the local state store from BigQuery, '
+                             'flush: load everything in the load buffer, backfill: load a date range window by window, '
+                             'enrich: fetch the details of loaded activities that have none, '
+                             'streams: load the per-sample streams of loaded activities, '
+                             'analytics: recompute the stream analytics of every activity, '
+                             'near: list the activities starting near a point.')
+    parser.add_argument('--replay', action='store_true',
+                        help='Load cached Strava pages (strava_api.response_cache) without calling the API.')
+    parser.add_argument('--start', help='backfill: first date of the range, e.g. 2020-01-01.')
+    parser.add_argument('--end', default=None, help='backfill: end of the range (exclusive) [default = now].')
+    parser.add_argument('--window-days', type=int, default=30, help='backfill: days per checkpointed window [default = 30].')
+    parser.add_argument('--lat', type=float, help='near: latitude of the point.')
+    parser.add_argument('--lng', type=float, help='near: longitude of the point.')
+    parser.add_argument('--radius-m', type=float, default=1000, help='near: radius in meters [default = 1000].')
     args = parser.parse_args()
+    if args.command == 'backfill' and args.start is None:
+        parser.error('backfill needs --start')
+    if args.command == 'near' and (args.lat is None or args.lng is None):
+        parser.error('near needs --lat and --lng')
     config = yaml.safe_load(open(args.config, encoding='utf-8'))
-    return config
+    return config, args
 
 def initialize_logging(config):
     """
@@ -42,26 +77,158 @@ def initialize_connectors(config):
 
     :param config: yaml config that is read in
     """
+    rate_limit = config['strava_api'].get('rate_limit', {})
+    rate_limiter = StravaRateLimiter(
+        short_limit=rate_limit.get('short_limit', 200),
+        daily_limit=rate_limit.get('daily_limit', 2000),
+        safety_margin=rate_limit.get('safety_margin', 0)
+    )
+    token_cache = None
+    if config['strava_api'].get('token_cache_path'):
+        token_cache = TokenCache(config['strava_api']['token_cache_path'])
+    response_cache = None
+    cache_config = config['strava_api'].get('response_cache')
+    if cache_config:
+        response_cache = ResponseCache(
+            cache_config['path'],
+            ttl_seconds=cache_config.get('ttl_seconds'),
+            max_bytes=cache_config.get('max_bytes')
+        )
+    # one session serves the page, detail and stream workers, so it is sized for the largest pool
+    stage_configs = [config['strava_api'].get(stage) for stage in ('enrichment', 'streams')]
+    pool_size = max([config['strava_api'].get('concurrency', 1)]
+                    + [stage_config.get('concurrency', 4) for stage_config in stage_configs if stage_config])
     sac = StravaAPIConnector(
         config['strava_api']['STRAVA_AUTH_URL'],
         config['strava_api']['STRAVA_ACTIVITIES_URL'],
-        config['strava_api']['STRAVA_PAYLOAD']
+        config['strava_api']['STRAVA_PAYLOAD'],
+        pool_size=pool_size,
+        max_retries=config['strava_api'].get('max_retries', 3),
+        backoff_factor=config['strava_api'].get('backoff_factor', 0.5),
+        rate_limiter=rate_limiter,
+        token_cache=token_cache,
+        response_cache=response_cache
     )
+    state_store = None
+    if config['bigquery'].get('state_store_path'):
+        state_store = StateStore(config['bigquery']['state_store_path'])
+    load_buffer = None
+    buffer_config = config['bigquery'].get('load_buffer')
+    if buffer_config:
+        load_buffer = LoadBuffer(
+            buffer_config['path'],
+            max_rows=buffer_config.get('max_rows', 1000),
+            max_bytes=buffer_config.get('max_bytes', 16 * 1024 * 1024),
+            max_age_seconds=buffer_config.get('max_age_seconds', 3600)
+        )
+    backfill_loader = None
+    backfill_config = config['bigquery'].get('backfill')
+    if backfill_config:
+        backfill_loader = BackfillLoader(
+            CheckpointStore(backfill_config['checkpoint_path']),
+            max_workers=backfill_config.get('max_workers', 4),
+            chunk_by=backfill_config.get('chunk_by', 'month')
+        )
+    child_tables = None
+    child_tables_config = config['strava_api'].get('child_tables')
+    if child_tables_config:
+        child_tables = ChildTableBuilder(fields=child_tables_config.get('fields'))
+    enricher = None
+    enrichment_config = config['strava_api'].get('enrichment')
+    if enrichment_config:
+        fields = list(enrichment_config.get('fields') or DetailEnricher.DEFAULT_FIELDS)
+        if child_tables is not None:
+            # the list-valued fields only come with the detailed activity
+            fields += [field for field in child_tables.fields if field not in fields]
+        enricher = DetailEnricher(
+            sac,
+            DetailStore(enrichment_config['detail_store_path']),
+            concurrency=enrichment_config.get('concurrency', 4),
+            fields=fields,
+            budget_reserve=enrichment_config.get('budget_reserve', 100)
+        )
+    streams_extractor = None
+    streams_config = config['strava_api'].get('streams')
+    if streams_config:
+        streams_extractor = StreamsExtractor(
+            sac,
+            streams_config['output_dir'],
+            concurrency=streams_config.get('concurrency', 4),
+            chunk_rows=streams_config.get('chunk_rows', 500000),
+            budget_reserve=streams_config.get('budget_reserve', 100),
+            compression=config['bigquery'].get('parquet_compression', 'snappy')
+        )
+    analytics = None
+    analytics_config = config['strava_api'].get('analytics')
+    if analytics_config:
+        analytics = StreamAnalytics(hr_zones=analytics_config.get('hr_zones'))
+    polyline_decoder = None
+    spatial_config = config['strava_api'].get('spatial')
+    if spatial_config:
+        polyline_decoder = PolylineDecoder(
+            geohash_precision=spatial_config.get('geohash_precision', 7),
+            tile_zoom=spatial_config.get('tile_zoom', 12)
+        )
     setl = StravaETL(
         sac,
         config['strava_api']['pages'],
         config['strava_api']['num_activities'],
-        config['strava_api']['cols_to_drop']
+        config['strava_api']['cols_to_drop'],
+        concurrency=config['strava_api'].get('concurrency', 1),
+        incremental=config['strava_api'].get('incremental', False),
+        streaming=config['strava_api'].get('streaming', False),
+        fast_decode=config['strava_api'].get('fast_decode', False),
+        conversions=config['strava_api'].get('conversions'),
+        optimize_dtypes=config['strava_api'].get('optimize_dtypes', False),
+        load_mode=config['bigquery'].get('load_mode', 'append'),
+        state_store=state_store,
+        load_buffer=load_buffer,
+        backfill_loader=backfill_loader,
+        enricher=enricher,
+        streams_extractor=streams_extractor,
+        analytics=analytics,
+        polyline_decoder=polyline_decoder,
+        child_tables=child_tables
+    )
+    partitioning = config['bigquery'].get('partitioning', {})
+    query_cache = None
+    query_cache_config = config['bigquery'].get('query_cache')
+    if query_cache_config:
+        query_cache = QueryResultCache(
+            query_cache_config['path'],
+            max_bytes=query_cache_config.get('max_bytes'),
+            max_entries=query_cache_config.get('max_entries')
+        )
+    bqc = BigQueryConnector(
+        service_account_json=config['bigquery']['SERVICE_ACCOUNT_JSON'],
+        load_format=config['bigquery'].get('load_format', 'dataframe'),
+        schema_registry=SchemaRegistry(config['bigquery'].get('schema_dir')),
+        parquet_compression=config['bigquery'].get('parquet_compression', 'snappy'),
+        partition_field=config['strava_api']['date_col_name'] if partitioning.get('enabled', False) else None,
+        partition_type=partitioning.get('type', 'DAY'),
+        cluster_fields=partitioning.get('cluster_fields', ('sport_type', 'id')),
+        metadata_cache=TableMetadataCache(ttl_seconds=config['bigquery'].get('metadata_ttl_seconds', 300)),
+        query_cache=query_cache
     )
-    bqc = BigQueryConnector(service_account_json=config['bigquery']['SERVICE_ACCOUNT_JSON'])
     return setl, bqc
 
+def initialize_checkpoints(config):
+    """
+    Initialize the CheckpointStore used by the backfill command.
+
+    :param config: yaml config that is read in
+    """
+    backfill_config = config['bigquery'].get('backfill') or {}
+    if not backfill_config.get('checkpoint_path'):
+        raise ValueError('The backfill command needs bigquery.backfill.checkpoint_path to be configured.')
+    return CheckpointStore(backfill_config['checkpoint_path'])
+
 def main():
     """Entry point for Strava ETL job"""
     try:
         start_time = time.time()
         
-        config = parse_config()
+        config, args = parse_config()
         initialize_logging(config)
         slack = initialize_slack(config)
         setl, bqc = initialize_connectors(config)
@@ -73,23 +240,56 @@ def main():
         dataset_name = config['bigquery']['dataset']
         table_name = config['bigquery']['table']
 
-        # table/date col for sql_query
-        table_id = ".".join([project_name, dataset_name, table_name])
         date_col_name = config['strava_api']['date_col_name']
 
-        sql_query = f"""
-        SELECT DISTINCT id, name, {date_col_name}
-        FROM {table_id}
-        ORDER BY {date_col_name} DESC
-        LIMIT 50;
-        """
-
-        setl.load(bqc, project_name, dataset_name, table_name, sql_query, date_col_name)
-        logger.info('ETL job complete.')
+        if args.command == 'reconcile':
+            setl.reconcile(bqc, project_name, dataset_name, table_name, date_col_name)
+            logger.info('Reconcile job complete.')
+            job = 'strava_reconcile'
+        elif args.command == 'flush':
+            flushed = setl.flush(bqc, project_name, dataset_name, table_name, date_col_name)
+            logger.info('Flush job complete. %s rows loaded.', flushed)
+            job = 'strava_flush'
+        elif args.command == 'backfill':
+            # without --end the range runs to now; an unfinished backfill reuses its checkpointed end
+            loaded = setl.backfill(bqc, project_name, dataset_name, table_name, date_col_name, args.start, args.end,
+                                   initialize_checkpoints(config), window_days=args.window_days)
+            logger.info('Backfill job complete. %s activities loaded.', loaded)
+            job = 'strava_backfill'
+        elif args.command == 'enrich':
+            enrichment_config = config['strava_api'].get('enrichment') or {}
+            updated = setl.enrich_history(bqc, project_name, dataset_name, table_name, date_col_name,
+                                          max_activities=enrichment_config.get('max_activities'))
+            logger.info('Enrich job complete. %s activities updated.', updated)
+            job = 'strava_enrich'
+        elif args.command == 'streams':
+            streams_config = config['strava_api'].get('streams') or {}
+            loaded = setl.load_streams(bqc, project_name, dataset_name, table_name,
+                                       streams_config.get('table', f'{table_name}_streams'), date_col_name,
+                                       max_activities=streams_config.get('max_activities'))
+            logger.info('Streams job complete. %s samples loaded.', loaded)
+            job = 'strava_streams'
+        elif args.command == 'analytics':
+            streams_config = config['strava_api'].get('streams') or {}
+            updated = setl.analyze(bqc, project_name, dataset_name, table_name,
+                                   streams_config.get('table', f'{table_name}_streams'))
+            logger.info('Analytics job complete. %s activities updated.', updated)
+            job = 'strava_analytics'
+        elif args.command == 'near':
+            nearby = setl.near(bqc, project_name, dataset_name, table_name, args.lat, args.lng, args.radius_m)
+            logger.info('%s activities start within %s m of (%s, %s):\n%s', len(nearby), args.radius_m,
+                        args.lat, args.lng, nearby.to_string(index=False))
+            job = 'strava_near'
+        else:
+            # freshness query is generated by bqc.freshness_query (partition-pruned)
+            setl.load(bqc, project_name, dataset_name, table_name, None, date_col_name, replay=args.replay)
+            logger.info('Strava rate budget: %s', setl.strava_api_connector.rate_budget())
+            logger.info('ETL job complete.')
+            job = 'strava_etl'
 
         duration = time.time() - start_time
 
-        slack.timing_message(job='strava_etl', duration=duration)
+        slack.timing_message(job=job, duration=duration)
         slack.send_custom_message('Job succeeded!')
     except Exception as e:
         slack.send_custom_message(f'Date: {datetime.datetime.now()}\nStravaETL job failed. Please check logs.')
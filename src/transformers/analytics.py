@@ -0,0 +1,217 @@
+"""
+Analytics
+
+Author: Jairus Martinez
+Date: 10/17/2026
+This module contains the vectorized best-effort, split and heart-rate zone
+analytics computed from activity streams.
+"""
+import logging
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+class StreamAnalytics():
+    """
+    Computes per-activity analytics from the long-format streams table
+    (one row per sample, see StreamsExtractor) in a handful of NumPy
+    kernels over all activities at once.
+
+    Each activity's distance (or time) is shifted past the end of the
+    previous activity, which turns the whole table into one monotonic axis:
+    a single searchsorted finds the end of every rolling window, cumulative
+    sums give the energy in any window, and reduceat/bincount aggregate per
+    activity. There are no Python loops over samples or activities (only
+    the split lists are cut per activity at the end).
+
+    Attributes:
+        - hr_zones: upper heart-rate bounds (inclusive) of zones 1 to n, the last zone is above [default = DEFAULT_HR_ZONES]
+    Methods:
+        - compute: derived cols of every activity in a streams table
+        - best_duration: fastest time to cover a distance, per activity
+        - best_average: best average of a stream over a duration, per activity
+        - splits: times of consecutive mile splits, per activity
+        - zone_times: time spent in each heart-rate zone, per activity
+    """
+    MILE = 1609.344
+    DISTANCE_EFFORTS = {'best_1k_s': 1000.0, 'best_mile_s': MILE, 'best_5k_s': 5000.0}
+    POWER_EFFORTS = {'best_20min_watts': 1200.0}
+    DEFAULT_HR_ZONES = [123, 153, 169, 184]
+    STREAM_COLS = ['activity_id', 'offset', 'time', 'distance', 'heartrate', 'watts']
+
+    def __init__(self, hr_zones: list = None):
+        """
+        Constructor for StreamAnalytics class
+
+        :param hr_zones: upper heart-rate bounds (inclusive) of zones 1 to n [default = DEFAULT_HR_ZONES]
+        """
+        self.hr_zones = sorted(hr_zones) if hr_zones is not None else list(self.DEFAULT_HR_ZONES)
+        self._logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def _column(streams, col: str) -> np.ndarray:
+        """A streams col as a float64 array, nulls as NaN"""
+        if isinstance(streams, pa.Table):
+            return streams.column(col).cast(pa.float64()).to_numpy()
+        return streams[col].to_numpy(dtype=np.float64, na_value=np.nan)
+
+    @staticmethod
+    def _axis(values: np.ndarray, seg: np.ndarray, starts: np.ndarray) -> tuple:
+        """
+        Stacks a per-activity non-decreasing stream (time or distance) into one
+        monotonic axis. Missing samples carry the previous value forward.
+
+        :return axis, offsets: the global axis and the shift of each activity
+        """
+        values = np.where(np.isnan(values), 0.0, np.maximum(values, 0.0))
+        span = np.maximum.reduceat(values, starts)
+        offsets = np.concatenate(([0.0], np.cumsum(span + 1.0)[:-1]))
+        return np.maximum.accumulate(values + offsets[seg]), offsets
+
+    @staticmethod
+    def _window_ends(axis: np.ndarray, seg: np.ndarray, width: float) -> tuple:
+        """End index of the window of `width` starting at every sample, and whether it stays in the activity"""
+        ends = np.searchsorted(axis, axis + width, side='left')
+        clipped = np.minimum(ends, len(axis) - 1)
+        return clipped, (ends < len(axis)) & (seg[clipped] == seg)
+
+    @staticmethod
+    def _per_activity(values: np.ndarray, starts: np.ndarray, reduce) -> np.ndarray:
+        """Reduces a per-sample array per activity, infinite results become NaN"""
+        result = reduce.reduceat(values, starts)
+        return np.where(np.isfinite(result), result, np.nan)
+
+    def best_duration(self, distance_axis: np.ndarray, time: np.ndarray, seg: np.ndarray, starts: np.ndarray,
+                      distance: float) -> np.ndarray:
+        """
+        Fastest time to cover a distance, per activity.
+
+        :param distance_axis: stacked distance axis (see _axis)
+        :param time: elapsed seconds of every sample
+        :param seg: activity index of every sample
+        :param starts: index of the first sample of every activity
+        :param distance: window distance in meters
+        :return seconds: one value per activity, NaN if the activity is shorter
+        """
+        ends, valid = self._window_ends(distance_axis, seg, distance)
+        durations = np.where(valid, time[ends] - time, np.inf)
+        return self._per_activity(durations, starts, np.minimum)
+
+    def best_average(self, time_axis: np.ndarray, values: np.ndarray, seg: np.ndarray, starts: np.ndarray,
+                     duration: float) -> np.ndarray:
+        """
+        Best time-weighted average of a stream over a duration, per activity
+        (e.g. 20 min power), from the cumulative sum of value * dt.
+
+        :param time_axis: stacked time axis (see _axis)
+        :param values: stream values of every sample (NaN where missing)
+        :param seg: activity index of every sample
+        :param starts: index of the first sample of every activity
+        :param duration: window length in seconds
+        :return average: one value per activity, NaN without the stream or if the activity is shorter
+        """
+        dt = np.diff(time_axis, prepend=time_axis[0])
+        dt[starts] = 0.0
+        cumulative = np.cumsum(np.where(np.isnan(values), 0.0, values) * dt)
+
+        ends, valid = self._window_ends(time_axis, seg, duration)
+        averages = np.where(valid, (cumulative[ends] - cumulative) / np.maximum(time_axis[ends] - time_axis, 1e-9),
+                            -np.inf)
+        best = self._per_activity(averages, starts, np.maximum)
+        has_values = np.add.reduceat((~np.isnan(values)).astype(np.int64), starts) > 0
+        return np.where(has_values, best, np.nan)
+
+    def splits(self, distance_axis: np.ndarray, offsets: np.ndarray, time: np.ndarray, starts: np.ndarray,
+               ends: np.ndarray) -> list:
+        """
+        Times of the consecutive full miles, per activity.
+
+        :param distance_axis: stacked distance axis (see _axis)
+        :param offsets: shift of every activity on the axis
+        :param time: elapsed seconds of every sample
+        :param starts: index of the first sample of every activity
+        :param ends: index of the last sample of every activity
+        :return splits: list with one array of split seconds per activity
+        """
+        counts = np.floor((distance_axis[ends] - offsets) / self.MILE).astype(np.int64)
+        counts = np.maximum(counts, 0)
+        split_seg = np.repeat(np.arange(len(starts)), counts)
+        # k = 1..count within each activity
+        k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+
+        marks = np.searchsorted(distance_axis, offsets[split_seg] + k * self.MILE, side='left')
+        at_mark = time[marks]
+        previous = np.where(k == 1, time[starts[split_seg]], np.roll(at_mark, 1))
+        return np.split(at_mark - previous, np.cumsum(counts)[:-1])
+
+    def zone_times(self, heartrate: np.ndarray, time_axis: np.ndarray, seg: np.ndarray, starts: np.ndarray) -> np.ndarray:
+        """
+        Seconds spent in each heart-rate zone, per activity. Each sample's
+        interval since the previous sample counts towards its zone.
+
+        :param heartrate: heart rate of every sample (NaN where missing)
+        :param time_axis: stacked time axis (see _axis)
+        :param seg: activity index of every sample
+        :param starts: index of the first sample of every activity
+        :return seconds: array of shape (activities, zones), NaN rows without heart rate
+        """
+        num_zones = len(self.hr_zones) + 1
+        dt = np.diff(time_axis, prepend=time_axis[0])
+        dt[starts] = 0.0
+
+        valid = ~np.isnan(heartrate)
+        zones = np.digitize(heartrate[valid], self.hr_zones, right=True)
+        seconds = np.bincount(seg[valid] * num_zones + zones, weights=dt[valid],
+                              minlength=len(starts) * num_zones).reshape(len(starts), num_zones)
+        has_hr = np.bincount(seg[valid], minlength=len(starts)) > 0
+        return np.where(has_hr[:, None], seconds, np.nan)
+
+    def compute(self, streams) -> pd.DataFrame:
+        """
+        Derived cols of every activity in a streams table.
+
+        :param streams: pa.Table or pd.DataFrame with the STREAM_COLS (any order)
+        :returns: dataframe with one row per activity: 'id', the best efforts,
+            'mile_splits_s' (list of split seconds) and 'hr_zone_<n>_s'
+        :rtype: pd.DataFrame
+        """
+        activity_ids = self._column(streams, 'activity_id').astype(np.int64)
+        columns = ['id'] + list(self.DISTANCE_EFFORTS) + list(self.POWER_EFFORTS) + ['mile_splits_s'] + \
+            [f'hr_zone_{zone}_s' for zone in range(1, len(self.hr_zones) + 2)]
+        if len(activity_ids) == 0:
+            return pd.DataFrame(columns=columns)
+
+        offset = self._column(streams, 'offset')
+        order = None
+        if np.any((np.diff(activity_ids) < 0) | ((np.diff(activity_ids) == 0) & (np.diff(offset) < 0))):
+            order = np.lexsort((offset, activity_ids))
+            activity_ids = activity_ids[order]
+
+        def column(col):
+            values = self._column(streams, col)
+            return values if order is None else values[order]
+
+        new_activity = np.concatenate(([True], activity_ids[1:] != activity_ids[:-1]))
+        starts = np.flatnonzero(new_activity)
+        ends = np.concatenate((starts[1:], [len(activity_ids)])) - 1
+        seg = np.cumsum(new_activity) - 1
+
+        time_axis, _ = self._axis(column('time'), seg, starts)
+        distance_axis, offsets = self._axis(column('distance'), seg, starts)
+        # seconds since the start of each activity
+        time = time_axis - time_axis[starts][seg]
+
+        derived = {'id': activity_ids[starts]}
+        for col, distance in self.DISTANCE_EFFORTS.items():
+            derived[col] = self.best_duration(distance_axis, time, seg, starts, distance)
+        watts = column('watts')
+        for col, duration in self.POWER_EFFORTS.items():
+            derived[col] = self.best_average(time_axis, watts, seg, starts, duration)
+        derived['mile_splits_s'] = [split.tolist() for split in
+                                    self.splits(distance_axis, offsets, time, starts, ends)]
+        zone_seconds = self.zone_times(column('heartrate'), time_axis, seg, starts)
+        for zone in range(zone_seconds.shape[1]):
+            derived[f'hr_zone_{zone + 1}_s'] = zone_seconds[:, zone]
+
+        self._logger.info('Computed analytics of %s activities from %s samples.', len(starts), len(activity_ids))
+        return pd.DataFrame(derived, columns=columns)
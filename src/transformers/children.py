@@ -0,0 +1,109 @@
+"""
+Children
+
+Author: Jairus Martinez
+Date: 10/17/2026
+This module contains the transform step that moves list-valued activity
+fields (splits, laps, segment efforts) into normalized child tables.
+"""
+import itertools
+import logging
+import numpy as np
+import pandas as pd
+
+class ChildTableBuilder():
+    """
+    Splits list-valued cols (e.g. splits_metric, laps, segment_efforts from
+    the detailed activity) off the activity dataframe into one child
+    dataframe per field, with one row per list item keyed by activity_id
+    and item_index.
+
+    Each col is flattened over offsets: the list lengths give the offsets,
+    the parent of every item is a np.repeat of the activity rows and the
+    item_index an arange minus the repeated offsets. All items of a col are
+    normalized in a single pd.json_normalize call, so no per-row explode or
+    apply is involved. The parent's date col is copied onto every item so
+    child tables can be partitioned and pruned like the activity table.
+
+    Attributes:
+        - fields: list-valued cols moved to child tables [default = DEFAULT_FIELDS]
+    Methods:
+        - flatten: flattens one list-valued col into a child dataframe
+        - split: removes the list-valued cols from a dataframe and returns the child dataframes
+        - table_name: name of the child table of a field
+    """
+    DEFAULT_FIELDS = ['splits_metric', 'laps', 'segment_efforts']
+    KEY_COLS = ('activity_id', 'item_index')
+    # nested refs back to the parent, already covered by activity_id
+    DROP_PREFIXES = ('activity.', 'athlete.')
+
+    def __init__(self, fields: list = None):
+        """
+        Constructor for ChildTableBuilder class
+
+        :param fields: list-valued cols moved to child tables [default = DEFAULT_FIELDS]
+        """
+        self.fields = list(fields) if fields is not None else list(self.DEFAULT_FIELDS)
+        self._logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def table_name(table_name: str, field: str) -> str:
+        """
+        Name of the child table of a field.
+
+        :param table_name: name of the activity table
+        :param field: list-valued col
+        :return name: e.g. 'activities_laps'
+        """
+        return f'{table_name}_{field}'
+
+    def flatten(self, df: pd.DataFrame, field: str, date_col_name: str = None) -> pd.DataFrame:
+        """
+        Flattens one list-valued col into a child dataframe.
+
+        :param df: activity dataframe with an 'id' col and the field
+        :param field: list-valued col (rows without a list have no items)
+        :param date_col_name: parent date col copied onto every item [default = None]
+        :returns: dataframe with activity_id, item_index, the date col and the normalized item fields
+        :rtype: pd.DataFrame
+        """
+        values = df[field].to_numpy(dtype=object)
+        lengths = np.fromiter((len(value) if isinstance(value, list) else 0 for value in values),
+                              dtype=np.int64, count=len(values))
+        offsets = np.cumsum(lengths) - lengths
+        parents = np.repeat(np.arange(len(values)), lengths)
+        items = list(itertools.chain.from_iterable(value for value in values if isinstance(value, list)))
+
+        child = pd.json_normalize(items) if items else pd.DataFrame(index=pd.RangeIndex(0))
+        child = child.drop(columns=[col for col in child.columns if col.startswith(self.DROP_PREFIXES)
+                                    or col.endswith('resource_state')])
+        keys = {
+            'activity_id': df['id'].to_numpy(dtype=np.int64)[parents],
+            'item_index': np.arange(len(parents), dtype=np.int64) - offsets[parents],
+        }
+        if date_col_name is not None and date_col_name in df.columns:
+            keys[date_col_name] = df[date_col_name].iloc[parents].reset_index(drop=True)
+        child = pd.concat([pd.DataFrame(keys), child.drop(columns=list(keys), errors='ignore')], axis=1)
+        # make sure no '.' in col names
+        child.columns = child.columns.str.replace('.', '_')
+        return child
+
+    def split(self, df: pd.DataFrame, date_col_name: str = None) -> tuple:
+        """
+        Removes the list-valued cols from a dataframe and returns them as
+        child dataframes.
+
+        :param df: activity dataframe
+        :param date_col_name: parent date col copied onto every item [default = None]
+        :return df, children: the dataframe without the fields, and a dict of
+            field -> child dataframe (fields missing from df are left out)
+        """
+        children = {}
+        for field in self.fields:
+            if field in df.columns:
+                children[field] = self.flatten(df, field, date_col_name)
+        if children:
+            df = df.drop(columns=list(children))
+            self._logger.info('Split %s into child tables (%s rows).', list(children),
+                              sum(len(child) for child in children.values()))
+        return df, children
@@ -0,0 +1,106 @@
+"""
+Enrichment
+
+Author: Jairus Martinez
+Date: 10/17/2026
+This module contains the detailed-activity enrichment stage that runs
+between extract and transform.
+"""
+import logging
+import pandas as pd
+from commons.connectors import StravaAPIConnector
+from commons.detail_store import DetailStore
+from commons.fetch_pool import FetchPool
+
+class DetailEnricher():
+    """
+    Adds fields that only the /activities/{id} endpoint returns (calories,
+    device info, ...) to the summary rows from get_dataset.
+
+    Details are fetched only for ids that have none stored yet, by a
+    bounded pool of workers. Every request goes through the connector's
+    rate limiter, and a run never starts more fetches than the remaining
+    daily budget (minus budget_reserve) allows; what is left over waits
+    for a later run.
+
+    Attributes:
+        - strava_api_connector: StravaAPIConnector instance
+        - detail_store: DetailStore keeping the fetched details
+        - concurrency: number of detail requests in flight [default = 4]
+        - fields: detail fields added as cols [default = DEFAULT_FIELDS]
+        - budget_reserve: daily requests left untouched for the rest of the job [default = 100]
+    Methods:
+        - fetch: fetches and stores the details of the ids that have none
+        - enrich: adds the detail fields to a raw activity dataframe
+    """
+    DEFAULT_FIELDS = ['calories', 'device_name', 'description']
+
+    def __init__(self, strava_api_connector: StravaAPIConnector, detail_store: DetailStore, concurrency: int = 4,
+                 fields: list = None, budget_reserve: int = 100):
+        """
+        Constructor for DetailEnricher class
+
+        :param strava_api_connector: StravaAPIConnector instance
+        :param detail_store: DetailStore keeping the fetched details
+        :param concurrency: number of detail requests in flight [default = 4]
+        :param fields: detail fields added as cols [default = DEFAULT_FIELDS]
+        :param budget_reserve: daily requests left untouched for the rest of the job [default = 100]
+        """
+        self.strava_api_connector = strava_api_connector
+        self.detail_store = detail_store
+        self.concurrency = max(1, int(concurrency))
+        self.fields = list(fields) if fields is not None else list(self.DEFAULT_FIELDS)
+        self.budget_reserve = budget_reserve
+        self._logger = logging.getLogger(__name__)
+
+    def _fetch_one(self, activity_id: int, header: dict) -> bool:
+        """Fetches and stores one detail, False if the activity is gone"""
+        detail = self.strava_api_connector.get_activity(activity_id, header)
+        if detail is None:
+            return False
+        self.detail_store.put(detail)
+        return True
+
+    def fetch(self, ids) -> int:
+        """
+        Fetches and stores the details of the ids that have none stored.
+
+        :param ids: activity ids
+        :return fetched: number of details stored
+        """
+        missing = self.detail_store.missing(ids)
+        if not missing:
+            return 0
+        pool = FetchPool(self.concurrency, self.strava_api_connector, self.budget_reserve)
+        allowed = pool.allowance(len(missing))
+        if allowed < len(missing):
+            self._logger.warning('Rate budget allows %s of %s detail fetches, the rest wait for the next run.',
+                                 allowed, len(missing))
+
+        header = self.strava_api_connector.get_header()
+        fetched = {activity_id for activity_id, stored in
+                   pool.map(lambda activity_id: self._fetch_one(activity_id, header), missing[:allowed]) if stored}
+        self._logger.info('Fetched %s activity details.', len(fetched))
+        return len(fetched)
+
+    def enrich(self, df: pd.DataFrame, fetch: bool = True, fetch_ids=None) -> pd.DataFrame:
+        """
+        Adds the detail fields to a raw activity dataframe, fetching the
+        missing details first. Stored details are added for every row.
+
+        :param df: raw activity dataframe with an 'id' col
+        :param fetch: fetch missing details, False only uses stored ones [default = True]
+        :param fetch_ids: only fetch the missing details of these ids [default = None, all ids of df]
+        :returns: dataframe with one col per field (null where no detail is stored)
+        :rtype: pd.DataFrame
+        """
+        if df.empty:
+            return df
+        ids = df['id'].astype('int64')
+        if fetch:
+            self.fetch(ids if fetch_ids is None else pd.Series(fetch_ids, dtype='int64'))
+
+        details = self.detail_store.get_many(ids)
+        for field in self.fields:
+            df[field] = ids.map({activity_id: detail.get(field) for activity_id, detail in details.items()})
+        return df
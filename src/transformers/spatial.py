@@ -0,0 +1,330 @@
+"""
+Spatial
+
+Author: Jairus Martinez
+Date: 10/17/2026
+This module contains the batch summary_polyline decoder, the geohash/tile
+keys derived from it and the in-memory index for "activities near X" lookups.
+"""
+import logging
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_M = 6371008.8
+GEOHASH_ALPHABET = np.frombuffer(b'0123456789bcdefghjkmnpqrstuvwxyz', dtype=np.uint8)
+
+def geohash_codes(lat: np.ndarray, lng: np.ndarray, precision: int) -> np.ndarray:
+    """
+    Geohash of every point as an integer (5 bits per character, lng bit first).
+
+    :param lat: latitudes in degrees
+    :param lng: longitudes in degrees
+    :param precision: number of geohash characters (<= 12)
+    :return codes: int64 array, -1 where lat/lng is NaN
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lng = np.asarray(lng, dtype=np.float64)
+    bits = 5 * precision
+    lng_bits, lat_bits = (bits + 1) // 2, bits // 2
+    valid = ~(np.isnan(lat) | np.isnan(lng))
+    lat_q = np.clip(np.floor((np.where(valid, lat, 0.0) + 90.0) / 180.0 * 2 ** lat_bits), 0, 2 ** lat_bits - 1)
+    lng_q = np.clip(np.floor((np.where(valid, lng, 0.0) + 180.0) / 360.0 * 2 ** lng_bits), 0, 2 ** lng_bits - 1)
+    lat_q, lng_q = lat_q.astype(np.int64), lng_q.astype(np.int64)
+
+    # interleave the bits (a loop over bit positions, not over points)
+    codes = np.zeros(len(lat), dtype=np.int64)
+    for bit in range(bits):
+        if bit % 2 == 0:
+            codes = (codes << 1) | ((lng_q >> (lng_bits - 1 - bit // 2)) & 1)
+        else:
+            codes = (codes << 1) | ((lat_q >> (lat_bits - 1 - bit // 2)) & 1)
+    return np.where(valid, codes, -1)
+
+def geohash_strings(codes: np.ndarray, precision: int) -> np.ndarray:
+    """
+    Geohash strings of integer codes (see geohash_codes).
+
+    :param codes: int64 geohash codes, -1 for missing
+    :param precision: number of geohash characters
+    :return geohashes: object array of str, None where the code is -1
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    shifts = 5 * np.arange(precision - 1, -1, -1)
+    chars = GEOHASH_ALPHABET[(np.maximum(codes, 0)[:, None] >> shifts) & 31]
+    strings = np.ascontiguousarray(chars).view(f'S{precision}').ravel().astype(str).astype(object)
+    strings[codes < 0] = None
+    return strings
+
+def haversine(lat1, lng1, lat2, lng2) -> np.ndarray:
+    """Great-circle distance in meters between points (degrees), vectorized"""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(x, dtype=np.float64)) for x in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+class PolylineDecoder():
+    """
+    Decodes a whole column of encoded polylines (map.summary_polyline) at
+    once and derives start/end points, bounding boxes, a start geohash and
+    a start map tile from them.
+
+    All polylines are joined into one byte array; the 5-bit chunks are
+    grouped into values with a cumulative sum over the terminator bits and
+    summed with reduceat, zigzag-decoded, and the lat/lng deltas turned
+    into coordinates with one segmented cumulative sum. No Python code runs
+    per character or per point.
+
+    Attributes:
+        - geohash_precision: characters of the start geohash [default = 7 (~150 m)]
+        - tile_zoom: zoom level of the start tile [default = 12]
+    Methods:
+        - decode: decodes polylines into flat lat/lng arrays with row offsets
+        - features: start/end, bounding box, geohash and tile cols of a polyline col
+    """
+    FEATURE_COLS = ['start_lat', 'start_lng', 'end_lat', 'end_lng', 'bbox_min_lat', 'bbox_min_lng',
+                    'bbox_max_lat', 'bbox_max_lng', 'start_geohash', 'start_tile']
+
+    def __init__(self, geohash_precision: int = 7, tile_zoom: int = 12):
+        """
+        Constructor for PolylineDecoder class
+
+        :param geohash_precision: characters of the start geohash [default = 7 (~150 m)]
+        :param tile_zoom: zoom level of the start tile [default = 12]
+        """
+        self.geohash_precision = geohash_precision
+        self.tile_zoom = tile_zoom
+        self._logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def decode(polylines) -> tuple:
+        """
+        Decodes polylines into flat coordinate arrays.
+
+        :param polylines: iterable of encoded polylines (None/NaN/'' decode to no points)
+        :return lat, lng, offsets: float64 arrays of every point, and the row
+            offsets (points of row i are lat[offsets[i]:offsets[i + 1]])
+        """
+        encoded = [value.encode('ascii') if isinstance(value, str) else b'' for value in polylines]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        buffer = np.frombuffer(b''.join(encoded), dtype=np.uint8).astype(np.int64) - 63
+        if len(buffer) == 0:
+            return np.empty(0), np.empty(0), np.zeros(len(encoded) + 1, dtype=np.int64)
+
+        byte_rows = np.repeat(np.arange(len(encoded)), lengths)
+        # a value ends at a chunk without the continuation bit (or, if malformed, at the end of its row)
+        last = (buffer & 0x20) == 0
+        last[np.cumsum(lengths)[lengths > 0] - 1] = True
+        value_starts = np.flatnonzero(np.concatenate(([True], last[:-1])))
+        value_ids = np.cumsum(last) - last
+        positions = np.arange(len(buffer)) - value_starts[value_ids]
+        chunks = (buffer & 0x1f) << (5 * np.minimum(positions, 12))
+        raw = np.add.reduceat(chunks, value_starts)
+        deltas = np.where(raw & 1, ~(raw >> 1), raw >> 1)
+
+        # each row holds lat/lng pairs, rows with an odd count are malformed and dropped
+        value_rows = byte_rows[value_starts]
+        counts = np.bincount(value_rows, minlength=len(encoded))
+        keep = counts[value_rows] % 2 == 0
+        deltas, value_rows = deltas[keep], value_rows[keep]
+        point_counts = np.where(counts % 2 == 0, counts // 2, 0)
+        offsets = np.concatenate(([0], np.cumsum(point_counts)))
+
+        point_rows = value_rows[0::2]
+        row_starts = offsets[point_rows]
+
+        def coordinates(row_deltas):
+            totals = np.cumsum(row_deltas)
+            before = np.where(row_starts > 0, totals[np.maximum(row_starts - 1, 0)], 0)
+            return (totals - before) / 1e5
+
+        return coordinates(deltas[0::2]), coordinates(deltas[1::2]), offsets
+
+    def features(self, polylines) -> pd.DataFrame:
+        """
+        Start/end points, bounding box, start geohash and start map tile of
+        every polyline.
+
+        :param polylines: pd.Series (or iterable) of encoded polylines
+        :returns: dataframe with FEATURE_COLS, on the index of polylines; nulls where there is no polyline
+        :rtype: pd.DataFrame
+        """
+        index = polylines.index if isinstance(polylines, pd.Series) else None
+        lat, lng, offsets = self.decode(polylines)
+        num_rows = len(offsets) - 1
+        has_points = np.diff(offsets) > 0
+        starts, ends = offsets[:-1][has_points], offsets[1:][has_points] - 1
+
+        def per_row(values):
+            column = np.full(num_rows, np.nan)
+            column[has_points] = values
+            return column
+
+        df = pd.DataFrame({
+            'start_lat': per_row(lat[starts]),
+            'start_lng': per_row(lng[starts]),
+            'end_lat': per_row(lat[ends]),
+            'end_lng': per_row(lng[ends]),
+            # empty rows hold no points, so the starts of the others delimit their segments
+            'bbox_min_lat': per_row(np.minimum.reduceat(lat, starts) if len(starts) else []),
+            'bbox_min_lng': per_row(np.minimum.reduceat(lng, starts) if len(starts) else []),
+            'bbox_max_lat': per_row(np.maximum.reduceat(lat, starts) if len(starts) else []),
+            'bbox_max_lng': per_row(np.maximum.reduceat(lng, starts) if len(starts) else []),
+        }, index=index)
+        df['start_geohash'] = geohash_strings(geohash_codes(df['start_lat'], df['start_lng'], self.geohash_precision),
+                                              self.geohash_precision)
+
+        scale = 2 ** self.tile_zoom
+        lat_rad = np.radians(np.clip(df['start_lat'].to_numpy(), -85.0511, 85.0511))
+        x = np.floor((df['start_lng'].to_numpy() + 180.0) / 360.0 * scale).clip(0, scale - 1)
+        y = np.floor((1.0 - np.arcsinh(np.tan(lat_rad)) / np.pi) / 2.0 * scale).clip(0, scale - 1)
+        tiles = (f'{self.tile_zoom}/' + pd.Series(x, index=index).astype('Int64').astype(str) + '/'
+                 + pd.Series(y, index=index).astype('Int64').astype(str))
+        df['start_tile'] = tiles.where(pd.Series(has_points, index=index), None).astype(object)
+        return df
+
+class SpatialIndex():
+    """
+    In-memory index of activity start points for "activities near X"
+    lookups. Points are kept sorted by their integer geohash, so a lookup
+    reads only the geohash cells around the query point (a few
+    searchsorted ranges) and computes exact distances for those candidates;
+    nothing is decoded or scanned per activity.
+
+    Attributes:
+        - ids: activity ids, in geohash order
+        - lat: start latitudes, in geohash order
+        - lng: start longitudes, in geohash order
+    Methods:
+        - from_frame: builds the index from a dataframe with id/start_lat/start_lng
+        - from_table: builds the index from the activity table (3 cols read, no polylines)
+        - cells: geohashes of the cell of a point and its neighbours covering a radius
+        - near: activities starting within a radius of a point
+    """
+    PRECISION = 9
+
+    def __init__(self, ids, lat, lng):
+        """
+        Constructor for SpatialIndex class
+
+        :param ids: activity ids
+        :param lat: start latitudes (NaN rows are left out)
+        :param lng: start longitudes
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        lat, lng = np.asarray(lat, dtype=np.float64), np.asarray(lng, dtype=np.float64)
+        valid = ~(np.isnan(lat) | np.isnan(lng))
+        codes = geohash_codes(lat[valid], lng[valid], self.PRECISION)
+        order = np.argsort(codes, kind='stable')
+        self._codes = codes[order]
+        self.ids, self.lat, self.lng = ids[valid][order], lat[valid][order], lng[valid][order]
+        self._logger = logging.getLogger(__name__)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame):
+        """
+        Builds the index from a dataframe.
+
+        :param df: dataframe with 'id', 'start_lat' and 'start_lng' cols
+        :return index: SpatialIndex
+        """
+        return cls(df['id'].to_numpy(), df['start_lat'].to_numpy(dtype=np.float64, na_value=np.nan),
+                   df['start_lng'].to_numpy(dtype=np.float64, na_value=np.nan))
+
+    @classmethod
+    def from_table(cls, bqc, table_id: str, lat: float = None, lng: float = None, radius_m: float = None,
+                   geohash_precision: int = None):
+        """
+        Builds the index from the activity table, reading only the 3 cols it needs.
+
+        Given a point, a radius and the precision of the table's
+        start_geohash col, only the rows whose start_geohash falls in the
+        cells around the point are read (pruned when the table is clustered
+        on start_geohash); otherwise every row is read.
+
+        :param bqc: BigQueryConnector
+        :param table_id: 'project.dataset.table' of the activity table
+        :param lat: latitude of the point looked up [default = None]
+        :param lng: longitude of the point looked up [default = None]
+        :param radius_m: radius looked up in meters [default = None]
+        :param geohash_precision: characters of the stored start_geohash [default = None, not used]
+        :return index: SpatialIndex
+        """
+        cols = ['id', 'start_lat', 'start_lng']
+        cells = []
+        if radius_m is not None and geohash_precision:
+            table_cols = {field.name for field in bqc.table_metadata(table_id)['schema']}
+            if 'start_geohash' in table_cols:
+                cells = cls.cells(lat, lng, radius_m, geohash_precision)
+
+        if cells:
+            prefixes = ' OR '.join(f"STARTS_WITH(start_geohash, '{cell}')" for cell in cells)
+            df = bqc.query_table(f"SELECT {', '.join(cols)} FROM `{table_id}` WHERE {prefixes}", table_id=table_id)
+        else:
+            chunks = list(bqc.read_table(table_id, columns=cols))
+            df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=cols)
+        return cls.from_frame(df)
+
+    @classmethod
+    def _cell_precision(cls, lat: float, radius_m: float, max_precision: int = None) -> int:
+        """Finest geohash precision whose cells are at least radius_m tall and wide at lat"""
+        for precision in range(max_precision or cls.PRECISION, 0, -1):
+            bits = 5 * precision
+            height = np.radians(180.0 / 2 ** (bits // 2)) * EARTH_RADIUS_M
+            width = np.radians(360.0 / 2 ** ((bits + 1) // 2)) * EARTH_RADIUS_M * np.cos(np.radians(lat))
+            if min(height, width) >= radius_m:
+                return precision
+        return 0
+
+    @staticmethod
+    def _neighbour_codes(lat: float, lng: float, precision: int) -> np.ndarray:
+        """Geohash codes of the cell of the point and its 8 neighbours"""
+        bits = 5 * precision
+        d_lat, d_lng = 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+        offsets = np.array([-1.0, 0.0, 1.0])
+        cell_lat = np.clip(lat + np.repeat(offsets, 3) * d_lat, -90.0, 90.0)
+        cell_lng = (lng + np.tile(offsets, 3) * d_lng + 180.0) % 360.0 - 180.0
+        return np.unique(geohash_codes(cell_lat, cell_lng, precision))
+
+    @classmethod
+    def cells(cls, lat: float, lng: float, radius_m: float, max_precision: int = None) -> list:
+        """
+        Geohashes of the cell of a point and its 8 neighbours, at the finest
+        precision (up to max_precision) whose cells cover the radius.
+
+        :param lat: latitude of the point in degrees
+        :param lng: longitude of the point in degrees
+        :param radius_m: radius in meters
+        :param max_precision: longest geohash returned [default = None, PRECISION]
+        :return cells: list of geohash strings, empty if the radius needs the whole globe
+        """
+        precision = cls._cell_precision(lat, radius_m, max_precision)
+        if precision == 0:
+            return []
+        return geohash_strings(cls._neighbour_codes(lat, lng, precision), precision).tolist()
+
+    def near(self, lat: float, lng: float, radius_m: float) -> pd.DataFrame:
+        """
+        Activities starting within radius_m of a point, closest first.
+
+        :param lat: latitude of the point in degrees
+        :param lng: longitude of the point in degrees
+        :param radius_m: radius in meters
+        :returns: dataframe with 'id' and 'distance_m'
+        :rtype: pd.DataFrame
+        """
+        precision = self._cell_precision(lat, radius_m)
+        if precision == 0:
+            candidates = np.arange(len(self.ids))
+        else:
+            # the cell of the point and its 8 neighbours cover the radius
+            cells = self._neighbour_codes(lat, lng, precision)
+            shift = 5 * (self.PRECISION - precision)
+            lower = np.searchsorted(self._codes, cells << shift, side='left')
+            upper = np.searchsorted(self._codes, (cells + 1) << shift, side='left')
+            candidates = np.concatenate([np.arange(a, b) for a, b in zip(lower, upper)])
+
+        distances = haversine(lat, lng, self.lat[candidates], self.lng[candidates])
+        inside = distances <= radius_m
+        self._logger.debug('near(%s, %s, %s m): %s candidates of %s activities.', lat, lng, radius_m,
+                           len(candidates), len(self.ids))
+        result = pd.DataFrame({'id': self.ids[candidates][inside], 'distance_m': distances[inside]})
+        return result.sort_values('distance_m', kind='stable', ignore_index=True)
@@ -5,11 +5,24 @@ Author: Jairus Martinez
 Date: 12/21/2023
 This module contains the extract, transform, and load pipeline code.
 """
+import itertools
 import logging
+from contextlib import closing
 import pandas as pd
-import numpy as np
+import pyarrow as pa
 from commons.connectors import StravaAPIConnector, BigQueryConnector
-from commons.utils import UnitConversion
+from commons.utils import ConversionEngine, DtypeOptimizer, ProgressTracker
+from commons.decoders import ActivityDecoder
+from commons.state_store import StateStore
+from commons.load_buffer import LoadBuffer
+from commons.backfill import BackfillLoader
+from commons.checkpoints import CheckpointStore
+from commons.fetch_pool import FetchPool
+from transformers.enrichment import DetailEnricher
+from transformers.streams import StreamsExtractor
+from transformers.analytics import StreamAnalytics
+from transformers.spatial import PolylineDecoder, SpatialIndex
+from transformers.children import ChildTableBuilder
 
 class StravaETL():
     """
@@ -20,12 +33,45 @@ class StravaETL():
         - max_page_num: max pages to read through (pages contain activity data)
         - actv_per_page: number of activities read per page
         - cols_to_drop: col names to drop from data
+        - concurrency: number of pages requested in parallel [default = 1]
+        - incremental: only request activities newer than the table's watermark [default = False]
+        - streaming: extract, transform and load page by page [default = False]
+        - fast_decode: decode pages with ActivityDecoder instead of pd.json_normalize [default = False]
+        - converter: ConversionEngine built from the conversion spec
+        - dtype_optimizer: DtypeOptimizer applied at the end of transform (None to keep pandas defaults)
+        - load_mode: 'append' (filter with newest_data, then append) or 'merge' (MERGE on id) [default = 'append']
+        - state_store: optional StateStore with the ingested ids and watermark [default = None]
+        - load_buffer: optional LoadBuffer that coalesces appends to an existing table into fewer load jobs [default = None]
+        - backfill_loader: optional BackfillLoader for the first load of a table (chunked, concurrent, resumable) [default = None]
+        - enricher: optional DetailEnricher adding detailed-activity fields after extract [default = None]
+        - streams_extractor: optional StreamsExtractor loading per-sample activity streams [default = None]
+        - analytics: optional StreamAnalytics adding best efforts, splits and HR zone times from streams [default = None]
+        - polyline_decoder: optional PolylineDecoder adding start/end, bounding box, geohash and tile cols [default = None]
+        - child_tables: optional ChildTableBuilder moving list-valued cols (splits, laps, ...) to child tables [default = None]
     Methods:
         - extract: Reads in the raw, source data.
+        - extract_pages: Reads in the raw, source data one page at a time.
+        - replay: Reads the raw data from the response cache (no network access).
+        - stream: Yields transformed chunks, one per page.
         - transform: Clean and processes raw activity data to a useable dataset.
+        - split_children: Moves list-valued cols into child dataframes keyed by activity id.
         - load: Uploads data to BigQuery
+        - reconcile: Rebuilds the state store from the BigQuery table
+        - flush: Loads everything in the load buffer into BigQuery
+        - backfill: Loads a date range window by window, resuming from checkpoints
+        - load_streams: Loads the streams of the loaded activities into a streams table
+        - analyze: Recomputes the stream analytics of every activity from the streams table
+        - near: Activities starting within a radius of a point
     """
-    def __init__(self, strava_api_connector: StravaAPIConnector, max_page_num: int, actv_per_page: int, cols_to_drop: list):
+    LOAD_MODES = ('append', 'merge')
+
+    def __init__(self, strava_api_connector: StravaAPIConnector, max_page_num: int, actv_per_page: int, cols_to_drop: list,
+                 concurrency: int = 1, incremental: bool = False, streaming: bool = False,
+                 fast_decode: bool = False, conversions: list = None, optimize_dtypes: bool = False,
+                 load_mode: str = 'append', state_store: StateStore = None, load_buffer: LoadBuffer = None,
+                 backfill_loader: BackfillLoader = None, enricher: DetailEnricher = None,
+                 streams_extractor: StreamsExtractor = None, analytics: StreamAnalytics = None,
+                 polyline_decoder: PolylineDecoder = None, child_tables: ChildTableBuilder = None):
         """
         Constructor for StravaETL class.
 
@@ -33,17 +79,102 @@ class StravaETL():
         :param max_page_num: max pages to read through (pages contain activity data)
         :param actv_per_page: number of activities read per page
         :param cols_to_drop: col names to drop from data
+        :param concurrency: number of pages requested in parallel [default = 1]
+        :param incremental: only request activities newer than the table's watermark [default = False]
+        :param streaming: extract, transform and load page by page [default = False]
+        :param fast_decode: decode pages with ActivityDecoder instead of pd.json_normalize [default = False]
+        :param conversions: list of {'column', 'unit', 'precision'} dicts [default = ConversionEngine.DEFAULT_SPEC]
+        :param optimize_dtypes: downcast numerics and dictionary-encode strings after transform [default = False]
+        :param load_mode: 'append' (filter with newest_data, then append) or 'merge' (MERGE on id) [default = 'append']
+        :param state_store: optional StateStore with the ingested ids and watermark [default = None]
+        :param load_buffer: optional LoadBuffer that coalesces appends into fewer load jobs [default = None]
+        :param backfill_loader: optional BackfillLoader for the first load of a table [default = None]
+        :param enricher: optional DetailEnricher adding detailed-activity fields after extract [default = None]
+        :param streams_extractor: optional StreamsExtractor loading per-sample activity streams [default = None]
+        :param analytics: optional StreamAnalytics adding derived cols from streams [default = None]
+        :param polyline_decoder: optional PolylineDecoder adding geo cols from map.summary_polyline [default = None]
+        :param child_tables: optional ChildTableBuilder moving list-valued cols to child tables [default = None]
         """
+        if load_mode not in self.LOAD_MODES:
+            raise ValueError(f"Unknown load_mode '{load_mode}'. Expected one of {self.LOAD_MODES}.")
         self.strava_api_connector = strava_api_connector
         self.max_page_num = max_page_num
         self.actv_per_page = actv_per_page
         self.cols_to_drop = cols_to_drop
+        self.concurrency = max(1, int(concurrency))
+        self.incremental = incremental
+        self.streaming = streaming
+        self.fast_decode = fast_decode
+        self.converter = ConversionEngine(conversions)
+        self.dtype_optimizer = DtypeOptimizer() if optimize_dtypes else None
+        self.load_mode = load_mode
+        self.state_store = state_store
+        self.load_buffer = load_buffer
+        self.backfill_loader = backfill_loader
+        self.enricher = enricher
+        self.streams_extractor = streams_extractor
+        self.analytics = analytics
+        self.polyline_decoder = polyline_decoder
+        self.child_tables = child_tables
+        # start_date_local (and the polyline for geo cols) are needed by transform, so the decoder keeps them
+        needed = {'start_date_local', 'map.summary_polyline'} if polyline_decoder is not None else {'start_date_local'}
+        self._decoder = ActivityDecoder([col for col in cols_to_drop if col not in needed])
         self._logger = logging.getLogger(__name__)
 
-    def extract(self) -> pd.DataFrame:
+    # start_date_local is compared against Strava's UTC `after`, look back
+    # far enough to cover any timezone offset (duplicates are filtered on load)
+    WATERMARK_LOOKBACK = pd.Timedelta(days=1)
+
+    def _iter_pages(self, header: dict, after: int = None, before: int = None, unbounded: bool = False):
+        """
+        Yields (page number, dataset) pairs in page order, keeping up to
+        self.concurrency requests in flight. No new pages are scheduled once
+        a short or empty page is returned (the end of the athlete's activities).
+
+        :param header: dict containing authorization and access_token
+        :param after: only return activities that started after this epoch timestamp
+        :param before: only return activities that started before this epoch timestamp
+        :param unbounded: ignore max_page_num and page until a short page [default = False]
+        """
+        pages = itertools.count(1) if unbounded else range(1, self.max_page_num)
+        params = {'after': after}
+        if before is not None:
+            params['before'] = before
+
+        def get_page(page_number):
+            return self.strava_api_connector.get_dataset(self.actv_per_page, page_number, header, **params)
+
+        with closing(FetchPool(self.concurrency).map(get_page, pages)) as results:
+            for page_number, dataset in results:
+                yield page_number, dataset
+                if len(dataset) < self.actv_per_page:
+                    # last page reached, closing the pool drops anything still queued
+                    break
+
+    def watermark(self, bqc: BigQueryConnector, table_id: str, date_col_name: str) -> int:
+        """
+        Works out the `after` epoch for an incremental extract from the newest
+        activity date already in the table.
+
+        :param bqc: BiqQueryConnector class object
+        :param table_id: 'project.dataset.table' referring to the activity table
+        :param date_col_name: name of the date col to asses freshness by
+        :returns: epoch timestamp, or None when the table holds no watermark
+        """
+        latest = None
+        if self.state_store is not None:
+            latest = self.state_store.watermark(table_id)
+        if latest is None:
+            latest = bqc.latest_timestamp(table_id, date_col_name)
+        if latest is None:
+            return None
+        return int((pd.Timestamp(latest).tz_localize(None) - self.WATERMARK_LOOKBACK).timestamp())
+
+    def extract(self, after: int = None) -> pd.DataFrame:
         """
         Reads in the raw, source data.
 
+        :param after: only extract activities that started after this epoch timestamp [default = None]
         :returns: dataframe containing activity data
         :rtype: pd.DataFrame
         """
@@ -51,31 +182,114 @@ class StravaETL():
             self._logger.info("Requesting Token...")
             header = self.strava_api_connector.get_header()
 
-            # save data into list and set maximum pages to iterate through
-            page_list = list(np.arange(1, self.max_page_num))
             all_activities = []
 
             self._logger.info('Importing data...')
 
-            # read in n activities per page
-            for request_page_number in page_list:
-
-                # extracts data from page n
-                my_dataset = self.strava_api_connector.get_dataset(self.actv_per_page, request_page_number, header)
-
-                if len(all_activities) == 0:
-                    all_activities = my_dataset
-                    self._logger.info('Copying Page: %s', request_page_number)
-                else:
-                    all_activities.extend(my_dataset)
-                    self._logger.info('Copying Page: %s', request_page_number)
+            # read in n activities per page, pages are returned in order
+            for request_page_number, my_dataset in self._iter_pages(header, after=after):
+                all_activities.extend(my_dataset)
+                self._logger.info('Copying Page: %s', request_page_number)
             
             self._logger.info('Data imported succesfully!')
-            return pd.json_normalize(all_activities)
+            return self._normalize(all_activities)
         except Exception as e:
             self._logger.error(f'Error in extract method:{e}')
             raise
     
+    def _normalize(self, activities: list) -> pd.DataFrame:
+        """
+        Flattens a list of activity dicts into a dataframe.
+
+        :param activities: list of activity dicts
+        :rtype: pd.DataFrame
+        """
+        if self.fast_decode:
+            return self._decoder.decode(activities)
+        return pd.json_normalize(activities)
+
+    def extract_pages(self, after: int = None):
+        """
+        Reads in the raw, source data one page at a time so only the pages in
+        flight are held in memory.
+
+        :param after: only extract activities that started after this epoch timestamp [default = None]
+        :returns: generator of dataframes, one per non-empty page
+        """
+        try:
+            self._logger.info("Requesting Token...")
+            header = self.strava_api_connector.get_header()
+
+            self._logger.info('Streaming data...')
+            for request_page_number, my_dataset in self._iter_pages(header, after=after):
+                self._logger.info('Copying Page: %s', request_page_number)
+                if len(my_dataset) > 0:
+                    yield self._normalize(my_dataset)
+        except Exception as e:
+            self._logger.error(f'Error in extract_pages method:{e}')
+            raise
+
+    def stream(self, after: int = None, fetch: bool = True):
+        """
+        Yields transformed, load-ready chunks, one per page.
+
+        :param after: only extract activities that started after this epoch timestamp [default = None]
+        :param fetch: fetch missing activity details, False only uses stored ones [default = True]
+        :returns: generator of cleaned strava activity dataframes
+        """
+        for df_raw in self.extract_pages(after=after):
+            yield self._prepare(self.transform(self._enrich(df_raw, fetch=fetch)))
+
+    def _enrich(self, df_raw: pd.DataFrame, fetch: bool = True, fetch_ids=None) -> pd.DataFrame:
+        """Runs the enrichment stage on a raw dataframe (no-op without an enricher)"""
+        if self.enricher is None or df_raw.empty:
+            return df_raw
+        return self.enricher.enrich(df_raw, fetch=fetch, fetch_ids=fetch_ids)
+
+    def _write_details(self, bqc: BigQueryConnector, table_id: str, df: pd.DataFrame, date_col_name: str) -> int:
+        """
+        Writes the detail fields of activities that are already in the table
+        with an update-only MERGE, then replaces their child rows.
+        """
+        df, children = self.split_children(df, date_col_name)
+        cols = [col for col in ['id', date_col_name, *self.enricher.fields] if col in df.columns]
+        bqc.add_columns(table_id, df[cols])
+        updated = bqc.merge_into_table(table_id, df[cols], insert=False)
+        self._load_children(bqc, table_id, df, children, date_col_name)
+        return updated
+
+    @staticmethod
+    def _prepare(df: pd.DataFrame) -> pd.DataFrame:
+        """Makes col names BigQuery-safe (no '.')"""
+        df.columns = df.columns.str.replace('.', '_')
+        return df
+
+    def replay(self) -> pd.DataFrame:
+        """
+        Reads the raw data from the connector's response cache instead of the API.
+        Activities cached by several runs are deduplicated by id (newest copy wins).
+
+        :returns: dataframe containing activity data
+        :rtype: pd.DataFrame
+        """
+        response_cache = getattr(self.strava_api_connector, 'response_cache', None)
+        if response_cache is None:
+            raise ValueError('Replay mode needs strava_api.response_cache to be configured.')
+
+        self._logger.info('Replaying cached pages...')
+        activities = {}
+        pages = 0
+        for _, records in response_cache.replay(self.strava_api_connector.strava_activities_url,
+                                                self.strava_api_connector.strava_payload.get('client_id')):
+            pages += 1
+            for record in records:
+                activities[record.get('id')] = record
+
+        self._logger.info('Replayed %s activities from %s cached pages.', len(activities), pages)
+        # same order as the API (newest first)
+        all_activities = sorted(activities.values(), key=lambda a: a.get('start_date', ''), reverse=True)
+        return self._normalize(all_activities)
+
     def transform(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Clean and processes raw activity data to a useable dataset.
@@ -85,34 +299,32 @@ class StravaETL():
         :rtype: pd.DataFrame
         """
         try:
-            # cols to drop
+            date = pd.to_datetime(df['start_date_local'], format='ISO8601')
+            geo = None
+            if self.polyline_decoder is not None and 'map.summary_polyline' in df.columns:
+                # decoded before the polyline is dropped, one batch for the whole frame
+                geo = self.polyline_decoder.features(df['map.summary_polyline'])
+
+            # cols to drop, start_date_local is replaced by date (single copy of the frame)
             self._logger.info('Dropping cols...')
             
-            df = df.drop(columns=self.cols_to_drop)
+            cols_to_drop = [*self.cols_to_drop, 'start_date_local']
+            if self.fast_decode:
+                # the decoder never builds the schema cols it drops, any other col must be there
+                cols_to_drop = [col for col in cols_to_drop if col not in self._decoder.dropped]
+            df = df.drop(columns=list(dict.fromkeys(cols_to_drop)))
 
             self._logger.info('Cols dropped...')
+            if geo is not None:
+                df = df.join(geo)
+                self._logger.info('Added geo cols.')
 
-            uc = UnitConversion()
-
-            # convert distance units
-            df['distance'] = uc.meters_to_miles(x=df['distance'])
-            df['moving_time'] = uc.sec_to_min(df['moving_time'])
-            df['elapsed_time'] = uc.sec_to_min(df['elapsed_time'])
-            df['total_elevation_gain'] = uc.meters_to_feet(df['total_elevation_gain'])
-            self._logger.info('Converted distance units.')
-
-            # convert speed units
-            df['average_speed'] = uc.mps_to_mph(df['average_speed'])
-            df['max_speed'] = uc.mps_to_mph(df['max_speed'])
-            self._logger.info('Converted speed units.')
-
-            df['elev_high'] = uc.meters_to_feet(df['elev_high'])
-            df['elev_low'] = uc.meters_to_feet(df['elev_low'])
-            self._logger.info('Converted elevation units.')
+            # convert distance, time, speed and elevation units in one pass
+            df = self.converter.apply(df)
+            self._logger.info('Converted units.')
 
             # create time bins
-            df['date'] = pd.to_datetime(df['start_date_local'], format='ISO8601')
-            df = df.drop(columns='start_date_local')
+            df['date'] = date
             df['time'] = df['date'].dt.hour
             df['time_bins'] = pd.cut(
                 df['time'],
@@ -121,12 +333,61 @@ class StravaETL():
                 ordered=True
             )
             self._logger.info('Created time bins.')
+
+            if self.dtype_optimizer is not None:
+                df = self.dtype_optimizer.optimize(df)
             return df
         except Exception as e:
             self._logger.info(f'Error in transform method:{e}')
             raise
     
-    def load(self, bqc: BigQueryConnector, project_name: str, dataset_name: str, table_name: str, sql_query: str, date_col_name: str) -> pd.DataFrame:
+    def split_children(self, df: pd.DataFrame, date_col_name: str) -> tuple:
+        """
+        Moves the list-valued cols of a transformed dataframe into child
+        dataframes keyed by activity id (no-op without child_tables).
+
+        :param df: transformed activity dataframe
+        :param date_col_name: name of the date col copied onto the child rows
+        :return df, children: the activity dataframe and a dict of field -> child dataframe
+        """
+        if self.child_tables is None or df.empty:
+            return df, {}
+        return self.child_tables.split(df, date_col_name)
+
+    def _load_children(self, bqc: BigQueryConnector, table_id: str, df: pd.DataFrame, children: dict,
+                       date_col_name: str) -> int:
+        """
+        Loads the child dataframes of the loaded activities (df) into
+        '<table>_<field>' tables: created by the first load, then the
+        activities' existing child rows are deleted before the new ones are
+        appended, so reruns never duplicate child rows and items removed
+        from an edited activity do not linger.
+        """
+        project_name, dataset_name, table_name = table_id.split('.')
+        since = None
+        if date_col_name in df.columns and df[date_col_name].notna().any():
+            since = pd.to_datetime(df[date_col_name]).min()
+        loaded = 0
+        for field, child in children.items():
+            child_name = ChildTableBuilder.table_name(table_name, field)
+            child_id = ".".join([project_name, dataset_name, child_name])
+            if bqc.table_exists(dataset_name, child_name):
+                # also for activities that have no items left
+                bqc.delete_rows(child_id, 'activity_id', df['id'].tolist(), date_col_name, since)
+                if child.empty:
+                    continue
+                bqc.add_columns(child_id, child)
+                bqc.append_to_table(child_id, child)
+            elif child.empty:
+                continue
+            else:
+                bqc.upload_table(child_id, child)
+            self._logger.info('Loaded %s rows into %s.', len(child), child_id)
+            loaded += len(child)
+        return loaded
+
+    def load(self, bqc: BigQueryConnector, project_name: str, dataset_name: str, table_name: str, sql_query, date_col_name: str,
+             replay: bool = False) -> pd.DataFrame:
         """
         Uploads data to BigQuery
 
@@ -135,29 +396,447 @@ class StravaETL():
         :param dataset_name: name of dataset
         :param table_name: name of table
         :param sql_query: sql_query to get the latest data to compare for freshness
+            (None = partition-pruned query from bqc.freshness_query)
         :param date_col_name: name of the date col to asses freshness by
+        :param replay: read the raw data from the response cache instead of the API [default = False]
         """
         try:
-            # self.extract() raw dataframe as an argument for self.transform() 
-            df = self.transform(self.extract())
-            df.columns = df.columns.str.replace('.', '_')
-
             # project.dataset.table format
             table_id = ".".join([project_name, dataset_name, table_name])
+            table_exists = bqc.table_exists(dataset_name, table_name)
+            # first load (or an interrupted one) of the full history goes through the backfill loader
+            backfilling = self.backfill_loader is not None and (
+                not table_exists or self.backfill_loader.in_progress(table_id))
 
-            if bqc.table_exists(dataset_name, table_name) is True:
-                df_to_compare = bqc.query_table(sql_query)
-                df_new = bqc.newest_data(df, df_to_compare, date_col_name)
-                if len(df_new) > 0:
-                    self._logger.info('Appending new data... %s new activities.', len(df_new))
-                    bqc.append_to_table(table_id, df_new)
+            # ids already ingested come from the local state store when it has any
+            known_ids = None
+            if table_exists and self.state_store is not None and not self.state_store.is_empty(table_id):
+                known_ids = self.state_store.known_ids(table_id)
+
+            after = None
+            if table_exists and self.incremental and not replay and not backfilling:
+                after = self.watermark(bqc, table_id, date_col_name)
+                if after is None:
+                    self._logger.info('No watermark found. Running a full scan.')
                 else:
+                    self._logger.info('Extracting activities after watermark: %s', after)
+
+            if backfilling:
+                df_raw = self.replay() if replay else self.extract()
+                if df_raw.empty:
                     self._logger.info('Data up to date!')
+                    return True
+                df_raw = self._enrich(df_raw, fetch=not replay)
+                df, children = self.split_children(self._prepare(self.transform(df_raw)), date_col_name)
+                loaded = self.backfill_loader.load(
+                    bqc, table_id, df, date_col_name,
+                    on_chunk=lambda chunk: self._record_load(table_id, chunk, date_col_name, 'backfill')
+                )
+                self._load_children(bqc, table_id, df, children, date_col_name)
+                self._logger.info('Backfill loaded %s activities.', loaded)
+                return True
+
+            # on an existing table only the details of new activities are fetched (in the loop below),
+            # the enrich command catches up the loaded ones
+            fetch_new = table_exists is True and self.enricher is not None and not replay
+            if self.streaming and not replay:
+                chunks = self.stream(after=after, fetch=not table_exists)
             else:
-                self._logger.info('Table not found. Batch loading activities.')
-                bqc.upload_table(table_id, df)
+                df_raw = self.replay() if replay else self.extract(after=after)
+                # replays never call the API, stored details are still used
+                df_raw = self._enrich(df_raw, fetch=not replay and not table_exists)
+                # self.extract() raw dataframe as an argument for self.transform() 
+                chunks = [self._prepare(self.transform(df_raw))] if not df_raw.empty else []
+
+            df_to_compare = None
+            def new_rows(df):
+                """Rows of df not in the table yet (known ids, else the freshness compare query)"""
+                nonlocal df_to_compare, sql_query
+                if known_ids is not None:
+                    return bqc.newest_data(df, known_ids=known_ids)
+                if df_to_compare is None:
+                    if sql_query is None:
+                        sql_query = bqc.freshness_query(table_id, date_col_name)
+                    df_to_compare = bqc.query_table(sql_query, table_id=table_id)
+                return bqc.newest_data(df, df_to_compare, date_col_name)
+
+            created_table = False
+            loaded = 0
+            for df in chunks:
+                # rows already in the table (or waiting in the buffer) are filtered out first
+                df_new = None
+                if table_exists is True and not created_table and (self.load_buffer is not None
+                                                                   or self.load_mode != 'merge' or fetch_new):
+                    df_new = new_rows(df)
+                    if self.load_buffer is not None:
+                        df_new = df_new[~df_new['id'].isin(self.load_buffer.buffered_ids(table_id))]
+                if fetch_new:
+                    df = self._enrich(df, fetch_ids=df_new['id'])
+                    df_new = df[df['id'].isin(df_new['id'])]
+
+                # child rows are only built for the activities loaded, a merge (re)loads the whole chunk
+                merge_all = self.load_buffer is None and self.load_mode == 'merge'
+                df_load, children = self.split_children(df if df_new is None or merge_all else df_new,
+                                                        date_col_name)
+                if (table_exists or created_table) and not df_load.empty:
+                    # enrichment and geo cols may be new to the table
+                    bqc.add_columns(table_id, df_load)
+
+                if created_table:
+                    # later pages of a first load, all older than what was just uploaded
+                    bqc.append_to_table(table_id, df_load)
+                    self._record_load(table_id, df_load, date_col_name, 'append')
+                    loaded += len(df_load)
+                elif table_exists is True and self.load_buffer is not None:
+                    if len(df_load) > 0:
+                        # recorded in the state store by the flush, once the rows are in BigQuery
+                        self.load_buffer.append(table_id, df_load)
+                        loaded += len(df_load)
+                    # child rows are loaded by the flush too, after their parents
+                    children = {}
+                elif table_exists is True and self.load_mode == 'merge':
+                    # exact server-side dedup, no compare query needed
+                    affected = bqc.merge_into_table(table_id, df_load)
+                    self._logger.info('Merged %s activities... %s rows inserted or updated.', len(df_load), affected)
+                    self._record_load(table_id, df_load, date_col_name, 'merge')
+                    loaded += affected
+                elif table_exists is True:
+                    if len(df_load) > 0:
+                        self._logger.info('Appending new data... %s new activities.', len(df_load))
+                        bqc.append_to_table(table_id, df_load)
+                        self._record_load(table_id, df_load, date_col_name, 'append')
+                        loaded += len(df_load)
+                else:
+                    self._logger.info('Table not found. Batch loading activities.')
+                    bqc.upload_table(table_id, df_load)
+                    self._record_load(table_id, df_load, date_col_name, 'upload')
+                    created_table = True
+                    loaded += len(df_load)
+                self._load_children(bqc, table_id, df_load, children, date_col_name)
+
+            if self.load_buffer is not None and self.load_buffer.should_flush(table_id):
+                self.load_buffer.flush(table_id, bqc, on_load=self._buffer_recorder(bqc, table_id, date_col_name))
+
+            if loaded == 0:
+                self._logger.info('Data up to date!')
             return True
         except Exception as e:
             self._logger.error('Error in load method: %s', e)
             raise
-    
\ No newline at end of file
+
+    def flush(self, bqc: BigQueryConnector, project_name: str, dataset_name: str, table_name: str,
+              date_col_name: str = None) -> int:
+        """
+        Loads everything in the load buffer into BigQuery, whatever the thresholds.
+
+        :param bqc: BiqQueryConnector class object
+        :param project_name: name of GCS project
+        :param dataset_name: name of dataset
+        :param table_name: name of table
+        :param date_col_name: name of the date col recorded in the state store [default = None]
+        :returns: number of rows loaded
+        """
+        if self.load_buffer is None:
+            raise ValueError('Flush needs bigquery.load_buffer to be configured.')
+        table_id = ".".join([project_name, dataset_name, table_name])
+        return self.load_buffer.flush(table_id, bqc, force=True,
+                                      on_load=self._buffer_recorder(bqc, table_id, date_col_name))
+
+    def _buffer_recorder(self, bqc: BigQueryConnector, table_id: str, date_col_name: str):
+        """
+        Callback run once a flush job succeeded: loads the child rows of the
+        flushed activities, then records them in the state store. If it
+        fails, the manifest is replayed by the next flush.
+        """
+        def on_load(df):
+            self._load_children(bqc, table_id, df, self._stored_children(df, date_col_name), date_col_name)
+            self._record_load(table_id, df, date_col_name, 'buffer')
+        return on_load
+
+    def _stored_children(self, df: pd.DataFrame, date_col_name: str) -> dict:
+        """Child dataframes of activities rebuilt from their stored details (buffered rows hold no list cols)"""
+        if self.child_tables is None or self.enricher is None or df.empty:
+            return {}
+        parents = df[[col for col in ['id', date_col_name] if col in df.columns]].copy()
+        ids = parents['id'].astype('int64')
+        details = self.enricher.detail_store.get_many(ids)
+        for field in self.child_tables.fields:
+            parents[field] = ids.map({activity_id: detail.get(field) for activity_id, detail in details.items()})
+        return self.split_children(parents, date_col_name)[1]
+
+    @staticmethod
+    def backfill_windows(start, end, window_days: int = 30) -> list:
+        """
+        Splits [start, end) into windows of window_days, oldest first.
+
+        :param start: first date of the range
+        :param end: end of the range (exclusive)
+        :param window_days: days per window [default = 30]
+        :return windows: list of (after, before) pd.Timestamp pairs
+        """
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        if start >= end:
+            raise ValueError(f'Backfill start {start} must be before end {end}.')
+        bounds = list(pd.date_range(start, end, freq=pd.Timedelta(days=window_days)))
+        if bounds[-1] < end:
+            bounds.append(end)
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def backfill(self, bqc: BigQueryConnector, project_name: str, dataset_name: str, table_name: str, date_col_name: str,
+                 start, end, checkpoint_store: CheckpointStore, window_days: int = 30) -> int:
+        """
+        Loads the activities of a date range window by window with
+        `after`/`before` params. Every finished window is checkpointed, so a
+        restarted backfill resumes at the first unfinished window. Windows
+        are loaded with a MERGE on id once the table exists, so replaying a
+        window that landed before a crash cannot duplicate activities.
+
+        Without an end, the range runs to now; the resolved end is kept in
+        the checkpoint and reused while a backfill with the same start and
+        window_days is unfinished, so a restart resumes the same windows.
+
+        :param bqc: BiqQueryConnector class object
+        :param project_name: name of GCS project
+        :param dataset_name: name of dataset
+        :param table_name: name of table
+        :param date_col_name: name of the date col
+        :param start: first date of the range
+        :param end: end of the range (exclusive), None for now
+        :param checkpoint_store: CheckpointStore keeping the finished windows
+        :param window_days: days per window [default = 30]
+        :returns: number of activities loaded in this run
+        """
+        try:
+            table_id = ".".join([project_name, dataset_name, table_name])
+            name = f'backfill:{table_id}'
+            state = checkpoint_store.load(name)
+
+            if end is None:
+                end = pd.Timestamp.now().floor('s')
+                saved_range = state.get('range')
+                if saved_range and saved_range[0] == str(pd.Timestamp(start)) and saved_range[2] == window_days:
+                    saved_windows = self.backfill_windows(saved_range[0], saved_range[1], window_days)
+                    if len(state.get('done', [])) < len(saved_windows):
+                        end = pd.Timestamp(saved_range[1])
+                        self._logger.info('Reusing the end %s of the unfinished backfill of %s.', end, table_id)
+            windows = self.backfill_windows(start, end, window_days)
+
+            job_range = [str(windows[0][0]), str(windows[-1][1]), window_days]
+            if state.get('range') != job_range:
+                state = {'range': job_range, 'done': []}
+                checkpoint_store.save(name, state)
+            done = set(state['done'])
+            pending = [window for window in windows if str(window[0]) not in done]
+
+            progress = ProgressTracker(len(windows), done=len(windows) - len(pending))
+            if done:
+                self._logger.info('Resuming backfill of %s: %s', table_id, progress.report())
+
+            loaded = 0
+            for after, before in pending:
+                header = self.strava_api_connector.get_header()
+                activities = []
+                for _, dataset in self._iter_pages(header, after=int(after.timestamp()), before=int(before.timestamp()),
+                                                   unbounded=True):
+                    activities.extend(dataset)
+
+                if activities:
+                    df = self._prepare(self.transform(self._enrich(self._normalize(activities))))
+                    df, children = self.split_children(df, date_col_name)
+                    if bqc.table_exists(dataset_name, table_name):
+                        bqc.add_columns(table_id, df)
+                        bqc.merge_into_table(table_id, df)
+                        self._record_load(table_id, df, date_col_name, 'merge')
+                    else:
+                        bqc.upload_table(table_id, df)
+                        self._record_load(table_id, df, date_col_name, 'upload')
+                    self._load_children(bqc, table_id, df, children, date_col_name)
+                    loaded += len(df)
+
+                checkpoint_store.update(name, lambda state, key=str(after): {**state, 'done': state['done'] + [key]})
+                progress.update(1, items=len(activities))
+                self._logger.info('Backfilled %s to %s. %s', after.date(), before.date(), progress.report())
+
+            return loaded
+        except Exception as e:
+            self._logger.error('Error in backfill method: %s', e)
+            raise
+
+    def enrich_history(self, bqc: BigQueryConnector, project_name: str, dataset_name: str, table_name: str,
+                       date_col_name: str, max_activities: int = None) -> int:
+        """
+        Fetches the details of activities in the table that have none stored
+        yet, newest first, and writes their detail fields (and child rows)
+        with an update-only MERGE. The daily load only fetches the details of
+        new activities, this catches up the ones loaded before.
+
+        :param bqc: BiqQueryConnector class object
+        :param project_name: name of GCS project
+        :param dataset_name: name of dataset
+        :param table_name: name of the activity table
+        :param date_col_name: name of the date col
+        :param max_activities: max activities to fetch details for in this run [default = None, all]
+        :returns: number of activities updated
+        """
+        if self.enricher is None:
+            raise ValueError('The enrich command needs strava_api.enrichment to be configured.')
+        try:
+            table_id = ".".join([project_name, dataset_name, table_name])
+
+            chunks = list(bqc.read_table(table_id, columns=['id', date_col_name]))
+            activities = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=['id', date_col_name])
+            missing = self.enricher.detail_store.missing(activities['id'].astype('int64'))
+            todo = activities[activities['id'].isin(missing)].sort_values(date_col_name, ascending=False, kind='stable')
+            if max_activities is not None:
+                todo = todo.head(max_activities)
+            self._logger.info('Fetching details of %s activities (%s without one).', len(todo), len(missing))
+
+            self.enricher.fetch(todo['id'].astype('int64'))
+            # activities gone from Strava (or left over by the rate budget) stay without a detail
+            fetched = todo[~todo['id'].isin(self.enricher.detail_store.missing(todo['id'].astype('int64')))]
+            if fetched.empty:
+                return 0
+            updated = self._write_details(bqc, table_id, self.enricher.enrich(fetched.copy(), fetch=False),
+                                          date_col_name)
+            self._logger.info('Wrote the details of %s loaded activities.', updated)
+            return updated
+        except Exception as e:
+            self._logger.error('Error in enrich_history method: %s', e)
+            raise
+
+    def load_streams(self, bqc: BigQueryConnector, project_name: str, dataset_name: str, table_name: str,
+                     streams_table_name: str, date_col_name: str, max_activities: int = None) -> int:
+        """
+        Loads the streams of the activities in the activity table that have
+        none loaded yet, oldest first. Loaded activities are recorded in the
+        state store under the streams table (or, without one, read back from
+        the streams table). With analytics, the derived cols of every loaded
+        chunk are written to the activity table.
+
+        :param bqc: BiqQueryConnector class object
+        :param project_name: name of GCS project
+        :param dataset_name: name of dataset
+        :param table_name: name of the activity table
+        :param streams_table_name: name of the streams table
+        :param date_col_name: name of the date col
+        :param max_activities: max activities to fetch streams for in this run [default = None, all]
+        :returns: number of samples loaded
+        """
+        if self.streams_extractor is None:
+            raise ValueError('Load streams needs strava_api.streams to be configured.')
+        try:
+            table_id = ".".join([project_name, dataset_name, table_name])
+            streams_table_id = ".".join([project_name, dataset_name, streams_table_name])
+
+            chunks = list(bqc.read_table(table_id, columns=['id', date_col_name]))
+            activities = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=['id', date_col_name])
+            if self.state_store is not None:
+                done = self.state_store.known_ids(streams_table_id)
+            elif bqc.table_exists(dataset_name, streams_table_name):
+                # activities without samples have no rows, the extractor keeps their ids
+                done = set(bqc.query_table(f'SELECT DISTINCT activity_id FROM `{streams_table_id}`',
+                                           table_id=streams_table_id)['activity_id'])
+                done |= self.streams_extractor.empty_ids()
+            else:
+                done = self.streams_extractor.empty_ids()
+
+            todo = activities[~activities['id'].isin(done)].sort_values(date_col_name, kind='stable')
+            if max_activities is not None:
+                todo = todo.head(max_activities)
+            self._logger.info('Loading streams of %s activities (%s already loaded).', len(todo), len(done))
+
+            def record(ids, samples):
+                if self.analytics is not None and samples is not None and samples.num_rows > 0:
+                    self._apply_analytics(bqc, table_id, self.analytics.compute(samples))
+                self._record_load(streams_table_id, todo[todo['id'].isin(ids)], date_col_name, 'append')
+
+            return self.streams_extractor.load(bqc, streams_table_id, todo, date_col_name, on_chunk=record)
+        except Exception as e:
+            self._logger.error('Error in load_streams method: %s', e)
+            raise
+
+    def _apply_analytics(self, bqc: BigQueryConnector, table_id: str, derived: pd.DataFrame) -> int:
+        """Writes derived cols to the matching rows of the activity table, adding the cols first"""
+        if derived.empty:
+            return 0
+        bqc.add_columns(table_id, derived)
+        return bqc.merge_into_table(table_id, derived, insert=False)
+
+    def analyze(self, bqc: BigQueryConnector, project_name: str, dataset_name: str, table_name: str,
+                streams_table_name: str) -> int:
+        """
+        Recomputes the stream analytics of every activity in the streams
+        table and writes them to the activity table in one MERGE. Only the
+        cols the kernels need are read, as Arrow batches.
+
+        :param bqc: BiqQueryConnector class object
+        :param project_name: name of GCS project
+        :param dataset_name: name of dataset
+        :param table_name: name of the activity table
+        :param streams_table_name: name of the streams table
+        :returns: number of activities updated
+        """
+        if self.analytics is None:
+            raise ValueError('Analyze needs strava_api.analytics to be configured.')
+        try:
+            table_id = ".".join([project_name, dataset_name, table_name])
+            streams_table_id = ".".join([project_name, dataset_name, streams_table_name])
+            batches = list(bqc.read_table(streams_table_id, columns=StreamAnalytics.STREAM_COLS, as_dataframe=False))
+            if not batches:
+                return 0
+            derived = self.analytics.compute(pa.Table.from_batches(batches))
+            return self._apply_analytics(bqc, table_id, derived)
+        except Exception as e:
+            self._logger.error('Error in analyze method: %s', e)
+            raise
+
+    def near(self, bqc: BigQueryConnector, project_name: str, dataset_name: str, table_name: str,
+             lat: float, lng: float, radius_m: float) -> pd.DataFrame:
+        """
+        Activities starting within a radius of a point, from a SpatialIndex
+        over the start_lat/start_lng cols (no polylines are read or decoded).
+        With a polyline decoder, only the rows whose start_geohash is in the
+        cells around the point are read.
+
+        :param bqc: BiqQueryConnector class object
+        :param project_name: name of GCS project
+        :param dataset_name: name of dataset
+        :param table_name: name of the activity table
+        :param lat: latitude of the point in degrees
+        :param lng: longitude of the point in degrees
+        :param radius_m: radius in meters
+        :returns: dataframe with 'id' and 'distance_m', closest first
+        """
+        table_id = ".".join([project_name, dataset_name, table_name])
+        geohash_precision = self.polyline_decoder.geohash_precision if self.polyline_decoder is not None else None
+        index = SpatialIndex.from_table(bqc, table_id, lat, lng, radius_m, geohash_precision=geohash_precision)
+        return index.near(lat, lng, radius_m)
+
+    def _record_load(self, table_id: str, df: pd.DataFrame, date_col_name: str, mode: str):
+        """Records a successful load in the state store (if there is one)"""
+        if self.state_store is not None:
+            self.state_store.record_load(table_id, df, date_col_name, mode)
+
+    def reconcile(self, bqc: BigQueryConnector, project_name: str, dataset_name: str, table_name: str, date_col_name: str) -> int:
+        """
+        Rebuilds the state store from the BigQuery table, for when it has
+        drifted from the warehouse.
+
+        :param bqc: BiqQueryConnector class object
+        :param project_name: name of GCS project
+        :param dataset_name: name of dataset
+        :param table_name: name of table
+        :param date_col_name: name of the date col
+        :returns: number of activities recorded
+        """
+        if self.state_store is None:
+            raise ValueError('Reconcile needs bigquery.state_store_path to be configured.')
+        try:
+            table_id = ".".join([project_name, dataset_name, table_name])
+            # streamed in chunks, only the two cols needed
+            chunks = bqc.read_table(table_id, columns=['id', date_col_name])
+            return self.state_store.reconcile(table_id, chunks, date_col_name)
+        except Exception as e:
+            self._logger.error('Error in reconcile method: %s', e)
+            raise
+
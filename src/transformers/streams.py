@@ -0,0 +1,258 @@
+"""
+Streams
+
+Author: Jairus Martinez
+Date: 10/17/2026
+This module contains the extractor of per-sample activity streams (GPS,
+heart rate, cadence, power, altitude, ...) into a long-format columnar table.
+"""
+import json
+import logging
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from commons.connectors import StravaAPIConnector, BigQueryConnector
+from commons.fetch_pool import FetchPool
+
+class StreamsExtractor():
+    """
+    Fetches the streams of activities and decodes them into Arrow tables
+    with one row per sample, keyed by activity_id and offset.
+
+    Every stream array is turned into one contiguous NumPy array and handed
+    to Arrow without copying (no per-sample dicts); latlng is split into
+    lat/lng cols. Only streams containing nulls take the slower path that
+    builds a validity bitmap. Activities are fetched by a bounded pool of
+    workers within the rate budget, and grouped into chunks of about
+    chunk_rows samples, each written as Parquet files partitioned by
+    activity month and loaded with one job per file. Activities without
+    samples (gone or manual) are kept in output_dir/EMPTY_FILE so they are
+    not fetched again.
+
+    Attributes:
+        - strava_api_connector: StravaAPIConnector instance
+        - output_dir: root directory of the partitioned Parquet files
+        - concurrency: number of stream requests in flight [default = 4]
+        - chunk_rows: samples per chunk [default = 500000]
+        - budget_reserve: daily requests left untouched for the rest of the job [default = 100]
+        - compression: Parquet compression codec [default = 'snappy']
+    Methods:
+        - decode: decodes the streams of one activity into an Arrow table
+        - chunks: fetches and decodes activities, yielding chunks of whole activities
+        - write: writes a chunk as Parquet files partitioned by activity month
+        - load: loads the streams of activities into a BigQuery table, chunk by chunk
+        - empty_ids: ids of the loaded activities that had no samples
+    """
+    # sample cols besides latlng (decoded into lat/lng), in table order
+    STREAM_TYPES = {
+        'time': pa.int32(),
+        'distance': pa.float64(),
+        'altitude': pa.float64(),
+        'velocity_smooth': pa.float64(),
+        'heartrate': pa.int32(),
+        'cadence': pa.int32(),
+        'watts': pa.int32(),
+        'temp': pa.int32(),
+        'moving': pa.bool_(),
+        'grade_smooth': pa.float64(),
+    }
+    SCHEMA = pa.schema(
+        [('activity_id', pa.int64()), ('activity_date', pa.date32()), ('offset', pa.int32()),
+         ('lat', pa.float64()), ('lng', pa.float64())]
+        + list(STREAM_TYPES.items())
+    )
+    PARTITION_COL = 'activity_month'
+    EMPTY_FILE = 'empty_activities.json'
+
+    def __init__(self, strava_api_connector: StravaAPIConnector, output_dir: str, concurrency: int = 4,
+                 chunk_rows: int = 500000, budget_reserve: int = 100, compression: str = 'snappy'):
+        """
+        Constructor for StreamsExtractor class
+
+        :param strava_api_connector: StravaAPIConnector instance
+        :param output_dir: root directory of the partitioned Parquet files
+        :param concurrency: number of stream requests in flight [default = 4]
+        :param chunk_rows: samples per chunk [default = 500000]
+        :param budget_reserve: daily requests left untouched for the rest of the job [default = 100]
+        :param compression: Parquet compression codec [default = 'snappy']
+        """
+        self.strava_api_connector = strava_api_connector
+        self.output_dir = output_dir
+        self.concurrency = max(1, int(concurrency))
+        self.chunk_rows = max(1, int(chunk_rows))
+        self.budget_reserve = budget_reserve
+        self.compression = compression
+        self._logger = logging.getLogger(__name__)
+
+    def _column(self, key: str, data, pa_type: pa.DataType, num_rows: int) -> pa.Array:
+        """One stream as an Arrow array, zero-copy when it has no nulls"""
+        if data is None or len(data) != num_rows:
+            return pa.nulls(num_rows, pa_type)
+        values = np.asarray(data)
+        if values.dtype == object:
+            # null samples (e.g. sensor dropouts) need a validity bitmap
+            return pa.array(data, type=pa_type)
+        if pa.types.is_integer(pa_type) and values.dtype.kind == 'f':
+            # a cast would truncate fractional samples towards zero
+            rounded = np.rint(values)
+            if not np.array_equal(rounded, values):
+                self._logger.warning('Stream %s has fractional samples, rounded to the nearest integer.', key)
+            values = rounded
+        return pa.array(values.astype(pa_type.to_pandas_dtype(), copy=False))
+
+    def decode(self, activity_id: int, activity_date, streams: dict) -> pa.Table:
+        """
+        Decodes the streams of one activity into an Arrow table.
+
+        :param activity_id: id of the activity
+        :param activity_date: start date of the activity
+        :param streams: dict of type -> {'data': [...]} (as returned by get_streams)
+        :return table: one row per sample with the cols of SCHEMA (missing streams are null)
+        """
+        data = {key: stream.get('data') for key, stream in (streams or {}).items()}
+        num_rows = max((len(values) for values in data.values() if values is not None), default=0)
+
+        latlng = data.get('latlng')
+        if latlng is not None and len(latlng) == num_rows and num_rows > 0:
+            values = np.asarray(latlng)
+            if values.dtype == object or values.ndim != 2:
+                lat = pa.array([point[0] if point else None for point in latlng], type=pa.float64())
+                lng = pa.array([point[1] if point else None for point in latlng], type=pa.float64())
+            else:
+                # one transposing copy makes lat and lng contiguous rows
+                lat_lng = np.ascontiguousarray(values.astype(np.float64, copy=False).T)
+                lat, lng = pa.array(lat_lng[0]), pa.array(lat_lng[1])
+        else:
+            lat = lng = pa.nulls(num_rows, pa.float64())
+
+        day = np.datetime64(pd.Timestamp(activity_date).tz_localize(None).date(), 'D')
+        columns = [
+            pa.array(np.full(num_rows, int(activity_id), dtype=np.int64)),
+            pa.array(np.full(num_rows, day, dtype='datetime64[D]'), type=pa.date32()),
+            pa.array(np.arange(num_rows, dtype=np.int32)),
+            lat,
+            lng,
+        ]
+        columns.extend(self._column(key, data.get(key), pa_type, num_rows) for key, pa_type in self.STREAM_TYPES.items())
+        return pa.Table.from_arrays(columns, schema=self.SCHEMA)
+
+    def _fetch_one(self, activity_id: int, activity_date, header: dict) -> pa.Table:
+        # a missing (404) activity decodes to an empty table, recorded by load so it is not fetched again
+        return self.decode(activity_id, activity_date, self.strava_api_connector.get_streams(activity_id, header))
+
+    def empty_ids(self) -> set:
+        """
+        Ids of the loaded activities that had no samples (gone, private or
+        manual activities), read from output_dir/EMPTY_FILE.
+
+        :return ids: set of activity ids
+        """
+        path = os.path.join(self.output_dir, self.EMPTY_FILE)
+        if not os.path.exists(path):
+            return set()
+        with open(path, encoding='utf-8') as f:
+            return set(json.load(f))
+
+    def _record_empty(self, ids: list, table: pa.Table):
+        """Adds the ids of a chunk without samples to output_dir/EMPTY_FILE"""
+        empty = set(ids) - set(pc.unique(table['activity_id']).to_pylist())
+        if not empty:
+            return
+        path = os.path.join(self.output_dir, self.EMPTY_FILE)
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(sorted(self.empty_ids() | empty), f)
+        os.replace(path + '.tmp', path)
+
+    def chunks(self, activities: pd.DataFrame, date_col_name: str):
+        """
+        Fetches and decodes the streams of activities, oldest first, yielding
+        chunks of about chunk_rows samples. A chunk only holds whole
+        activities, so it can be replaced as a unit.
+
+        :param activities: dataframe with an 'id' col and the date col
+        :param date_col_name: name of the date col
+        :return chunks: iterator of (ids, table) with the activity ids of the chunk and its samples
+        """
+        activities = activities.sort_values(date_col_name, kind='stable')
+        todo = list(zip(activities['id'].astype('int64'), activities[date_col_name]))
+        pool = FetchPool(self.concurrency, self.strava_api_connector, self.budget_reserve)
+        allowed = pool.allowance(len(todo))
+        if allowed < len(todo):
+            self._logger.warning('Rate budget allows %s of %s stream fetches, the rest wait for the next run.',
+                                 allowed, len(todo))
+
+        header = self.strava_api_connector.get_header()
+        ids, tables, num_rows = [], [], 0
+        for (activity_id, _), table in pool.map(lambda activity: self._fetch_one(*activity, header), todo[:allowed]):
+            ids.append(int(activity_id))
+            tables.append(table)
+            num_rows += table.num_rows
+            if num_rows >= self.chunk_rows:
+                # concat_tables only stacks the chunks, no buffers are copied
+                yield ids, pa.concat_tables(tables)
+                ids, tables, num_rows = [], [], 0
+        if ids:
+            yield ids, pa.concat_tables(tables)
+
+    def write(self, table: pa.Table, name: str) -> list:
+        """
+        Writes a chunk as Parquet files partitioned by activity month
+        (output_dir/activity_month=YYYY-MM/name.parquet). activity_date stays
+        in the files, so each one loads on its own.
+
+        :param table: chunk of samples
+        :param name: file name of the chunk within each partition
+        :return paths: list of written file paths
+        """
+        months = pc.strftime(pc.cast(table['activity_date'], pa.timestamp('s')), format='%Y-%m')
+        paths = []
+        for month in pc.unique(months).to_pylist():
+            directory = os.path.join(self.output_dir, f'{self.PARTITION_COL}={month}')
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f'{name}.parquet')
+            part = table.filter(pc.equal(months, month))
+            # write to a temp file and rename so a crash never leaves a partial file
+            pq.write_table(part, path + '.tmp', compression=self.compression)
+            os.replace(path + '.tmp', path)
+            paths.append(path)
+        return paths
+
+    def load(self, bqc: BigQueryConnector, table_id: str, activities: pd.DataFrame, date_col_name: str,
+             on_chunk=None) -> int:
+        """
+        Loads the streams of activities into a BigQuery table, day-partitioned
+        on activity_date and clustered by activity_id, chunk by chunk.
+
+        Before a chunk is loaded into an existing table its activities are
+        deleted, so a chunk that landed before a crash is replaced rather
+        than duplicated when it is loaded again.
+
+        :param bqc: BigQueryConnector
+        :param table_id: 'project.dataset.table' of the streams table
+        :param activities: dataframe with an 'id' col and the date col
+        :param date_col_name: name of the date col
+        :param on_chunk: function called with the ids and samples of every loaded chunk [default = None]
+        :return rows: number of samples loaded
+        """
+        _, dataset_name, table_name = table_id.split('.')
+        loaded = 0
+        for ids, table in self.chunks(activities, date_col_name):
+            self._record_empty(ids, table)
+            if table.num_rows == 0:
+                if on_chunk is not None:
+                    on_chunk(ids, table)
+                continue
+            if bqc.table_exists(dataset_name, table_name):
+                since = pc.min(table['activity_date']).as_py()
+                bqc.delete_rows(table_id, 'activity_id', ids, 'activity_date', since)
+            for path in self.write(table, f'chunk-{ids[0]}-{ids[-1]}'):
+                loaded += bqc.load_parquet(table_id, path, partition_field='activity_date',
+                                           cluster_fields=['activity_id'])
+            if on_chunk is not None:
+                on_chunk(ids, table)
+            self._logger.info('Loaded streams of %s activities (%s samples).', len(ids), table.num_rows)
+        return loaded
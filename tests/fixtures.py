@@ -0,0 +1,57 @@
+"""
+Fixtures
+
+Author: Jairus Martinez
+Date: 10/17/2026
+This module contains fake Strava records shared by the tests and benchmarks.
+"""
+
+def make_activity(activity_id: int) -> dict:
+    """Builds a fake raw activity with the fields StravaETL.transform() needs"""
+    return {
+        'id': activity_id,
+        'name': f'activity {activity_id}',
+        'distance': 1609.344 * activity_id,
+        'moving_time': 60 * activity_id,
+        'elapsed_time': 90 * activity_id,
+        'total_elevation_gain': 10.0,
+        'average_speed': 3.0,
+        'max_speed': 5.0,
+        'elev_high': 100.0,
+        'elev_low': 50.0,
+        'sport_type': 'Ride',
+        'start_date_local': f'2024-01-{activity_id:02d}T07:30:00Z',
+        'map': {'id': f'a{activity_id}', 'summary_polyline': 'abc'},
+        'athlete': {'id': 1},
+    }
+
+def make_summary_activity(activity_id: int) -> dict:
+    """Builds a fake SummaryActivity record"""
+    return {
+        'resource_state': 2,
+        'athlete': {'id': 123, 'resource_state': 1},
+        'name': f'Ride {activity_id}',
+        'distance': 20000.5 + activity_id,
+        'moving_time': 3600 + activity_id,
+        'elapsed_time': 4000,
+        'total_elevation_gain': 150,
+        'type': 'Ride',
+        'sport_type': 'Ride',
+        'workout_type': None,
+        'id': 10_000_000_000 + activity_id,
+        'start_date': '2024-01-01T12:00:00Z',
+        'start_date_local': '2024-01-01T07:00:00Z',
+        'timezone': '(GMT-05:00) America/New_York',
+        'map': {'id': f'a{activity_id}', 'summary_polyline': '_p~iF~ps|U', 'resource_state': 2},
+        'trainer': False,
+        'commute': activity_id % 2 == 0,
+        'start_latlng': [40.0, -75.0],
+        'end_latlng': [],
+        'average_speed': 5.5,
+        'max_speed': 12.1,
+        'has_heartrate': True,
+        'average_heartrate': 140.2,
+        'elev_high': None if activity_id == 1 else 120.0,
+        'elev_low': 10.0,
+        'pr_count': 0,
+    }
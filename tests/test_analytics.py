@@ -0,0 +1,123 @@
+"""
+Analytics Tests
+
+Author: Jairus Martinez
+Date: 10/17/2026
+"""
+import os
+import unittest
+from unittest.mock import MagicMock
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0,parentdir)
+from src.transformers.analytics import StreamAnalytics
+from src.transformers.strava_etl import StravaETL
+
+def make_samples(activity_id: int, speeds: list, heartrate: list = None, watts: list = None) -> pd.DataFrame:
+    """1 Hz samples of an activity, speeds in m/s per second"""
+    num_samples = len(speeds) + 1
+    return pd.DataFrame({
+        'activity_id': activity_id,
+        'offset': np.arange(num_samples),
+        'time': np.arange(num_samples),
+        'distance': np.concatenate(([0.0], np.cumsum(speeds))),
+        'heartrate': heartrate if heartrate is not None else [None] * num_samples,
+        'watts': watts if watts is not None else [None] * num_samples,
+    })
+
+class TestStreamAnalytics(unittest.TestCase):
+    """
+    Test suite for StreamAnalytics
+
+    Tests:
+        test_best_efforts
+        test_best_power
+        test_mile_splits
+        test_zone_times
+        test_activities_kept_apart
+        test_arrow_input
+    """
+    def setUp(self):
+        self.analytics = StreamAnalytics(hr_zones=[120, 150])
+        # 1000 s at 4 m/s, then 500 s at 5 m/s (6500 m)
+        self.run = make_samples(1, [4.0] * 1000 + [5.0] * 500,
+                                heartrate=[110] * 301 + [140] * 600 + [160] * 600,
+                                watts=[100] * 301 + [250] * 1200)
+
+    def derived(self, samples, activity_id: int = 1) -> pd.Series:
+        df = self.analytics.compute(samples)
+        return df[df['id'] == activity_id].iloc[0]
+
+    def test_best_efforts(self):
+        """Fastest 1 km/mile/5 km windows, NaN when the activity is shorter"""
+        derived = self.derived(self.run)
+
+        self.assertEqual(derived['best_1k_s'], 200.0)
+        self.assertEqual(derived['best_mile_s'], 322.0)
+        self.assertEqual(derived['best_5k_s'], 1125.0)
+
+        short = self.derived(make_samples(2, [4.0] * 100), activity_id=2)
+        self.assertTrue(np.isnan(short['best_1k_s']))
+
+    def test_best_power(self):
+        """Best 20 min average power, NaN without a power stream"""
+        self.assertEqual(self.derived(self.run)['best_20min_watts'], 250.0)
+        self.assertTrue(np.isnan(self.derived(make_samples(2, [4.0] * 1500), activity_id=2)['best_20min_watts']))
+
+    def test_mile_splits(self):
+        """One time per full mile, the partial last mile is left out"""
+        splits = self.derived(self.run)['mile_splits_s']
+        self.assertEqual(splits, [403.0, 402.0, 361.0, 322.0])
+
+    def test_zone_times(self):
+        """Seconds per zone (upper bounds inclusive), NaN without heart rate"""
+        derived = self.derived(self.run)
+        self.assertEqual([derived['hr_zone_1_s'], derived['hr_zone_2_s'], derived['hr_zone_3_s']], [300.0, 600.0, 600.0])
+        self.assertTrue(np.isnan(self.derived(make_samples(2, [4.0] * 10), activity_id=2)['hr_zone_1_s']))
+
+    def test_activities_kept_apart(self):
+        """Windows never span two activities and shuffled samples are sorted first"""
+        other = make_samples(2, [10.0] * 50)
+        samples = pd.concat([self.run, other]).sample(frac=1.0, random_state=0)
+
+        df = self.analytics.compute(samples)
+
+        self.assertEqual(df['id'].tolist(), [1, 2])
+        self.assertEqual(df.loc[0, 'best_1k_s'], 200.0)
+        self.assertTrue(np.isnan(df.loc[1, 'best_1k_s']))
+        self.assertEqual(df.loc[1, 'mile_splits_s'], [])
+
+    def test_arrow_input(self):
+        """Arrow tables (with nulls) give the same result as dataframes"""
+        table = pa.Table.from_pandas(self.run, preserve_index=False)
+        pd.testing.assert_frame_equal(self.analytics.compute(table), self.analytics.compute(self.run))
+        self.assertTrue(self.analytics.compute(table.slice(0, 0)).empty)
+
+class TestAnalyze(unittest.TestCase):
+    """
+    Test suite for StravaETL.analyze()
+
+    Tests:
+        test_derived_cols_updated
+    """
+    def test_derived_cols_updated(self):
+        """Derived cols are added to the activity table and only update existing rows"""
+        samples = pa.Table.from_pandas(make_samples(1, [4.0] * 300), preserve_index=False)
+        bqc = MagicMock()
+        bqc.read_table.return_value = iter(samples.to_batches())
+        bqc.merge_into_table.return_value = 1
+        strava_etl = StravaETL(MagicMock(), 1, 1, [], analytics=StreamAnalytics())
+
+        updated = strava_etl.analyze(bqc, 'project', 'dataset', 'table', 'table_streams')
+
+        self.assertEqual(updated, 1)
+        bqc.read_table.assert_called_once_with('project.dataset.table_streams', columns=StreamAnalytics.STREAM_COLS,
+                                               as_dataframe=False)
+        derived = bqc.add_columns.call_args[0][1]
+        self.assertEqual(derived.loc[0, 'best_1k_s'], 250.0)
+        bqc.merge_into_table.assert_called_once_with('project.dataset.table', derived, insert=False)
+
+if __name__ == '__main__':
+    unittest.main()
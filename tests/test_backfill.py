@@ -0,0 +1,240 @@
+"""
+Backfill Tests
+
+Author: Jairus Martinez
+Date: 10/17/2026
+"""
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+import pandas as pd
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0,parentdir)
+from src.commons.backfill import BackfillLoader
+from src.commons.checkpoints import CheckpointStore
+from src.transformers.strava_etl import StravaETL
+
+TABLE_ID = 'project.dataset.table'
+
+def make_history() -> pd.DataFrame:
+    dates = pd.to_datetime(['2024-03-10', '2024-03-02', '2024-02-20', '2024-01-15', '2024-01-01'], utc=True)
+    return pd.DataFrame({'id': [5, 4, 3, 2, 1], 'date': dates})
+
+class TestCheckpointStore(unittest.TestCase):
+    """
+    Test suite for CheckpointStore
+
+    Tests:
+        test_save_load_clear
+        test_concurrent_updates
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'checkpoints', 'state.json')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_save_load_clear(self):
+        """States are kept per job name and survive a reopen"""
+        store = CheckpointStore(self.path)
+        self.assertEqual(store.load('job'), {})
+        store.save('job', {'done': ['2024-01']})
+        store.save('other', {'done': []})
+
+        self.assertEqual(CheckpointStore(self.path).load('job'), {'done': ['2024-01']})
+        store.clear('job')
+        self.assertEqual(store.load('job'), {})
+        self.assertEqual(store.load('other'), {'done': []})
+
+    def test_concurrent_updates(self):
+        """update() from several threads loses nothing"""
+        store = CheckpointStore(self.path)
+        threads = [threading.Thread(target=store.update, args=('job', lambda state, i=i: {**state, str(i): i}))
+                   for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(store.load('job')), 20)
+
+class TestBackfillLoader(unittest.TestCase):
+    """
+    Test suite for BackfillLoader
+
+    Tests:
+        test_chunks
+        test_first_load
+        test_resume_after_failure
+        test_stale_checkpoint_discarded
+        test_etl_first_load
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = CheckpointStore(os.path.join(self.tmp_dir.name, 'checkpoints.json'))
+        self.loader = BackfillLoader(self.store, max_workers=2)
+        self.bqc = MagicMock()
+        self.bqc.table_exists.return_value = False
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_chunks(self):
+        """Chunks are date ranges, oldest first"""
+        chunks = self.loader.chunks(make_history(), 'date')
+        self.assertEqual([key for key, _ in chunks], ['2024-01', '2024-02', '2024-03'])
+        self.assertEqual(chunks[0][1]['id'].tolist(), [2, 1])
+
+    def test_first_load(self):
+        """The oldest chunk creates the table, the others are appended"""
+        loaded = []
+        rows = self.loader.load(self.bqc, TABLE_ID, make_history(), 'date', on_chunk=loaded.append)
+
+        self.assertEqual(rows, 5)
+        self.bqc.upload_table.assert_called_once()
+        self.assertEqual(self.bqc.upload_table.call_args[0][1]['id'].tolist(), [2, 1])
+        self.assertEqual(self.bqc.append_to_table.call_count, 2)
+        self.assertEqual(len(loaded), 3)
+        self.assertFalse(self.loader.in_progress(TABLE_ID))
+        self.assertEqual(sorted(self.store.load('backfill_load:' + TABLE_ID)['done']), ['2024-01', '2024-02', '2024-03'])
+
+    def test_resume_after_failure(self):
+        """Finished chunks are skipped on resume, the interrupted one is merged"""
+        def append(table_id, df):
+            if df['id'].iloc[0] == 5:
+                raise RuntimeError('load job failed')
+        self.bqc.append_to_table.side_effect = append
+
+        with self.assertRaises(RuntimeError):
+            self.loader.load(self.bqc, TABLE_ID, make_history(), 'date')
+        self.assertTrue(self.loader.in_progress(TABLE_ID))
+
+        bqc = MagicMock()
+        bqc.table_exists.return_value = True
+        rows = self.loader.load(bqc, TABLE_ID, make_history(), 'date')
+
+        self.assertEqual(rows, 2)
+        bqc.upload_table.assert_not_called()
+        bqc.append_to_table.assert_not_called()
+        bqc.merge_into_table.assert_called_once()
+        self.assertEqual(bqc.merge_into_table.call_args[0][1]['id'].tolist(), [5, 4])
+        self.assertFalse(self.loader.in_progress(TABLE_ID))
+
+    def test_stale_checkpoint_discarded(self):
+        """A checkpoint for a table that no longer exists is ignored"""
+        self.store.save('backfill_load:' + TABLE_ID, {'status': 'running', 'done': ['2024-01'], 'started': ['2024-01']})
+        self.assertEqual(self.loader.load(self.bqc, TABLE_ID, make_history(), 'date'), 5)
+        self.bqc.upload_table.assert_called_once()
+
+    def test_etl_first_load(self):
+        """StravaETL.load sends the first load through the backfill loader"""
+        connector = MagicMock()
+        connector.get_dataset.return_value = make_history().to_dict('records')
+        strava_etl = StravaETL(connector, 5, 10, [], incremental=True, backfill_loader=self.loader)
+        strava_etl.transform = MagicMock(side_effect=lambda df: df)
+
+        strava_etl.load(self.bqc, 'project', 'dataset', 'table', 'sql', 'date')
+
+        self.bqc.upload_table.assert_called_once()
+        self.assertEqual(self.bqc.append_to_table.call_count, 2)
+        self.bqc.latest_timestamp.assert_not_called()
+
+class TestBackfillCommand(unittest.TestCase):
+    """
+    Test suite for the windowed, resumable StravaETL.backfill()
+
+    Tests:
+        test_windows
+        test_backfill_windows
+        test_resume
+        test_resume_without_end
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = CheckpointStore(os.path.join(self.tmp_dir.name, 'checkpoints.json'))
+        # one activity every 10 days of 2024-01
+        self.activities = [{'id': i, 'start': pd.Timestamp('2024-01-01') + pd.Timedelta(days=10 * i)} for i in range(4)]
+        self.requests = []
+
+        def get_dataset(actv_per_page, page, header, after=None, before=None):
+            self.requests.append((page, after, before))
+            found = [{'id': activity['id'], 'date': activity['start']} for activity in self.activities
+                     if after <= activity['start'].timestamp() < before]
+            return found[(page - 1) * actv_per_page:page * actv_per_page]
+
+        self.connector = MagicMock()
+        self.connector.get_dataset.side_effect = get_dataset
+        self.bqc = MagicMock()
+        self.tables = []
+        self.bqc.table_exists.side_effect = lambda dataset, table: bool(self.tables)
+        self.bqc.upload_table.side_effect = lambda table_id, df: self.tables.append(table_id)
+        # max_page_num is ignored by backfill windows
+        self.strava_etl = StravaETL(self.connector, 1, 1, [])
+        self.strava_etl.transform = MagicMock(side_effect=lambda df: df)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_windows(self):
+        """The range is split into windows, the last one cut at the end"""
+        windows = StravaETL.backfill_windows('2024-01-01', '2024-01-25', window_days=10)
+        self.assertEqual([(str(a.date()), str(b.date())) for a, b in windows],
+                         [('2024-01-01', '2024-01-11'), ('2024-01-11', '2024-01-21'), ('2024-01-21', '2024-01-25')])
+        with self.assertRaises(ValueError):
+            StravaETL.backfill_windows('2024-01-25', '2024-01-01')
+
+    def test_backfill_windows(self):
+        """Each window pages with after/before until a short page; the first creates the table"""
+        loaded = self.strava_etl.backfill(self.bqc, 'project', 'dataset', 'table', 'date',
+                                          '2024-01-01', '2024-02-10', self.store, window_days=20)
+
+        self.assertEqual(loaded, 4)
+        self.bqc.upload_table.assert_called_once()
+        self.assertEqual(self.bqc.merge_into_table.call_count, 1)
+        first_window = [request for request in self.requests if request[1] == int(pd.Timestamp('2024-01-01').timestamp())]
+        self.assertEqual([page for page, _, _ in first_window], [1, 2, 3])
+        self.assertEqual(first_window[0][2], int(pd.Timestamp('2024-01-21').timestamp()))
+        self.assertEqual(len(self.store.load('backfill:project.dataset.table')['done']), 2)
+
+    def test_resume(self):
+        """A restarted backfill skips the checkpointed windows"""
+        self.bqc.merge_into_table.side_effect = RuntimeError('boom')
+        with self.assertRaises(RuntimeError):
+            self.strava_etl.backfill(self.bqc, 'project', 'dataset', 'table', 'date',
+                                     '2024-01-01', '2024-02-10', self.store, window_days=20)
+        self.assertEqual(len(self.store.load('backfill:project.dataset.table')['done']), 1)
+
+        self.bqc.merge_into_table.side_effect = None
+        self.requests.clear()
+        loaded = self.strava_etl.backfill(self.bqc, 'project', 'dataset', 'table', 'date',
+                                          '2024-01-01', '2024-02-10', self.store, window_days=20)
+
+        self.assertEqual(loaded, 2)
+        self.assertEqual({after for _, after, _ in self.requests}, {int(pd.Timestamp('2024-01-21').timestamp())})
+        self.assertEqual(len(self.store.load('backfill:project.dataset.table')['done']), 2)
+
+    def test_resume_without_end(self):
+        """Without an end, a restart reuses the checkpointed end instead of starting over"""
+        self.bqc.merge_into_table.side_effect = RuntimeError('boom')
+        with self.assertRaises(RuntimeError):
+            self.strava_etl.backfill(self.bqc, 'project', 'dataset', 'table', 'date',
+                                     '2024-01-01', None, self.store, window_days=20)
+        saved = self.store.load('backfill:project.dataset.table')
+        self.assertEqual(len(saved['done']), 1)
+
+        self.bqc.merge_into_table.side_effect = None
+        self.requests.clear()
+        later = pd.Timestamp(saved['range'][1]) + pd.Timedelta(days=1)
+        with patch.object(pd.Timestamp, 'now', return_value=later):
+            self.strava_etl.backfill(self.bqc, 'project', 'dataset', 'table', 'date',
+                                     '2024-01-01', None, self.store, window_days=20)
+
+        state = self.store.load('backfill:project.dataset.table')
+        self.assertEqual(state['range'], saved['range'])
+        self.assertNotIn(int(pd.Timestamp('2024-01-01').timestamp()), {after for _, after, _ in self.requests})
+        self.assertEqual(len(state['done']), len(StravaETL.backfill_windows('2024-01-01', saved['range'][1], 20)))
+
+if __name__ == '__main__':
+    unittest.main()
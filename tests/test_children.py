@@ -0,0 +1,166 @@
+"""
+Child Tables Tests
+
+Author: Jairus Martinez
+Date: 10/17/2026
+"""
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+import pandas as pd
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0,parentdir)
+from src.commons.detail_store import DetailStore
+from src.commons.load_buffer import LoadBuffer
+from src.transformers.children import ChildTableBuilder
+from src.transformers.enrichment import DetailEnricher
+from src.transformers.strava_etl import StravaETL
+from tests.fixtures import make_activity
+
+def make_lap(lap_id: int, activity_id: int, elapsed_time: int) -> dict:
+    """Lap as found in a DetailedActivity"""
+    return {'id': lap_id, 'resource_state': 2, 'name': f'Lap {lap_id}', 'elapsed_time': elapsed_time,
+            'activity': {'id': activity_id, 'resource_state': 1}, 'athlete': {'id': 9, 'resource_state': 1}}
+
+class TestChildTableBuilder(unittest.TestCase):
+    """
+    Test suite for ChildTableBuilder
+
+    Tests:
+        test_flatten
+        test_nested_fields
+        test_split
+    """
+    def setUp(self):
+        self.builder = ChildTableBuilder()
+        self.df = pd.DataFrame({
+            'id': [1, 2, 3],
+            'date': pd.to_datetime(['2024-01-01T07:00:00Z', '2024-01-02T07:00:00Z', '2024-01-03T07:00:00Z']),
+            'laps': [[make_lap(11, 1, 300), make_lap(12, 1, 280)], None, [make_lap(31, 3, 600)]],
+            'splits_metric': [[{'split': 1, 'distance': 1000.0}], [], None],
+        })
+
+    def test_flatten(self):
+        """One row per item keyed by activity_id/item_index, the parent's date copied over"""
+        laps = self.builder.flatten(self.df, 'laps', 'date')
+
+        self.assertEqual(laps['activity_id'].tolist(), [1, 1, 3])
+        self.assertEqual(laps['item_index'].tolist(), [0, 1, 0])
+        self.assertEqual(laps['id'].tolist(), [11, 12, 31])
+        self.assertEqual(laps['elapsed_time'].tolist(), [300, 280, 600])
+        self.assertEqual(laps['date'].tolist(), self.df['date'].iloc[[0, 0, 2]].tolist())
+        self.assertEqual(str(laps['date'].dtype), str(self.df['date'].dtype))
+
+    def test_nested_fields(self):
+        """Refs back to the parent are dropped, other nested fields are flattened without '.'"""
+        self.df.at[0, 'laps'] = [{**make_lap(11, 1, 300), 'segment': {'id': 5, 'name': 'climb'}}]
+        laps = self.builder.flatten(self.df, 'laps')
+
+        self.assertEqual(sorted(laps.columns), ['activity_id', 'elapsed_time', 'id', 'item_index', 'name',
+                                                'segment_id', 'segment_name'])
+        self.assertEqual(laps['segment_name'].tolist()[0], 'climb')
+
+    def test_split(self):
+        """List-valued cols leave the activity dataframe, missing fields are skipped"""
+        df, children = self.builder.split(self.df, 'date')
+
+        self.assertEqual(df.columns.tolist(), ['id', 'date'])
+        self.assertEqual(sorted(children), ['laps', 'splits_metric'])
+        self.assertEqual(children['splits_metric']['activity_id'].tolist(), [1])
+
+        empty = self.builder.flatten(self.df.iloc[[1]], 'laps', 'date')
+        self.assertEqual(empty.columns.tolist(), ['activity_id', 'item_index', 'date'])
+        self.assertTrue(empty.empty)
+
+class TestLoadChildren(unittest.TestCase):
+    """
+    Test suite for loading child tables with StravaETL.load()
+
+    Tests:
+        test_first_load_creates_child_tables
+        test_existing_child_tables_replaced
+        test_known_activities_not_split
+        test_buffered_children_loaded_by_flush
+    """
+    def setUp(self):
+        activities = [{**make_activity(i), 'laps': [make_lap(i * 10 + n, i, 60 * n) for n in range(i)]}
+                      for i in (1, 2)]
+        self.connector = MagicMock()
+        self.connector.get_dataset.side_effect = \
+            lambda actv_per_page, page_number, header, **params: activities if page_number == 1 else []
+        self.strava_etl = StravaETL(self.connector, 3, 10, ['athlete.id', 'map.summary_polyline'],
+                                    child_tables=ChildTableBuilder(fields=['laps']))
+        self.bqc = MagicMock()
+
+    def test_first_load_creates_child_tables(self):
+        """The activity and child tables are created in the same run, without the list col"""
+        self.bqc.table_exists.return_value = False
+
+        self.strava_etl.load(self.bqc, 'project', 'dataset', 'table', None, 'date')
+
+        (table_id, df), (child_id, laps) = [c[0] for c in self.bqc.upload_table.call_args_list]
+        self.assertEqual((table_id, child_id), ('project.dataset.table', 'project.dataset.table_laps'))
+        self.assertNotIn('laps', df.columns)
+        self.assertEqual(laps['activity_id'].tolist(), [1, 2, 2])
+        self.assertEqual(laps['item_index'].tolist(), [0, 0, 1])
+
+    def test_existing_child_tables_replaced(self):
+        """The child rows of the loaded activities are deleted, then the current items appended"""
+        self.bqc.table_exists.return_value = True
+        self.bqc.merge_into_table.side_effect = lambda table_id, df, **kwargs: len(df)
+        self.strava_etl.load_mode = 'merge'
+
+        self.strava_etl.load(self.bqc, 'project', 'dataset', 'table', None, 'date')
+
+        child_id, key_col, ids, date_col_name, since = self.bqc.delete_rows.call_args[0]
+        self.assertEqual((child_id, key_col, sorted(ids), date_col_name), ('project.dataset.table_laps', 'activity_id',
+                                                                           [1, 2], 'date'))
+        self.assertEqual(since, self.bqc.merge_into_table.call_args[0][1]['date'].min())
+        child_id, laps = self.bqc.append_to_table.call_args[0]
+        self.assertEqual(child_id, 'project.dataset.table_laps')
+        self.assertEqual(laps['activity_id'].tolist(), [1, 2, 2])
+        self.bqc.merge_into_table.assert_called_once()
+        self.bqc.upload_table.assert_not_called()
+
+    def test_known_activities_not_split(self):
+        """In append mode only the new activities get child rows"""
+        self.bqc.table_exists.return_value = True
+        self.bqc.newest_data.side_effect = lambda df, known_ids=None: df[~df['id'].isin(known_ids)]
+        self.strava_etl.state_store = MagicMock()
+        self.strava_etl.state_store.is_empty.return_value = False
+        self.strava_etl.state_store.known_ids.return_value = {2}
+
+        self.strava_etl.load(self.bqc, 'project', 'dataset', 'table', None, 'date')
+
+        self.assertEqual(self.bqc.delete_rows.call_args[0][2], [1])
+        (table_id, df), (child_id, laps) = [c[0] for c in self.bqc.append_to_table.call_args_list]
+        self.assertEqual(df['id'].tolist(), [1])
+        self.assertEqual(laps['activity_id'].tolist(), [1])
+
+    def test_buffered_children_loaded_by_flush(self):
+        """Child rows of buffered activities are only loaded once the flush put their parents in BigQuery"""
+        self.bqc.table_exists.return_value = True
+        self.bqc.newest_data.side_effect = lambda df, df_to_compare, date_col_name: df
+        self.connector.rate_budget.return_value = None
+        self.connector.get_activity.side_effect = lambda activity_id, header: {
+            'id': activity_id, 'laps': [make_lap(activity_id * 10 + n, activity_id, 60 * n) for n in range(activity_id)]}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.strava_etl.enricher = DetailEnricher(self.connector, DetailStore(os.path.join(tmp_dir, 'details.db')),
+                                                      fields=['laps'])
+            self.strava_etl.load_buffer = LoadBuffer(os.path.join(tmp_dir, 'buffer'), max_rows=100)
+
+            self.strava_etl.load(self.bqc, 'project', 'dataset', 'table', None, 'date')
+            self.bqc.delete_rows.assert_not_called()
+            self.bqc.append_to_table.assert_not_called()
+
+            self.strava_etl.flush(self.bqc, 'project', 'dataset', 'table', 'date')
+
+        self.bqc.merge_into_table.assert_called_once()
+        self.assertEqual(sorted(self.bqc.delete_rows.call_args[0][2]), [1, 2])
+        child_id, laps = self.bqc.append_to_table.call_args[0]
+        self.assertEqual(child_id, 'project.dataset.table_laps')
+        self.assertEqual(sorted(laps['activity_id'].tolist()), [1, 2, 2])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,644 @@
+"""
+Connectors Tests : BigQuery (local, no GCP project needed)
+
+Author: Jairus Martinez
+Date: 10/17/2026
+"""
+import os
+import tempfile
+from datetime import datetime, timezone
+import unittest
+from unittest.mock import MagicMock, patch
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from google.cloud import bigquery
+from google.cloud.exceptions import NotFound
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0,parentdir)
+from src.commons.connectors import BigQueryConnector
+from src.commons.schemas import SchemaRegistry
+from src.commons.metadata_cache import TableMetadataCache
+from src.commons.query_cache import QueryResultCache
+
+def make_connector(client, **kwargs) -> BigQueryConnector:
+    """Builds a BigQueryConnector around a fake/mock client"""
+    with patch('src.commons.connectors.bigquery.Client.from_service_account_info', return_value=client):
+        return BigQueryConnector(service_account_json={}, **kwargs)
+
+class FakeClient():
+    """Local stand-in for bigquery.Client that keeps the Parquet payloads it is sent"""
+    project = 'project'
+
+    def __init__(self):
+        self.loads = []
+        self.schemas = {}
+        self.queries = []
+
+    def get_table(self, table_id):
+        if table_id not in self.schemas:
+            raise NotFound(table_id)
+        return MagicMock(schema=self.schemas[table_id])
+
+    def query(self, sql_query):
+        self.queries.append(sql_query)
+        return MagicMock()
+
+    def load_table_from_file(self, file_obj, table_id, job_config=None):
+        self.loads.append({'table_id': table_id, 'payload': file_obj.read(), 'job_config': job_config})
+        return MagicMock()
+
+    def table(self, index: int = -1) -> pa.Table:
+        """Parquet payload of a load as an Arrow table"""
+        return pq.read_table(pa.BufferReader(self.loads[index]['payload']))
+
+class TestMergeIntoTable(unittest.TestCase):
+    """
+    Test suite for BigQueryConnector.merge_into_table()
+
+    Tests:
+        test_merge_statement
+        test_staging_expires
+        test_repeated_cols_compared_as_json
+        test_batch_deduplicated
+        test_staging_dropped_on_failure
+        test_update_only
+        test_add_columns
+    """
+    def setUp(self):
+        self.client = MagicMock()
+        self.client.get_table.return_value.schema = [
+            bigquery.SchemaField('id', 'INTEGER'),
+            bigquery.SchemaField('name', 'STRING'),
+            bigquery.SchemaField('map_id', 'STRING'),
+        ]
+        self.client.query.return_value.num_dml_affected_rows = 2
+        self.bqc = make_connector(self.client)
+        self.df = pd.DataFrame({'id': [1, 2], 'name': ['a', 'b'], 'map.id': ['m1', 'm2'], 'extra': [0, 0]})
+
+    def test_merge_statement(self):
+        """Batch goes to a staging table, then one MERGE on id into the target"""
+        affected = self.bqc.merge_into_table('project.dataset.table', self.df)
+
+        self.assertEqual(affected, 2)
+        staged, staging_id = self.client.load_table_from_dataframe.call_args[0]
+        self.assertTrue(staging_id.startswith('project.dataset.table_staging_'))
+        self.assertEqual(staged.columns.tolist(), ['id', 'name', 'map_id'])
+
+        sql_query = self.client.query.call_args[0][0]
+        self.assertIn('MERGE `project.dataset.table` T', sql_query)
+        self.assertIn(f'USING `{staging_id}` S', sql_query)
+        self.assertIn('ON T.`id` = S.`id`', sql_query)
+        self.assertIn('WHEN MATCHED AND (T.`name` IS DISTINCT FROM S.`name` OR T.`map_id` IS DISTINCT FROM S.`map_id`) '
+                      'THEN UPDATE SET `name` = S.`name`, `map_id` = S.`map_id`', sql_query)
+        self.assertIn('INSERT (`id`, `name`, `map_id`) VALUES (S.`id`, S.`name`, S.`map_id`)', sql_query)
+        self.client.delete_table.assert_called_once_with(staging_id, not_found_ok=True)
+
+    def test_staging_expires(self):
+        """The staging table is created with an expiration, so a crashed run does not leave it behind"""
+        self.bqc.merge_into_table('project.dataset.table', self.df)
+        staging = self.client.create_table.call_args[0][0]
+        _, staging_id = self.client.load_table_from_dataframe.call_args[0]
+        self.assertEqual(f'{staging.project}.{staging.dataset_id}.{staging.table_id}', staging_id)
+        self.assertGreater(staging.expires, datetime.now(timezone.utc))
+        self.assertLessEqual(staging.expires, datetime.now(timezone.utc) + BigQueryConnector.STAGING_TTL)
+
+    def test_repeated_cols_compared_as_json(self):
+        """Array cols have no equality, they are compared through their json text"""
+        self.client.get_table.return_value.schema.append(bigquery.SchemaField('splits', 'FLOAT', mode='REPEATED'))
+        self.bqc.merge_into_table('project.dataset.table', pd.DataFrame({'id': [1], 'splits': [[1.0, 2.0]]}))
+        sql_query = self.client.query.call_args[0][0]
+        self.assertIn('WHEN MATCHED AND (TO_JSON_STRING(T.`splits`) IS DISTINCT FROM TO_JSON_STRING(S.`splits`))',
+                      sql_query)
+
+    def test_batch_deduplicated(self):
+        """Duplicate ids within the batch are dropped before staging"""
+        df = pd.concat([self.df, self.df], ignore_index=True)
+        self.bqc.merge_into_table('project.dataset.table', df)
+        staged, _ = self.client.load_table_from_dataframe.call_args[0]
+        self.assertEqual(staged['id'].tolist(), [1, 2])
+
+    def test_staging_dropped_on_failure(self):
+        """The staging table is cleaned up when the MERGE fails"""
+        self.client.query.return_value.result.side_effect = RuntimeError('boom')
+        with self.assertRaises(RuntimeError):
+            self.bqc.merge_into_table('project.dataset.table', self.df)
+        self.client.delete_table.assert_called_once()
+
+    def test_update_only(self):
+        """With insert=False unmatched rows are left out"""
+        self.bqc.merge_into_table('project.dataset.table', self.df[['id', 'name']], insert=False)
+        sql_query = self.client.query.call_args[0][0]
+        self.assertIn('WHEN MATCHED AND (T.`name` IS DISTINCT FROM S.`name`) THEN UPDATE SET `name` = S.`name`', sql_query)
+        self.assertNotIn('WHEN NOT MATCHED', sql_query)
+
+    def test_add_columns(self):
+        """Only the missing cols are added, as nullable/repeated fields"""
+        df = pd.DataFrame({'id': [1], 'best_1k_s': [250.0], 'mile_splits_s': [[403.0, 402.0]]})
+        added = self.bqc.add_columns('project.dataset.table', df)
+
+        self.assertEqual(added, ['best_1k_s', 'mile_splits_s'])
+        table, fields = self.client.update_table.call_args[0]
+        self.assertEqual(fields, ['schema'])
+        self.assertEqual([(field.name, field.field_type, field.mode) for field in table.schema[-2:]],
+                         [('best_1k_s', 'FLOAT', 'NULLABLE'), ('mile_splits_s', 'FLOAT', 'REPEATED')])
+
+class TestParquetLoad(unittest.TestCase):
+    """
+    Test suite for the Parquet load path of BigQueryConnector
+
+    Tests:
+        test_job_config
+        test_pinned_types
+        test_all_null_col_keeps_pinned_type
+        test_deterministic_payload
+        test_new_col_bumps_version
+        test_seeded_from_table_schema
+        test_integer_widened_to_float
+        test_all_null_col_not_pinned
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.client = FakeClient()
+        self.bqc = make_connector(self.client, load_format='parquet',
+                                  schema_registry=SchemaRegistry(self.tmp_dir.name))
+        self.table_id = 'project.dataset.table'
+        self.df = pd.DataFrame({
+            'id': [1, 2],
+            'name': ['Morning Run', 'Evening Ride'],
+            'sport_type': pd.Categorical(['Run', 'Ride']),
+            'elev_high': [101.5, 99.0],
+            'commute': [False, True],
+            'start_latlng': [[37.7, -122.4], []],
+            'start_date': pd.to_datetime(['2024-01-01T07:00:00Z', '2024-01-02T18:30:00Z']),
+            'map.id': ['a1', 'a2'],
+        })
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_job_config(self):
+        """Loads go through load_table_from_file with PARQUET and an explicit schema"""
+        self.bqc.append_to_table(self.table_id, self.df)
+
+        job_config = self.client.loads[0]['job_config']
+        self.assertEqual(job_config.source_format, bigquery.SourceFormat.PARQUET)
+        self.assertEqual(job_config.write_disposition, 'WRITE_APPEND')
+        self.assertEqual(job_config.schema_update_options, [bigquery.SchemaUpdateOption.ALLOW_FIELD_ADDITION])
+        self.assertTrue(job_config.parquet_options.enable_list_inference)
+        schema = {field.name: (field.field_type, field.mode) for field in job_config.schema}
+        self.assertEqual(schema['start_latlng'], ('FLOAT', 'REPEATED'))
+        self.assertEqual(schema['start_date'], ('TIMESTAMP', 'NULLABLE'))
+        self.assertEqual(schema['sport_type'], ('STRING', 'NULLABLE'))
+        self.assertIn('map_id', schema)
+
+    def test_pinned_types(self):
+        """The Parquet payload carries the pinned Arrow types in schema order"""
+        self.bqc.upload_table(self.table_id, self.df)
+
+        table = self.client.table()
+        self.assertEqual(table.column_names, ['id', 'name', 'sport_type', 'elev_high', 'commute',
+                                              'start_latlng', 'start_date', 'map_id'])
+        self.assertEqual(table.schema.field('id').type, pa.int64())
+        self.assertEqual(table.schema.field('sport_type').type, pa.string())
+        self.assertEqual(table.schema.field('start_latlng').type, pa.list_(pa.float64()))
+        self.assertEqual(table.schema.field('start_date').type, pa.timestamp('us', tz='UTC'))
+        self.assertIsNone(table.schema.metadata)
+
+    def test_all_null_col_keeps_pinned_type(self):
+        """A page where a col is all-null still loads with the pinned type"""
+        self.bqc.upload_table(self.table_id, self.df)
+        df = self.df.assign(elev_high=[None, None], name=[None, None])
+        self.bqc.append_to_table(self.table_id, df)
+
+        table = self.client.table()
+        self.assertEqual(table.schema.field('elev_high').type, pa.float64())
+        self.assertEqual(table.schema.field('name').type, pa.string())
+        self.assertEqual(table.column('elev_high').null_count, 2)
+        self.assertEqual(self.bqc.schema_registry.version(self.table_id), 1)
+
+    def test_deterministic_payload(self):
+        """Equal frames give byte-identical payloads"""
+        self.bqc.upload_table(self.table_id, self.df)
+        self.bqc.upload_table(self.table_id, self.df.copy())
+        self.assertEqual(self.client.loads[0]['payload'], self.client.loads[1]['payload'])
+
+    def test_new_col_bumps_version(self):
+        """A new col is added to the pinned schema as a new, persisted version"""
+        self.bqc.upload_table(self.table_id, self.df)
+        self.bqc.append_to_table(self.table_id, self.df.assign(kudos_count=[3, 4]))
+
+        registry = SchemaRegistry(self.tmp_dir.name)
+        self.assertEqual(registry.version(self.table_id), 2)
+        fields = registry.schema_for(self.table_id, self.df)
+        self.assertEqual(fields[-1], {'name': 'kudos_count', 'type': 'INTEGER', 'mode': 'NULLABLE'})
+        self.assertEqual(registry.version(self.table_id), 2)
+
+    def test_seeded_from_table_schema(self):
+        """A new process takes the existing table's types instead of inferring them again"""
+        self.client.schemas[self.table_id] = [bigquery.SchemaField('id', 'INTEGER'),
+                                              bigquery.SchemaField('average_watts', 'FLOAT'),
+                                              bigquery.SchemaField('elev_high', 'FLOAT64')]
+        self.bqc.append_to_table(self.table_id, pd.DataFrame({'id': [1, 2], 'average_watts': [150, 160],
+                                                              'elev_high': [None, None]}))
+
+        table = self.client.table()
+        self.assertEqual(table.schema.field('average_watts').type, pa.float64())
+        self.assertEqual(table.schema.field('elev_high').type, pa.float64())
+        self.assertEqual(self.client.queries, [])
+
+    def test_integer_widened_to_float(self):
+        """An INTEGER col receiving fractional values is widened, on the table too, instead of truncated"""
+        self.bqc.upload_table(self.table_id, pd.DataFrame({'id': [1, 2], 'average_watts': [150, 160]}))
+        self.client.schemas[self.table_id] = [bigquery.SchemaField('id', 'INTEGER'),
+                                              bigquery.SchemaField('average_watts', 'INTEGER')]
+        self.bqc.append_to_table(self.table_id, pd.DataFrame({'id': [3, 4], 'average_watts': [150.3, None]}))
+
+        table = self.client.table()
+        self.assertEqual(table.column('average_watts').to_pylist(), [150.3, None])
+        self.assertEqual(self.client.queries,
+                         [f'ALTER TABLE `{self.table_id}` ALTER COLUMN `average_watts` SET DATA TYPE FLOAT64'])
+        self.assertEqual(self.bqc.schema_registry.version(self.table_id), 2)
+
+    def test_all_null_col_not_pinned(self):
+        """An all-null col in the first batch does not pin a type, the first real values do"""
+        self.bqc.upload_table(self.table_id, self.df.assign(average_watts=[None, None]))
+        self.assertNotIn('average_watts', self.client.table().column_names)
+
+        self.bqc.append_to_table(self.table_id, self.df.assign(average_watts=[210.5, None]))
+        self.assertEqual(self.client.table().schema.field('average_watts').type, pa.float64())
+
+class TestPartitioning(unittest.TestCase):
+    """
+    Test suite for the partitioned/clustered table and the pruned queries
+
+    Tests:
+        test_upload_creates_partitioned_table
+        test_append_leaves_table_spec_alone
+        test_latest_timestamp_pruned
+        test_freshness_query
+        test_freshness_query_unpartitioned
+        test_merge_matches_all_partitions
+        test_unpartitioned_table_warned
+    """
+    def setUp(self):
+        self.client = MagicMock()
+        self.client.get_table.return_value.schema = [
+            bigquery.SchemaField('id', 'INTEGER'),
+            bigquery.SchemaField('sport_type', 'STRING'),
+            bigquery.SchemaField('date', 'TIMESTAMP'),
+        ]
+        self.bqc = make_connector(self.client, partition_field='date', partition_type='DAY')
+        self.table_id = 'project.dataset.table'
+        self.df = pd.DataFrame({'id': [1, 2], 'sport_type': ['Run', 'Ride'],
+                                'date': pd.to_datetime(['2024-03-02T07:00:00Z', '2024-03-05T18:30:00Z'])})
+
+    def query_results(self, *dfs):
+        """Makes client.query(...).to_dataframe() return dfs in order"""
+        jobs = []
+        for df in dfs:
+            job = MagicMock()
+            job.to_dataframe.return_value = df
+            jobs.append(job)
+        self.client.query.side_effect = jobs
+
+    def test_upload_creates_partitioned_table(self):
+        """New tables are partitioned on the date col and clustered by sport_type/id"""
+        self.bqc.upload_table(self.table_id, self.df)
+
+        job_config = self.client.load_table_from_dataframe.call_args[1]['job_config']
+        self.assertEqual(job_config.time_partitioning.field, 'date')
+        self.assertEqual(job_config.time_partitioning.type_, 'DAY')
+        self.assertEqual(job_config.clustering_fields, ['sport_type', 'id'])
+
+    def test_append_leaves_table_spec_alone(self):
+        """Appends do not carry a partitioning spec"""
+        self.bqc.append_to_table(self.table_id, self.df)
+        job_config = self.client.load_table_from_dataframe.call_args[1]['job_config']
+        self.assertIsNone(job_config.time_partitioning)
+
+    def test_latest_timestamp_pruned(self):
+        """The watermark query only reads the newest partition"""
+        self.query_results(pd.DataFrame({'partition_id': ['20240305']}),
+                           pd.DataFrame({'latest': [pd.Timestamp('2024-03-05 18:30:00')]}))
+
+        latest = self.bqc.latest_timestamp(self.table_id, 'date')
+
+        self.assertEqual(latest, pd.Timestamp('2024-03-05 18:30:00'))
+        partitions_query, max_query = [c[0][0] for c in self.client.query.call_args_list]
+        self.assertIn('`project.dataset.INFORMATION_SCHEMA.PARTITIONS`', partitions_query)
+        self.assertIn("table_name = 'table'", partitions_query)
+        self.assertIn("WHERE `date` >= TIMESTAMP('2024-03-05 00:00:00')", max_query)
+
+    def test_freshness_query(self):
+        """The compare query reads from a week before the watermark, with no LIMIT"""
+        self.query_results(pd.DataFrame({'partition_id': ['20240305']}),
+                           pd.DataFrame({'latest': [pd.Timestamp('2024-03-05 18:30:00', tz='UTC')]}))
+
+        sql_query = self.bqc.freshness_query(self.table_id, 'date')
+
+        self.assertIn('SELECT DISTINCT id, name, date', sql_query)
+        self.assertIn("WHERE `date` >= TIMESTAMP('2024-02-27 00:00:00')", sql_query)
+        self.assertNotIn('LIMIT', sql_query)
+
+    def test_freshness_query_unpartitioned(self):
+        """On an unpartitioned table the compare query is one bounded select, with no watermark job"""
+        self.client.get_table.return_value.time_partitioning = None
+
+        sql_query = self.bqc.freshness_query(self.table_id, 'date')
+
+        self.client.query.assert_not_called()
+        self.assertIn('SELECT DISTINCT id, name, date', sql_query)
+        self.assertIn('LIMIT 50', sql_query)
+        self.assertNotIn('WHERE', sql_query)
+
+    def test_merge_matches_all_partitions(self):
+        """The MERGE matches on id alone, an edited start time may have moved the row to a later partition"""
+        self.bqc.merge_into_table(self.table_id, self.df)
+        sql_query = self.client.query.call_args[0][0]
+        self.assertIn("ON T.`id` = S.`id`\n", sql_query)
+        self.assertNotIn('TIMESTAMP(', sql_query)
+
+    def test_unpartitioned_table_warned(self):
+        """An existing unpartitioned table is not migrated: warned once, no partitions query"""
+        self.client.get_table.return_value.time_partitioning = None
+        self.query_results(pd.DataFrame({'latest': [pd.Timestamp('2024-03-05 18:30:00')]}),
+                           pd.DataFrame({'latest': [pd.Timestamp('2024-03-05 18:30:00')]}))
+
+        with self.assertLogs('src.commons.connectors', level='WARNING') as logs:
+            self.bqc.latest_timestamp(self.table_id, 'date')
+            self.bqc.latest_timestamp(self.table_id, 'date')
+
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('partitioning only applies to new tables', logs.output[0])
+        max_query = self.client.query.call_args_list[0][0][0]
+        self.assertEqual(max_query, 'SELECT MAX(date) AS latest FROM `project.dataset.table`')
+
+class TestArrowReads(unittest.TestCase):
+    """
+    Test suite for the streaming Arrow read path of BigQueryConnector
+
+    Tests:
+        test_read_table_projection
+        test_read_table_unknown_col
+        test_query_batches
+        test_query_arrow
+        test_read_client_credentials
+    """
+    def setUp(self):
+        self.client = MagicMock()
+        self.client.get_table.return_value.schema = [
+            bigquery.SchemaField('id', 'INTEGER'),
+            bigquery.SchemaField('name', 'STRING'),
+            bigquery.SchemaField('date', 'TIMESTAMP'),
+        ]
+        self.batches = [
+            pa.record_batch({'id': [1, 2], 'date': ['2024-01-01', '2024-01-02']}),
+            pa.record_batch({'id': pa.array([], pa.int64()), 'date': pa.array([], pa.string())}),
+            pa.record_batch({'id': [3], 'date': ['2024-01-03']}),
+        ]
+        rows = MagicMock()
+        rows.to_arrow_iterable.return_value = iter(self.batches)
+        rows.to_arrow.return_value = pa.Table.from_batches(self.batches)
+        self.client.list_rows.return_value = rows
+        self.client.query.return_value.result.return_value = rows
+        self.bqc = make_connector(self.client)
+
+    def test_read_table_projection(self):
+        """Only the selected cols are read, as dataframe chunks, empty batches skipped"""
+        chunks = list(self.bqc.read_table('project.dataset.table', columns=['id', 'date'], max_results=10))
+
+        _, kwargs = self.client.list_rows.call_args
+        self.assertEqual([field.name for field in kwargs['selected_fields']], ['id', 'date'])
+        self.assertEqual(kwargs['max_results'], 10)
+        self.assertEqual(len(chunks), 2)
+        self.assertIsInstance(chunks[0], pd.DataFrame)
+        self.assertEqual(pd.concat(chunks)['id'].tolist(), [1, 2, 3])
+
+    def test_read_table_unknown_col(self):
+        """Selecting a col the table lacks fails before any read"""
+        with self.assertRaises(ValueError):
+            list(self.bqc.read_table('project.dataset.table', columns=['id', 'nope']))
+        self.client.list_rows.assert_not_called()
+
+    def test_query_batches(self):
+        """Query results stream as Arrow record batches"""
+        batches = list(self.bqc.query_batches('SELECT 1', max_results=5, as_dataframe=False))
+
+        self.client.query.return_value.result.assert_called_once_with(max_results=5, page_size=None)
+        self.assertTrue(all(isinstance(batch, pa.RecordBatch) for batch in batches))
+        self.assertEqual(sum(batch.num_rows for batch in batches), 3)
+
+    def test_query_arrow(self):
+        """query_arrow returns the whole result as an Arrow table"""
+        table = self.bqc.query_arrow('SELECT 1')
+        self.assertIsInstance(table, pa.Table)
+        self.assertEqual(table.num_rows, 3)
+
+    def test_read_client_credentials(self):
+        """The Storage read client is built from the connector's own service account info"""
+        self.bqc.service_account_json = {'client_email': 'etl@project.iam.gserviceaccount.com'}
+        with patch('src.commons.connectors.bigquery_storage') as bigquery_storage, \
+             patch('src.commons.connectors.service_account.Credentials.from_service_account_info') as from_info:
+            self.assertIs(self.bqc._bqstorage_client(), bigquery_storage.BigQueryReadClient.return_value)
+            self.bqc._bqstorage_client()
+
+        from_info.assert_called_once_with({'client_email': 'etl@project.iam.gserviceaccount.com'})
+        bigquery_storage.BigQueryReadClient.assert_called_once_with(credentials=from_info.return_value)
+
+class TestMetadataCache(unittest.TestCase):
+    """
+    Test suite for the table metadata cache of BigQueryConnector
+
+    Tests:
+        test_one_lookup_per_ttl
+        test_missing_table_cached
+        test_invalidated_by_writes
+        test_shared_between_connectors
+    """
+    def setUp(self):
+        self.now = [0.0]
+        self.cache = TableMetadataCache(ttl_seconds=60, clock=lambda: self.now[0])
+        self.client = MagicMock()
+        self.client.project = 'project'
+        self.client.get_table.return_value.schema = [bigquery.SchemaField('id', 'INTEGER')]
+        self.client.get_table.return_value.modified = datetime(2024, 1, 1)
+        self.bqc = make_connector(self.client, metadata_cache=self.cache)
+
+    def test_one_lookup_per_ttl(self):
+        """Existence and schema checks share one get_table call until the TTL passes"""
+        self.assertTrue(self.bqc.table_exists('dataset', 'table'))
+        metadata = self.bqc.table_metadata('project.dataset.table')
+        self.assertEqual([field.name for field in metadata['schema']], ['id'])
+        self.assertEqual(metadata['modified'], datetime(2024, 1, 1))
+        self.assertEqual(self.client.get_table.call_count, 1)
+
+        self.now[0] += 61
+        self.bqc.table_exists('dataset', 'table')
+        self.assertEqual(self.client.get_table.call_count, 2)
+
+    def test_missing_table_cached(self):
+        """A missing table is cached as not existing"""
+        self.client.get_table.side_effect = NotFound('table')
+        self.assertFalse(self.bqc.table_exists('dataset', 'table'))
+        self.assertFalse(self.bqc.table_exists('dataset', 'table'))
+        self.assertEqual(self.client.get_table.call_count, 1)
+
+    def test_invalidated_by_writes(self):
+        """Our own loads drop the cached entry"""
+        self.client.get_table.side_effect = NotFound('table')
+        self.assertFalse(self.bqc.table_exists('dataset', 'table'))
+
+        self.client.get_table.side_effect = None
+        self.bqc.upload_table('project.dataset.table', pd.DataFrame({'id': [1]}))
+        self.assertTrue(self.bqc.table_exists('dataset', 'table'))
+
+        self.bqc.append_to_table('project.dataset.table', pd.DataFrame({'id': [2]}))
+        self.bqc.table_metadata('project.dataset.table')
+        self.assertEqual(self.client.get_table.call_count, 3)
+
+    def test_shared_between_connectors(self):
+        """Connectors given the same cache share lookups"""
+        other = make_connector(self.client, metadata_cache=self.cache)
+        self.bqc.table_exists('dataset', 'table')
+        other.table_exists('dataset', 'table')
+        self.assertEqual(self.client.get_table.call_count, 1)
+
+class TestQueryResultCache(unittest.TestCase):
+    """
+    Test suite for query_table with a QueryResultCache
+
+    Tests:
+        test_hit_submits_no_job
+        test_table_change_misses
+        test_external_write_misses
+        test_lru_eviction
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.now = [1_700_000_000.0]
+        self.cache = QueryResultCache(self.tmp_dir.name, max_entries=2, clock=lambda: self.now[0])
+        self.client = MagicMock()
+        self.client.project = 'project'
+        self.client.get_table.return_value.modified = datetime(2024, 1, 1)
+        self.client.query.return_value.to_dataframe.side_effect = lambda: pd.DataFrame({'id': [1, 2], 'name': ['a', 'b']})
+        self.bqc = make_connector(self.client, query_cache=self.cache)
+        self.table_id = 'project.dataset.table'
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_hit_submits_no_job(self):
+        """Repeating a query on an unchanged table is served from disk"""
+        first = self.bqc.query_table('SELECT id, name FROM t', table_id=self.table_id)
+        second = self.bqc.query_table('SELECT id, name FROM t', table_id=self.table_id)
+
+        self.assertEqual(self.client.query.call_count, 1)
+        pd.testing.assert_frame_equal(first, second)
+
+        # no table_id, no caching
+        self.bqc.query_table('SELECT id, name FROM t')
+        self.assertEqual(self.client.query.call_count, 2)
+
+    def test_table_change_misses(self):
+        """A write to the table (new modified time) changes the key"""
+        self.bqc.query_table('SELECT id FROM t', table_id=self.table_id)
+        self.client.get_table.return_value.modified = datetime(2024, 1, 2)
+        self.bqc.append_to_table(self.table_id, pd.DataFrame({'id': [3]}))
+
+        self.bqc.query_table('SELECT id FROM t', table_id=self.table_id)
+        self.assertEqual(self.client.query.call_count, 2)
+
+    def test_external_write_misses(self):
+        """A write by another process misses, even while the table metadata is still cached"""
+        self.bqc.query_table('SELECT id FROM t', table_id=self.table_id)
+        self.bqc.table_metadata(self.table_id)
+        self.client.get_table.return_value.modified = datetime(2024, 1, 2)
+
+        self.bqc.query_table('SELECT id FROM t', table_id=self.table_id)
+        self.assertEqual(self.client.query.call_count, 2)
+
+    def test_lru_eviction(self):
+        """The least recently used result goes first once max_entries is crossed"""
+        self.bqc.query_table('q1', table_id=self.table_id)
+        self.now[0] += 1
+        self.bqc.query_table('q2', table_id=self.table_id)
+        self.now[0] += 1
+        self.bqc.query_table('q1', table_id=self.table_id)  # hit, q1 is now the most recent
+        self.now[0] += 1
+        self.bqc.query_table('q3', table_id=self.table_id)
+
+        modified = datetime(2024, 1, 1)
+        self.assertIsNotNone(self.cache.get('q1', modified))
+        self.assertIsNone(self.cache.get('q2', modified))
+        self.assertIsNotNone(self.cache.get('q3', modified))
+
+class TestStreamsLoad(unittest.TestCase):
+    """
+    Test suite for BigQueryConnector.load_parquet() and delete_rows()
+
+    Tests:
+        test_load_parquet
+        test_delete_rows
+    """
+    def setUp(self):
+        self.client = FakeClient()
+        self.client.get_table = MagicMock()
+        self.client.get_table.return_value.schema = [bigquery.SchemaField('activity_id', 'INTEGER'),
+                                                     bigquery.SchemaField('activity_date', 'DATE')]
+        self.client.query = MagicMock()
+        self.client.query.return_value.num_dml_affected_rows = 3
+        self.bqc = make_connector(self.client)
+
+    def test_load_parquet(self):
+        """The file is sent as is, with the partitioning/clustering of the new table"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'chunk.parquet')
+            pq.write_table(pa.table({'activity_id': [1, 1], 'offset': [0, 1]}), path)
+            self.bqc.load_parquet('project.dataset.streams', path, partition_field='activity_date',
+                                  cluster_fields=['activity_id'])
+
+        load = self.client.loads[-1]
+        self.assertEqual(load['table_id'], 'project.dataset.streams')
+        self.assertEqual(self.client.table().column('offset').to_pylist(), [0, 1])
+        job_config = load['job_config']
+        self.assertEqual(job_config.source_format, bigquery.SourceFormat.PARQUET)
+        self.assertEqual(job_config.write_disposition, 'WRITE_APPEND')
+        self.assertEqual(job_config.time_partitioning.field, 'activity_date')
+        self.assertEqual(job_config.clustering_fields, ['activity_id'])
+
+    def test_delete_rows(self):
+        """Keys are deleted with a partition filter, an empty list submits no job"""
+        deleted = self.bqc.delete_rows('project.dataset.streams', 'activity_id', [7, 8], 'activity_date', '2024-03-02')
+
+        self.assertEqual(deleted, 3)
+        sql_query = self.client.query.call_args[0][0]
+        self.assertEqual(sql_query, "DELETE FROM `project.dataset.streams` WHERE `activity_id` IN (7, 8) "
+                                    "AND `activity_date` >= DATE('2024-03-02')")
+        self.assertEqual(self.bqc.delete_rows('project.dataset.streams', 'activity_id', []), 0)
+        self.client.query.assert_called_once()
+
+class TestNewestData(unittest.TestCase):
+    """
+    Test suite for BigQueryConnector.newest_data()
+
+    Tests:
+        test_known_ids
+        test_empty_compare_frame
+    """
+    def test_known_ids(self):
+        """Rows whose id is already known are dropped, whatever their date"""
+        bqc = make_connector(MagicMock())
+        df = pd.DataFrame({'id': [1, 2, 3], 'date_col': ['2020-01-01', '2022-01-02', '2022-01-03']})
+        filtered = bqc.newest_data(df, known_ids={2})
+        self.assertEqual(filtered['id'].tolist(), [1, 3])
+
+    def test_empty_compare_frame(self):
+        """An empty pruned compare query falls back to filtering on id only"""
+        bqc = make_connector(MagicMock())
+        df = pd.DataFrame({'id': [1, 2], 'date_col': ['2022-01-02', '2022-01-03']})
+        filtered = bqc.newest_data(df, pd.DataFrame({'id': [], 'date_col': []}), 'date_col')
+        self.assertEqual(filtered['id'].tolist(), [1, 2])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,7 +6,9 @@ Date: 1/07/2024
 """
 import os
 import unittest
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock
+import time
+import requests
 import yaml
 parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 os.sys.path.insert(0,parentdir) 
@@ -25,12 +27,13 @@ class TestStravaAPIConnector(unittest.TestCase):
                 'grant_type': 'type', 
                 'f': 'format'}
         )
+        self.connector.session = MagicMock()
 
-    @patch('src.commons.connectors.requests.post')
-    def test_get_header_success(self, mock_post):
+    def test_get_header_success(self):
         """
         Test for the correct header return and correct call for get_header()
         """
+        mock_post = self.connector.session.post
         mock_response = mock_post.return_value
         mock_response.status_code = 200
         mock_response.json.return_value = {'access_token': 'dummy_token'}
@@ -43,28 +46,46 @@ class TestStravaAPIConnector(unittest.TestCase):
                                           timeout=(10, 10))
         self.assertEqual(header, {'Authorization': 'Bearer dummy_token'})
 
-    @patch('src.commons.connectors.requests.post')
-    def test_get_header_failure(self, mock_post):
+    def test_get_header_failure(self):
         """
         Test to simulate error code 400
         """
+        mock_post = self.connector.session.post
         mock_response = mock_post.return_value
-        mock_response.return_value.status_code = 400  
-        header = self.connector.get_header()
+        mock_response.status_code = 400  
+
+        with self.assertRaises(requests.HTTPError):
+            self.connector.get_header()
 
         mock_post.assert_called_once_with('auth_url', 
                                           data=self.connector.strava_payload, 
                                           verify=False, 
                                           timeout=(10, 10))
-        self.assertIsNone(header)
 
-    @patch('src.commons.connectors.requests.get')
-    def test_get_dataset(self, mock_get):
+    def test_get_header_reuses_token(self):
+        """
+        Test that an unexpired access token is reused without another token request
+        """
+        mock_post = self.connector.session.post
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.json.return_value = {
+            'access_token': 'dummy_token',
+            'expires_at': time.time() + 3600,
+            'refresh_token': 'rotated'}
+
+        self.connector.get_header()
+        header = self.connector.get_header()
+
+        mock_post.assert_called_once()
+        self.assertEqual(header, {'Authorization': 'Bearer dummy_token'})
+
+    def test_get_dataset(self):
         """
         Tests for the correct call and return of get_dataset()/
         """
+        mock_get = self.connector.session.get
         mock_dataset = mock_get.return_value
-        mock_dataset.json.return_value = [{'col_names': 'values'}]
+        mock_dataset.content = b'[{"col_names": "values"}]'
         mock_header = {'Authorization': 'Bearer dummy_token'}
 
         dataset = self.connector.get_dataset(actv_per_page=10, request_page_number=1, header=mock_header)
@@ -75,5 +96,76 @@ class TestStravaAPIConnector(unittest.TestCase):
                                          timeout=(10, 10))
         self.assertEqual(dataset, [{'col_names': 'values'}])
 
+    def test_get_dataset_rate_limited(self):
+        """
+        Tests that get_dataset() waits for rate budget and syncs it from the response headers.
+        """
+        self.connector.rate_limiter = MagicMock()
+        mock_get = self.connector.session.get
+        mock_get.return_value.headers = {'X-RateLimit-Usage': '1,1'}
+        mock_get.return_value.content = b'[]'
+
+        self.connector.get_dataset(actv_per_page=10, request_page_number=1, header={})
+
+        self.connector.rate_limiter.acquire.assert_called_once_with()
+        self.connector.rate_limiter.update.assert_called_once_with({'X-RateLimit-Usage': '1,1'})
+
+    def test_session_pooling_and_retries(self):
+        """
+        Tests that the session reuses a bounded pool and retries 429/5xx with backoff.
+        """
+        connector = StravaAPIConnector('auth_url', 'activities_url', {},
+                                       pool_size=4, max_retries=5, backoff_factor=0.25)
+        adapter = connector.session.get_adapter('https://www.strava.com')
+
+        self.assertEqual(adapter._pool_maxsize, 4)
+        self.assertEqual(adapter.max_retries.total, 5)
+        self.assertEqual(adapter.max_retries.backoff_factor, 0.25)
+        self.assertIn(429, adapter.max_retries.status_forcelist)
+        self.assertIn(503, adapter.max_retries.status_forcelist)
+        self.assertIn('gzip', connector.session.headers['Accept-Encoding'])
+
+    def test_get_activity(self):
+        """
+        Test that get_activity calls the detail endpoint and skips missing activities
+        """
+        mock_get = self.connector.session.get
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.content = b'{"id": 42, "calories": 512.0}'
+
+        activity = self.connector.get_activity(42, {'Authorization': 'Bearer dummy_token'})
+
+        self.assertEqual(activity, {'id': 42, 'calories': 512.0})
+        args, kwargs = mock_get.call_args
+        self.assertEqual(args[0], 'https://www.strava.com/api/v3/activities/42')
+        self.assertEqual(kwargs['params'], {'include_all_efforts': 'false'})
+
+        mock_get.return_value.status_code = 404
+        self.assertIsNone(self.connector.get_activity(43, {}))
+        mock_get.return_value.status_code = 500
+        with self.assertRaises(requests.HTTPError):
+            self.connector.get_activity(44, {})
+
+    def test_get_streams(self):
+        """
+        Test that get_streams requests every stream type keyed by type and skips missing activities
+        """
+        mock_get = self.connector.session.get
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.content = b'{"time": {"data": [0, 1], "series_type": "distance"}}'
+
+        streams = self.connector.get_streams(42, {'Authorization': 'Bearer dummy_token'})
+
+        self.assertEqual(streams, {'time': {'data': [0, 1], 'series_type': 'distance'}})
+        args, kwargs = mock_get.call_args
+        self.assertEqual(args[0], 'https://www.strava.com/api/v3/activities/42/streams')
+        self.assertEqual(kwargs['params'], {'keys': ','.join(StravaAPIConnector.STREAM_KEYS), 'key_by_type': 'true'})
+
+        mock_get.return_value.status_code = 404
+        self.assertIsNone(self.connector.get_streams(43, {}))
+        mock_get.return_value.status_code = 500
+        with self.assertRaises(requests.HTTPError):
+            self.connector.get_streams(44, {})
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
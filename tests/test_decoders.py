@@ -0,0 +1,73 @@
+"""
+Decoders Tests
+
+Author: Jairus Martinez
+Date: 10/17/2026
+"""
+import json
+import os
+import unittest
+from unittest.mock import MagicMock
+import pandas as pd
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0,parentdir)
+from src.commons.decoders import ActivityDecoder
+from src.transformers.strava_etl import StravaETL
+from tests.fixtures import make_summary_activity
+
+class TestActivityDecoder(unittest.TestCase):
+    """
+    Test suite for ActivityDecoder
+
+    Tests:
+        test_matches_json_normalize
+        test_optional_fields
+        test_unexpected_field_fallback
+        test_decode_bytes
+        test_transform_drops_kept_cols
+    """
+    def setUp(self):
+        self.cols_to_drop = ['map.summary_polyline', 'athlete.resource_state', 'resource_state']
+        self.decoder = ActivityDecoder(self.cols_to_drop)
+        self.records = [make_summary_activity(i) for i in range(1, 6)]
+
+    def test_matches_json_normalize(self):
+        """Output equals json_normalize followed by dropping cols_to_drop"""
+        expected = pd.json_normalize(self.records).drop(columns=self.cols_to_drop)
+        pd.testing.assert_frame_equal(self.decoder.decode(self.records), expected)
+
+    def test_optional_fields(self):
+        """Fields missing from some records become nulls, never-seen fields are not created"""
+        self.records[0]['average_watts'] = 210.5
+        expected = pd.json_normalize(self.records).drop(columns=self.cols_to_drop)
+        decoded = self.decoder.decode(self.records)
+        pd.testing.assert_frame_equal(decoded, expected)
+        self.assertNotIn('kilojoules', decoded.columns)
+
+    def test_unexpected_field_fallback(self):
+        """Unknown fields are kept through the json_normalize fallback"""
+        self.records[2]['brand_new_field'] = 'x'
+        self.records[3]['map']['new_nested'] = 1
+        decoded = self.decoder.decode(self.records)
+        self.assertIn('brand_new_field', decoded.columns)
+        self.assertIn('map.new_nested', decoded.columns)
+        self.assertNotIn('map.summary_polyline', decoded.columns)
+
+    def test_decode_bytes(self):
+        """Raw response bodies decode the same as parsed records"""
+        payload = json.dumps(self.records).encode('utf-8')
+        pd.testing.assert_frame_equal(self.decoder.decode_bytes(payload), self.decoder.decode(self.records))
+
+    def test_transform_drops_kept_cols(self):
+        """With fast_decode, transform drops only the cols the decoder kept and still fails on unknown cols"""
+        strava_etl = StravaETL(MagicMock(), 1, 1, self.cols_to_drop + ['timezone'], fast_decode=True)
+        df = strava_etl.transform(strava_etl._normalize(self.records))
+        self.assertNotIn('timezone', df.columns)
+        self.assertNotIn('start_date_local', df.columns)
+
+        strava_etl = StravaETL(MagicMock(), 1, 1, self.cols_to_drop + ['map.summary_polylin'], fast_decode=True)
+        with self.assertRaises(KeyError):
+            strava_etl.transform(strava_etl._normalize(self.records))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+"""
+Enrichment Tests
+
+Author: Jairus Martinez
+Date: 10/17/2026
+"""
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+import pandas as pd
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0,parentdir)
+from src.commons.detail_store import DetailStore
+from src.transformers.enrichment import DetailEnricher
+from src.transformers.strava_etl import StravaETL
+from tests.fixtures import make_activity
+
+def make_detail(activity_id: int) -> dict:
+    return {'id': activity_id, 'calories': 100.0 + activity_id, 'device_name': 'Garmin Edge 530',
+            'splits_metric': [{'split': 1, 'distance': 1000.0}]}
+
+class TestDetailStore(unittest.TestCase):
+    """
+    Test suite for DetailStore
+
+    Tests:
+        test_put_get_missing
+    """
+    def test_put_get_missing(self):
+        """Stored details are returned as stored, missing ids keep their order"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = DetailStore(os.path.join(tmp_dir, 'details.db'))
+            store.put(make_detail(2))
+
+            self.assertEqual(store.missing([3, 2, 1, 3]), [3, 1])
+            self.assertEqual(store.get_many([1, 2]), {2: make_detail(2)})
+
+class TestDetailEnricher(unittest.TestCase):
+    """
+    Test suite for DetailEnricher
+
+    Tests:
+        test_enrich_fetches_missing_only
+        test_fetch_ids
+        test_rate_budget
+        test_bounded_concurrency
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = DetailStore(os.path.join(self.tmp_dir.name, 'details.db'))
+        self.connector = MagicMock()
+        self.connector.rate_budget.return_value = None
+        self.connector.get_activity.side_effect = lambda activity_id, header: (
+            None if activity_id == 404 else make_detail(activity_id))
+        self.df = pd.DataFrame({'id': [1, 2, 3, 404], 'name': ['a', 'b', 'c', 'gone']})
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_enrich_fetches_missing_only(self):
+        """Only ids without a stored detail are fetched; fields become cols"""
+        self.store.put(make_detail(2))
+        enricher = DetailEnricher(self.connector, self.store, concurrency=2)
+
+        df = enricher.enrich(self.df)
+
+        fetched = sorted(c[0][0] for c in self.connector.get_activity.call_args_list)
+        self.assertEqual(fetched, [1, 3, 404])
+        self.assertEqual(df['calories'].tolist()[:3], [101.0, 102.0, 103.0])
+        self.assertTrue(pd.isna(df['calories'].iloc[3]))
+        self.assertEqual(df['device_name'].iloc[0], 'Garmin Edge 530')
+
+        # second run: everything stored except the 404
+        self.connector.get_activity.reset_mock()
+        enricher.enrich(self.df)
+        self.assertEqual([c[0][0] for c in self.connector.get_activity.call_args_list], [404])
+
+    def test_fetch_ids(self):
+        """Only the given ids are fetched, stored details are added for every row"""
+        self.store.put(make_detail(2))
+        df = DetailEnricher(self.connector, self.store).enrich(self.df, fetch_ids=[1])
+        self.assertEqual([c[0][0] for c in self.connector.get_activity.call_args_list], [1])
+        self.assertEqual(df['calories'].tolist()[:2], [101.0, 102.0])
+        self.assertTrue(pd.isna(df['calories'].tolist()[2]))
+
+    def test_rate_budget(self):
+        """A run never starts more fetches than the daily budget minus the reserve"""
+        self.connector.rate_budget.return_value = {'daily_remaining': 102}
+        enricher = DetailEnricher(self.connector, self.store, budget_reserve=100)
+        self.assertEqual(enricher.fetch([1, 2, 3]), 2)
+        self.assertEqual(self.store.missing([1, 2, 3]), [3])
+
+    def test_bounded_concurrency(self):
+        """At most `concurrency` detail requests are in flight"""
+        state = {'active': 0, 'peak': 0}
+        lock = threading.Lock()
+
+        def get_activity(activity_id, header):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            time.sleep(0.005)
+            with lock:
+                state['active'] -= 1
+            return make_detail(activity_id)
+
+        self.connector.get_activity.side_effect = get_activity
+        enricher = DetailEnricher(self.connector, self.store, concurrency=3)
+
+        self.assertEqual(enricher.fetch(range(1, 21)), 20)
+        self.assertLessEqual(state['peak'], 3)
+        self.assertGreater(state['peak'], 1)
+
+class TestLateDetails(unittest.TestCase):
+    """
+    Test suite for enrichment in StravaETL.load() and StravaETL.enrich_history()
+
+    Tests:
+        test_load_fetches_new_only
+        test_enrich_history
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = DetailStore(os.path.join(self.tmp_dir.name, 'details.db'))
+        self.connector = MagicMock()
+        self.connector.rate_budget.return_value = None
+        self.connector.get_activity.side_effect = lambda activity_id, header: make_detail(activity_id)
+        self.connector.get_dataset.side_effect = \
+            lambda actv_per_page, page_number, header, **params: [make_activity(i) for i in (2, 1)] if page_number == 1 else []
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_load_fetches_new_only(self):
+        """The daily load fetches the details of new activities only, loaded ones are left to enrich_history"""
+        state_store = MagicMock()
+        state_store.is_empty.return_value = False
+        state_store.known_ids.return_value = {1}
+        strava_etl = StravaETL(self.connector, 3, 10, ['athlete.id', 'map.summary_polyline'], state_store=state_store,
+                               enricher=DetailEnricher(self.connector, self.store))
+        bqc = MagicMock()
+        bqc.table_exists.return_value = True
+        bqc.newest_data.side_effect = lambda df, known_ids=None: df[~df['id'].isin(known_ids)]
+
+        strava_etl.load(bqc, 'project', 'dataset', 'table', None, 'date')
+
+        self.assertEqual([c[0][0] for c in self.connector.get_activity.call_args_list], [2])
+        appended = bqc.append_to_table.call_args[0][1]
+        self.assertEqual(appended['id'].tolist(), [2])
+        self.assertEqual(appended['calories'].tolist(), [102.0])
+        bqc.merge_into_table.assert_not_called()
+        self.assertEqual(self.store.missing([1, 2]), [1])
+
+    def test_enrich_history(self):
+        """Loaded activities without a detail are fetched newest first, capped, and written with an update-only MERGE"""
+        self.store.put(make_detail(3))
+        strava_etl = StravaETL(self.connector, 3, 10, ['athlete.id', 'map.summary_polyline'],
+                               enricher=DetailEnricher(self.connector, self.store))
+        bqc = MagicMock()
+        bqc.read_table.return_value = iter([pd.DataFrame({
+            'id': [1, 2, 3],
+            'date': pd.to_datetime(['2024-01-01', '2024-01-03', '2024-01-05'])
+        })])
+        bqc.merge_into_table.return_value = 1
+
+        updated = strava_etl.enrich_history(bqc, 'project', 'dataset', 'table', 'date', max_activities=1)
+
+        self.assertEqual(updated, 1)
+        self.assertEqual([c[0][0] for c in self.connector.get_activity.call_args_list], [2])
+        table_id, late = bqc.merge_into_table.call_args[0]
+        self.assertEqual(table_id, 'project.dataset.table')
+        self.assertEqual(bqc.merge_into_table.call_args[1], {'insert': False})
+        self.assertEqual(late['id'].tolist(), [2])
+        self.assertEqual(late.columns.tolist(), ['id', 'date', 'calories', 'device_name', 'description'])
+        self.assertEqual(late['calories'].tolist(), [102.0])
+        self.assertEqual(bqc.add_columns.call_args[0][1].columns.tolist(), late.columns.tolist())
+
+if __name__ == '__main__':
+    unittest.main()
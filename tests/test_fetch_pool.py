@@ -0,0 +1,71 @@
+"""
+Fetch Pool Tests
+
+Author: Jairus Martinez
+Date: 10/17/2026
+"""
+import itertools
+import os
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0,parentdir)
+from src.commons.fetch_pool import FetchPool
+
+class TestFetchPool(unittest.TestCase):
+    """
+    Test suite for FetchPool
+
+    Tests:
+        test_allowance
+        test_map_in_order_and_bounded
+        test_early_close
+    """
+    def test_allowance(self):
+        """A run is capped at the remaining daily budget minus the reserve, uncapped without a budget"""
+        connector = MagicMock()
+        connector.rate_budget.return_value = {'daily_remaining': 102}
+        self.assertEqual(FetchPool(2, connector, budget_reserve=100).allowance(5), 2)
+        self.assertEqual(FetchPool(2, connector, budget_reserve=200).allowance(5), 0)
+
+        connector.rate_budget.return_value = None
+        self.assertEqual(FetchPool(2, connector, budget_reserve=100).allowance(5), 5)
+        self.assertEqual(FetchPool(2).allowance(5), 5)
+
+    def test_map_in_order_and_bounded(self):
+        """Results come back in item order with at most `concurrency` calls in flight"""
+        state = {'active': 0, 'peak': 0}
+        lock = threading.Lock()
+
+        def fetch(item):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            time.sleep(0.002 * (item % 3))
+            with lock:
+                state['active'] -= 1
+            return item * 10
+
+        results = list(FetchPool(3).map(fetch, range(12)))
+
+        self.assertEqual(results, [(item, item * 10) for item in range(12)])
+        self.assertLessEqual(state['peak'], 3)
+
+    def test_early_close(self):
+        """Items are pulled lazily, so an endless iterator works and stopping early queues nothing more"""
+        calls = []
+
+        def fetch(item):
+            calls.append(item)
+            return item
+
+        results = FetchPool(2).map(fetch, itertools.count(1))
+        self.assertEqual([next(results) for _ in range(3)], [(1, 1), (2, 2), (3, 3)])
+        results.close()
+
+        self.assertLessEqual(max(calls), 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+"""
+Load Buffer Tests
+
+Author: Jairus Martinez
+Date: 10/17/2026
+"""
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+import pandas as pd
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0,parentdir)
+from src.commons.load_buffer import LoadBuffer
+from src.transformers.strava_etl import StravaETL
+
+TABLE_ID = 'project.dataset.table'
+
+def make_frame(ids: list) -> pd.DataFrame:
+    return pd.DataFrame({'id': ids, 'name': [f'activity {i}' for i in ids], 'map.id': [f'm{i}' for i in ids]})
+
+class TestLoadBuffer(unittest.TestCase):
+    """
+    Test suite for LoadBuffer
+
+    Tests:
+        test_below_threshold
+        test_flush_coalesces
+        test_age_threshold
+        test_creates_table
+        test_interrupted_flush_replayed
+        test_etl_buffers_appends
+        test_state_recorded_after_flush
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.now = [1_700_000_000.0]
+        self.buffer = LoadBuffer(self.tmp_dir.name, max_rows=5, max_age_seconds=600, clock=lambda: self.now[0])
+        self.bqc = MagicMock()
+        self.bqc.table_exists.return_value = True
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_below_threshold(self):
+        """Small appends stay buffered"""
+        self.buffer.append(TABLE_ID, make_frame([1, 2]))
+
+        self.assertEqual(self.buffer.pending(TABLE_ID)['rows'], 2)
+        self.assertFalse(self.buffer.should_flush(TABLE_ID))
+        self.assertEqual(self.buffer.flush(TABLE_ID, self.bqc), 0)
+        self.bqc.merge_into_table.assert_not_called()
+
+    def test_flush_coalesces(self):
+        """Crossing max_rows flushes every segment as one MERGE, deduplicated by id"""
+        self.buffer.append(TABLE_ID, make_frame([1, 2]))
+        self.buffer.append(TABLE_ID, make_frame([2, 3]))
+        self.buffer.append(TABLE_ID, make_frame([4, 5]))
+        self.assertTrue(self.buffer.should_flush(TABLE_ID))
+
+        self.assertEqual(self.buffer.flush(TABLE_ID, self.bqc), 5)
+
+        self.bqc.merge_into_table.assert_called_once()
+        table_id, df = self.bqc.merge_into_table.call_args[0]
+        self.assertEqual(table_id, TABLE_ID)
+        self.assertEqual(sorted(df['id']), [1, 2, 3, 4, 5])
+        self.assertIn('map_id', df.columns)
+        self.assertEqual(self.buffer.pending(TABLE_ID)['segments'], 0)
+        self.assertEqual(os.listdir(os.path.join(self.tmp_dir.name, TABLE_ID)), [])
+
+    def test_age_threshold(self):
+        """The oldest segment crossing max_age_seconds triggers a flush"""
+        self.buffer.append(TABLE_ID, make_frame([1]))
+        self.now[0] += 601
+        self.assertTrue(self.buffer.should_flush(TABLE_ID))
+        self.assertEqual(self.buffer.flush(TABLE_ID, self.bqc), 1)
+
+    def test_creates_table(self):
+        """A flush into a missing table uploads (creates) it"""
+        self.bqc.table_exists.return_value = False
+        self.buffer.append(TABLE_ID, make_frame([1]))
+        self.buffer.flush(TABLE_ID, self.bqc, force=True)
+        self.bqc.upload_table.assert_called_once()
+        self.bqc.merge_into_table.assert_not_called()
+
+    def test_interrupted_flush_replayed(self):
+        """A flush that died mid-load is replayed, segments are only deleted once loaded"""
+        self.buffer.append(TABLE_ID, make_frame([1, 2]))
+        self.bqc.merge_into_table.side_effect = [RuntimeError('boom'), None, None]
+
+        with self.assertRaises(RuntimeError):
+            self.buffer.flush(TABLE_ID, self.bqc, force=True)
+        self.assertEqual(self.buffer.pending(TABLE_ID)['rows'], 2)
+        self.assertTrue(self.buffer.should_flush(TABLE_ID))
+
+        self.buffer.append(TABLE_ID, make_frame([3]))
+        loaded = self.buffer.flush(TABLE_ID, self.bqc)
+
+        # the manifest is replayed with only its own segments; the new segment waits for a threshold
+        self.assertEqual(loaded, 2)
+        replayed = self.bqc.merge_into_table.call_args[0][1]
+        self.assertEqual(sorted(replayed['id']), [1, 2])
+        self.assertEqual(self.buffer.pending(TABLE_ID)['rows'], 1)
+        self.assertFalse(self.buffer.should_flush(TABLE_ID))
+
+    def test_etl_buffers_appends(self):
+        """StravaETL.load appends new rows to the buffer instead of firing a load job"""
+        connector = MagicMock()
+        connector.get_dataset.return_value = [{'id': 1}, {'id': 2}]
+        strava_etl = StravaETL(connector, 5, 10, [], load_buffer=self.buffer)
+        strava_etl.transform = MagicMock(side_effect=lambda df: df)
+        self.bqc.newest_data.side_effect = lambda df, *args, **kwargs: df
+
+        strava_etl.load(self.bqc, 'project', 'dataset', 'table', 'sql', 'date')
+
+        self.bqc.append_to_table.assert_not_called()
+        # rows already in the table are filtered out before buffering
+        self.bqc.query_table.assert_called_once_with('sql', table_id=TABLE_ID)
+        self.assertEqual(self.buffer.pending(TABLE_ID)['rows'], 2)
+
+        # a rerun before the flush does not buffer the same rows again
+        strava_etl.load(self.bqc, 'project', 'dataset', 'table', 'sql', 'date')
+        self.assertEqual(self.buffer.pending(TABLE_ID)['rows'], 2)
+
+        self.assertEqual(strava_etl.flush(self.bqc, 'project', 'dataset', 'table'), 2)
+        self.bqc.merge_into_table.assert_called_once()
+
+    def test_state_recorded_after_flush(self):
+        """Buffered ids only reach the state store once the flush loaded them"""
+        state_store = MagicMock()
+        state_store.is_empty.return_value = False
+        state_store.known_ids.return_value = set()
+        strava_etl = StravaETL(MagicMock(), 5, 10, [], load_buffer=self.buffer, state_store=state_store)
+        strava_etl.stream = MagicMock(return_value=[pd.DataFrame({'id': [1, 2], 'date': ['2024-01-01', '2024-01-02']})])
+        strava_etl.streaming = True
+        self.bqc.newest_data.side_effect = lambda df, **kwargs: df[~df['id'].isin(kwargs['known_ids'])]
+
+        strava_etl.load(self.bqc, 'project', 'dataset', 'table', None, 'date')
+        state_store.record_load.assert_not_called()
+
+        self.bqc.merge_into_table.side_effect = RuntimeError('boom')
+        with self.assertRaises(RuntimeError):
+            strava_etl.flush(self.bqc, 'project', 'dataset', 'table', 'date')
+        state_store.record_load.assert_not_called()
+
+        self.bqc.merge_into_table.side_effect = None
+        strava_etl.flush(self.bqc, 'project', 'dataset', 'table', 'date')
+        table_id, df, date_col_name, mode = state_store.record_load.call_args[0]
+        self.assertEqual((table_id, sorted(df['id']), date_col_name, mode), (TABLE_ID, [1, 2], 'date', 'buffer'))
+
+if __name__ == '__main__':
+    unittest.main()
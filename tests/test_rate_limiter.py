@@ -0,0 +1,83 @@
+"""
+Rate Limiter Tests
+
+Author: Jairus Martinez
+Date: 10/17/2026
+"""
+import os
+import unittest
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0,parentdir)
+from src.commons.rate_limiter import StravaRateLimiter
+
+class FakeClock():
+    """Clock that only moves when sleep() is called"""
+    def __init__(self, now: float):
+        self.now = now
+        self.sleeps = []
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class TestStravaRateLimiter(unittest.TestCase):
+    """
+    Test suite for StravaRateLimiter
+
+    Tests:
+        test_acquire_within_budget
+        test_sleeps_until_short_window_reset
+        test_update_from_headers
+        test_read_limit_headers
+        test_lock_released_while_sleeping
+    """
+    def setUp(self):
+        # 10 minutes into a 15 minute window
+        self.clock = FakeClock(1_700_000_100.0)
+        self.limiter = StravaRateLimiter(short_limit=3, daily_limit=100,
+                                         clock=self.clock.time, sleep=self.clock.sleep)
+
+    def test_acquire_within_budget(self):
+        """No waiting while tokens remain"""
+        for _ in range(3):
+            self.limiter.acquire()
+        self.assertEqual(self.clock.sleeps, [])
+        self.assertEqual(self.limiter.budget()['short_remaining'], 0)
+
+    def test_sleeps_until_short_window_reset(self):
+        """An empty bucket sleeps exactly until the next 15-minute boundary"""
+        for _ in range(4):
+            self.limiter.acquire()
+        self.assertEqual(len(self.clock.sleeps), 1)
+        self.assertEqual(self.clock.now % StravaRateLimiter.SHORT_WINDOW, 0)
+        self.assertEqual(self.limiter.budget()['short_usage'], 1)
+
+    def test_update_from_headers(self):
+        """Headers set the limits and usage reported by Strava"""
+        self.limiter.update({'X-RateLimit-Limit': '200,2000', 'X-RateLimit-Usage': '150,1200'})
+        budget = self.limiter.budget()
+        self.assertEqual(budget['short_remaining'], 50)
+        self.assertEqual(budget['daily_remaining'], 800)
+
+    def test_read_limit_headers(self):
+        """The stricter read limit wins when both header pairs are sent"""
+        self.limiter.update({'X-RateLimit-Limit': '200,2000', 'X-RateLimit-Usage': '10,100',
+                             'X-ReadRateLimit-Limit': '100,1000', 'X-ReadRateLimit-Usage': '95,100'})
+        self.assertEqual(self.limiter.budget()['short_remaining'], 5)
+
+    def test_lock_released_while_sleeping(self):
+        """Other workers can read the budget while acquire() waits for a reset"""
+        locked_during_sleep = []
+        def sleep(seconds):
+            locked_during_sleep.append(self.limiter._lock.locked())
+            self.clock.sleep(seconds)
+        self.limiter._sleep = sleep
+        for _ in range(4):
+            self.limiter.acquire()
+        self.assertEqual(locked_during_sleep, [False])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+"""
+Response Cache Tests
+
+Author: Jairus Martinez
+Date: 10/17/2026
+"""
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0,parentdir)
+from src.commons.connectors import StravaAPIConnector
+from src.commons.response_cache import ResponseCache
+from src.transformers.strava_etl import StravaETL
+
+class FakeClock():
+    """Settable clock"""
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+class TestResponseCache(unittest.TestCase):
+    """
+    Test suite for ResponseCache
+
+    Tests:
+        test_put_get
+        test_ttl_expiry
+        test_size_eviction
+        test_connector_writes_cache
+        test_replay_without_network
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.clock = FakeClock(1_700_000_000.0)
+        self.records = [{'id': 1, 'start_date': '2024-01-01T00:00:00Z', 'map': {'id': 'a1'}},
+                        {'id': 2, 'start_date': '2024-01-02T00:00:00Z', 'map': {'id': 'a2'}}]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_put_get(self):
+        """Records round trip through the cache"""
+        cache = ResponseCache(self.tmp_dir.name, clock=self.clock)
+        cache.put('url', {'page': 1}, 'athlete', self.records)
+        self.assertEqual(cache.get('url', {'page': 1}, 'athlete'), self.records)
+        self.assertIsNone(cache.get('url', {'page': 2}, 'athlete'))
+        self.assertIsNone(cache.get('url', {'page': 1}, 'other_athlete'))
+
+    def test_ttl_expiry(self):
+        """Pages older than the ttl are misses"""
+        cache = ResponseCache(self.tmp_dir.name, ttl_seconds=60, clock=self.clock)
+        cache.put('url', {'page': 1}, 'athlete', self.records)
+        self.clock.now += 61
+        self.assertIsNone(cache.get('url', {'page': 1}, 'athlete'))
+
+    def test_size_eviction(self):
+        """The least recently used pages are evicted above max_bytes"""
+        cache = ResponseCache(self.tmp_dir.name, clock=self.clock)
+        cache.put('url', {'page': 1}, 'athlete', self.records)
+        page_size = sum(size for _, size, _ in cache._entries())
+
+        cache.max_bytes = page_size * 2 + page_size // 2
+        self.clock.now += 1
+        cache.put('url', {'page': 2}, 'athlete', self.records)
+        self.clock.now += 1
+        cache.get('url', {'page': 1}, 'athlete')
+        self.clock.now += 1
+        cache.put('url', {'page': 3}, 'athlete', self.records)
+
+        self.assertIsNotNone(cache.get('url', {'page': 1}, 'athlete'))
+        self.assertIsNone(cache.get('url', {'page': 2}, 'athlete'))
+        self.assertIsNotNone(cache.get('url', {'page': 3}, 'athlete'))
+
+    def test_connector_writes_cache(self):
+        """get_dataset() always calls the API, so a later run sees new activities, and caches the latest page"""
+        cache = ResponseCache(self.tmp_dir.name, clock=self.clock)
+        connector = StravaAPIConnector('auth_url', 'activities_url', {'client_id': 'id'},
+                                       response_cache=cache)
+        connector.session = MagicMock()
+        new_activity = {'id': 3, 'start_date': '2024-01-03T00:00:00Z', 'map': {'id': 'a3'}}
+        connector.session.get.return_value.content = json.dumps(self.records).encode('utf-8')
+        connector.get_dataset(actv_per_page=10, request_page_number=1, header={})
+
+        # next run: a new activity is at the top of page 1
+        connector.session.get.return_value.content = json.dumps([new_activity] + self.records).encode('utf-8')
+        second = connector.get_dataset(actv_per_page=10, request_page_number=1, header={})
+
+        self.assertEqual(connector.session.get.call_count, 2)
+        self.assertEqual([r['id'] for r in second], [3, 1, 2])
+        self.assertEqual(cache.get('activities_url', {'per_page': 10, 'page': 1}, 'id'), second)
+
+    def test_replay_without_network(self):
+        """StravaETL.replay() rebuilds the raw frame from cached pages only"""
+        cache = ResponseCache(self.tmp_dir.name, clock=self.clock)
+        cache.put('activities_url', {'per_page': 2, 'page': 1}, 'id', self.records)
+        self.clock.now += 1
+        # a later run cached an edited copy of activity 2
+        cache.put('activities_url', {'per_page': 2, 'page': 1, 'after': 0}, 'id',
+                  [dict(self.records[1], name='edited')])
+
+        connector = MagicMock()
+        connector.strava_activities_url = 'activities_url'
+        connector.strava_payload = {'client_id': 'id'}
+        connector.response_cache = cache
+        strava_etl = StravaETL(connector, 5, 2, [])
+
+        df = strava_etl.replay()
+
+        connector.get_header.assert_not_called()
+        connector.get_dataset.assert_not_called()
+        self.assertEqual(df['id'].tolist(), [2, 1])
+        self.assertEqual(df['name'].tolist()[0], 'edited')
+        self.assertIn('map.id', df.columns)
+
+if __name__ == '__main__':
+    unittest.main()
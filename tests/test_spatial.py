@@ -0,0 +1,173 @@
+"""
+Spatial Tests
+
+Author: Jairus Martinez
+Date: 10/17/2026
+"""
+import os
+import re
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, call
+import numpy as np
+import pandas as pd
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0,parentdir)
+from src.transformers.spatial import PolylineDecoder, SpatialIndex, geohash_codes, geohash_strings, haversine
+from src.transformers.strava_etl import StravaETL
+from tests.fixtures import make_activity
+
+# reference polyline of the encoding spec: (38.5, -120.2), (40.7, -120.95), (43.252, -126.453)
+POLYLINE = '_p~iF~ps|U_ulLnnqC_mqNvxq`@'
+
+class TestPolylineDecoder(unittest.TestCase):
+    """
+    Test suite for PolylineDecoder
+
+    Tests:
+        test_decode
+        test_features
+        test_geohash
+    """
+    def setUp(self):
+        self.decoder = PolylineDecoder()
+
+    def test_decode(self):
+        """Every row is decoded in one pass, empty and missing rows have no points"""
+        lat, lng, offsets = self.decoder.decode([POLYLINE, None, '', POLYLINE[:10]])
+
+        self.assertEqual(offsets.tolist(), [0, 3, 3, 3, 4])
+        np.testing.assert_allclose(lat, [38.5, 40.7, 43.252, 38.5])
+        np.testing.assert_allclose(lng, [-120.2, -120.95, -126.453, -120.2])
+
+    def test_features(self):
+        """Start/end, bounding box, geohash and tile cols keep the index, nulls without a polyline"""
+        df = self.decoder.features(pd.Series([POLYLINE, None], index=[10, 11]))
+
+        self.assertEqual(df.columns.tolist(), PolylineDecoder.FEATURE_COLS)
+        self.assertEqual(df.index.tolist(), [10, 11])
+        row = df.loc[10]
+        self.assertEqual((row['start_lat'], row['start_lng'], row['end_lat'], row['end_lng']),
+                         (38.5, -120.2, 43.252, -126.453))
+        self.assertEqual((row['bbox_min_lat'], row['bbox_min_lng'], row['bbox_max_lat'], row['bbox_max_lng']),
+                         (38.5, -126.453, 43.252, -120.2))
+        self.assertEqual(row['start_geohash'], '9qfe0b9')
+        self.assertEqual(row['start_tile'], '12/680/1572')
+        self.assertTrue(np.isnan(df.loc[11, 'start_lat']))
+        self.assertTrue(pd.isna(df.loc[11, 'start_geohash']))
+        self.assertTrue(pd.isna(df.loc[11, 'start_tile']))
+
+    def test_geohash(self):
+        """Matches the reference geohash, missing points give None"""
+        codes = geohash_codes(np.array([57.64911, np.nan]), np.array([10.40744, 0.0]), 11)
+        self.assertEqual(geohash_strings(codes, 11).tolist(), ['u4pruydqqvj', None])
+
+class TestSpatialIndex(unittest.TestCase):
+    """
+    Test suite for SpatialIndex
+
+    Tests:
+        test_near
+        test_reads_only_nearby_cells
+        test_from_table
+        test_from_table_reads_nearby_prefixes
+    """
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        # 5000 starts spread over the western US, plus three around Portland
+        lat = np.concatenate(([45.5200, 45.5250, 45.6000], rng.uniform(32.0, 49.0, 5000)))
+        lng = np.concatenate(([-122.6800, -122.6800, -122.6800], rng.uniform(-124.0, -104.0, 5000)))
+        self.index = SpatialIndex(np.arange(len(lat)), lat, lng)
+
+    def test_near(self):
+        """Same result as a full haversine scan, closest first"""
+        nearby = self.index.near(45.52, -122.68, 1000)
+
+        self.assertEqual(nearby['id'].tolist(), [0, 1])
+        self.assertAlmostEqual(nearby['distance_m'].iloc[1], 556.0, delta=1.0)
+        for lat, lng, radius_m in [(40.0, -110.0, 50000), (47.0, -120.0, 120000)]:
+            inside = haversine(lat, lng, self.index.lat, self.index.lng) <= radius_m
+            self.assertEqual(sorted(self.index.near(lat, lng, radius_m)['id']), sorted(self.index.ids[inside]))
+
+    def test_reads_only_nearby_cells(self):
+        """Exact distances are only computed for the candidates of the neighbouring cells"""
+        self.index._logger = MagicMock()
+        self.index.near(45.52, -122.68, 1000)
+        candidates = self.index._logger.debug.call_args[0][4]
+        self.assertLess(candidates, 10)
+
+    def test_from_table(self):
+        """Only id/start_lat/start_lng are read from the table"""
+        bqc = MagicMock()
+        bqc.read_table.return_value = iter([pd.DataFrame({'id': [7, 8], 'start_lat': [45.52, None],
+                                                          'start_lng': [-122.68, None]})])
+        index = SpatialIndex.from_table(bqc, 'project.dataset.table')
+
+        bqc.read_table.assert_called_once_with('project.dataset.table', columns=['id', 'start_lat', 'start_lng'])
+        self.assertEqual(index.ids.tolist(), [7])
+
+    def test_from_table_reads_nearby_prefixes(self):
+        """With a point, only rows whose start_geohash starts with a neighbouring cell are queried"""
+        table = pd.DataFrame({'id': self.index.ids, 'start_lat': self.index.lat, 'start_lng': self.index.lng,
+                              'start_geohash': geohash_strings(geohash_codes(self.index.lat, self.index.lng, 7), 7)})
+        bqc = MagicMock()
+        bqc.table_metadata.return_value = {'schema': [SimpleNamespace(name=col) for col in table.columns]}
+
+        def query_table(sql_query, table_id=None):
+            prefixes = re.findall(r"STARTS_WITH\(start_geohash, '(\w+)'\)", sql_query)
+            return table[table['start_geohash'].str.startswith(tuple(prefixes))][['id', 'start_lat', 'start_lng']]
+        bqc.query_table.side_effect = query_table
+
+        for lat, lng, radius_m in [(45.52, -122.68, 1000), (40.0, -110.0, 50000)]:
+            index = SpatialIndex.from_table(bqc, 'project.dataset.table', lat, lng, radius_m, geohash_precision=7)
+            self.assertEqual(index.near(lat, lng, radius_m)['id'].tolist(),
+                             self.index.near(lat, lng, radius_m)['id'].tolist())
+            self.assertLess(len(index.ids), len(self.index.ids) / 10)
+        bqc.read_table.assert_not_called()
+        self.assertEqual(len(SpatialIndex.cells(45.52, -122.68, 1000, 7)), 9)
+
+class TestTransformGeo(unittest.TestCase):
+    """
+    Test suite for the geo cols added by StravaETL.transform()
+
+    Tests:
+        test_geo_cols
+        test_geo_cols_added_to_existing_table
+    """
+    def test_geo_cols(self):
+        """The polyline is decoded before it is dropped, also with fast_decode"""
+        strava_etl = StravaETL(MagicMock(), 1, 1, ['map.summary_polyline'], fast_decode=True,
+                               polyline_decoder=PolylineDecoder())
+        df = strava_etl._normalize([
+            {'id': 1, 'start_date_local': '2024-01-01T08:00:00Z', 'map': {'summary_polyline': POLYLINE}},
+            {'id': 2, 'start_date_local': '2024-01-02T08:00:00Z', 'map': {'summary_polyline': ''}},
+        ])
+
+        df = strava_etl.transform(df)
+
+        self.assertNotIn('map.summary_polyline', df.columns)
+        self.assertEqual(df['start_geohash'].iloc[0], '9qfe0b9')
+        self.assertTrue(pd.isna(df['start_geohash'].iloc[1]))
+        self.assertEqual(df['end_lat'].iloc[0], 43.252)
+
+    def test_geo_cols_added_to_existing_table(self):
+        """The geo cols are added to an existing table before the merge"""
+        connector = MagicMock()
+        connector.get_dataset.side_effect = \
+            lambda actv_per_page, page_number, header, **params: [make_activity(1)] if page_number == 1 else []
+        strava_etl = StravaETL(connector, 3, 10, ['athlete.id', 'map.summary_polyline'], load_mode='merge',
+                               polyline_decoder=PolylineDecoder())
+        bqc = MagicMock()
+        bqc.table_exists.return_value = True
+        bqc.merge_into_table.return_value = 1
+
+        strava_etl.load(bqc, 'project', 'dataset', 'table', None, 'date')
+
+        table_id, df = bqc.add_columns.call_args[0]
+        self.assertEqual(table_id, 'project.dataset.table')
+        self.assertIn('start_geohash', df.columns)
+        self.assertEqual(bqc.method_calls.index(call.add_columns(table_id, df)),
+                         bqc.method_calls.index(call.merge_into_table(table_id, df)) - 1)
+
+if __name__ == '__main__':
+    unittest.main()
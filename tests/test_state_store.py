@@ -0,0 +1,98 @@
+"""
+State Store Tests
+
+Author: Jairus Martinez
+Date: 10/17/2026
+"""
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+import pandas as pd
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0,parentdir)
+from src.commons.state_store import StateStore
+from src.transformers.strava_etl import StravaETL
+
+TABLE_ID = 'project.dataset.table'
+
+class TestStateStore(unittest.TestCase):
+    """
+    Test suite for StateStore
+
+    Tests:
+        test_record_load
+        test_tables_are_separate
+        test_reconcile
+        test_load_skips_warehouse_queries
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'state.db')
+        self.store = StateStore(self.path)
+        self.df = pd.DataFrame({'id': [1, 2, 3],
+                                'date': pd.to_datetime(['2024-01-01 07:00', '2024-01-03 18:30', '2024-01-02 06:00'])})
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_record_load(self):
+        """Loaded ids, watermark and run metadata are recorded"""
+        self.assertTrue(self.store.is_empty(TABLE_ID))
+        self.store.record_load(TABLE_ID, self.df, 'date', 'upload')
+
+        self.assertEqual(self.store.known_ids(TABLE_ID), {1, 2, 3})
+        self.assertEqual(self.store.watermark(TABLE_ID), pd.Timestamp('2024-01-03 18:30'))
+        last_run = self.store.last_run(TABLE_ID)
+        self.assertEqual(last_run['mode'], 'upload')
+        self.assertEqual(last_run['row_count'], 3)
+
+        # known_ids stays in sync after later loads, and survives a reopen
+        self.store.record_load(TABLE_ID, pd.DataFrame({'id': [4], 'date': [pd.Timestamp('2024-01-04')]}), 'date')
+        self.assertIn(4, self.store.known_ids(TABLE_ID))
+        self.assertEqual(StateStore(self.path).known_ids(TABLE_ID), {1, 2, 3, 4})
+
+    def test_tables_are_separate(self):
+        """State is kept per table"""
+        self.store.record_load(TABLE_ID, self.df, 'date')
+        self.assertTrue(self.store.is_empty('project.dataset.other'))
+        self.assertIsNone(self.store.watermark('project.dataset.other'))
+
+    def test_reconcile(self):
+        """Reconcile replaces the recorded ids with the table contents"""
+        self.store.record_load(TABLE_ID, self.df, 'date')
+        self.store.known_ids(TABLE_ID)
+        table = pd.DataFrame({'id': [2, 5, 5], 'date': pd.to_datetime(['2024-01-03', '2024-02-01', '2024-02-01'])})
+
+        count = self.store.reconcile(TABLE_ID, table, 'date')
+
+        self.assertEqual(count, 2)
+        self.assertEqual(self.store.known_ids(TABLE_ID), {2, 5})
+        self.assertEqual(self.store.watermark(TABLE_ID), pd.Timestamp('2024-02-01'))
+
+        # chunks streamed from BigQuery
+        chunks = iter([table.iloc[:2], table.iloc[2:], table.iloc[:0]])
+        self.assertEqual(self.store.reconcile(TABLE_ID, chunks, 'date'), 2)
+        self.assertEqual(self.store.last_run(TABLE_ID)['row_count'], 2)
+
+    def test_load_skips_warehouse_queries(self):
+        """With recorded state, load() filters new ids locally without query jobs"""
+        self.store.record_load(TABLE_ID, self.df, 'date')
+        connector = MagicMock()
+        connector.get_dataset.return_value = [{'id': 2}, {'id': 7}]
+        bqc = MagicMock()
+        bqc.table_exists.return_value = True
+        bqc.newest_data.side_effect = lambda df, known_ids=None: df[~df['id'].isin(known_ids)]
+        strava_etl = StravaETL(connector, 5, 10, [], incremental=True, state_store=self.store)
+        strava_etl.transform = MagicMock(side_effect=lambda df: df.assign(date=pd.Timestamp('2024-01-05')))
+
+        strava_etl.load(bqc, 'project', 'dataset', 'table', 'sql', 'date')
+
+        bqc.query_table.assert_not_called()
+        bqc.latest_timestamp.assert_not_called()
+        appended = bqc.append_to_table.call_args[0][1]
+        self.assertEqual(appended['id'].tolist(), [7])
+        self.assertIn(7, self.store.known_ids(TABLE_ID))
+
+if __name__ == '__main__':
+    unittest.main()
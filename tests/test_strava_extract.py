@@ -0,0 +1,206 @@
+"""
+ETL Pipeline Tests : Extract
+
+Author: Jairus Martinez
+Date: 10/17/2026
+"""
+import os
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+import pandas as pd
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0,parentdir)
+from src.transformers.strava_etl import StravaETL
+from tests.fixtures import make_activity
+
+def make_page(page_number: int, size: int) -> list:
+    """Builds a fake page of activities"""
+    return [{'id': page_number * 100 + i, 'name': f'activity {i}'} for i in range(size)]
+
+class TestConcurrentExtract(unittest.TestCase):
+    """
+    Test suite for StravaETL.extract() page fetching
+
+    Tests:
+        test_pages_in_order
+        test_stops_on_short_page
+        test_concurrency_bound
+    """
+    def setUp(self):
+        self.strava_api_connector = MagicMock()
+        self.strava_api_connector.get_header.return_value = {'Authorization': 'Bearer dummy_token'}
+
+    def test_pages_in_order(self):
+        """
+        Pages finishing out of order are still returned in page order.
+        """
+        def get_dataset(actv_per_page, page_number, header, **params):
+            # later pages finish first
+            time.sleep(0.01 * (6 - page_number))
+            return make_page(page_number, actv_per_page)
+
+        self.strava_api_connector.get_dataset.side_effect = get_dataset
+        strava_etl = StravaETL(self.strava_api_connector, 6, 2, [], concurrency=4)
+
+        df = strava_etl.extract()
+
+        expected_ids = [a['id'] for page in range(1, 6) for a in make_page(page, 2)]
+        self.assertEqual(df['id'].tolist(), expected_ids)
+
+    def test_stops_on_short_page(self):
+        """
+        No pages are requested past the first short page.
+        """
+        def get_dataset(actv_per_page, page_number, header, **params):
+            return make_page(page_number, 1 if page_number == 2 else actv_per_page)
+
+        self.strava_api_connector.get_dataset.side_effect = get_dataset
+        strava_etl = StravaETL(self.strava_api_connector, 20, 3, [], concurrency=1)
+
+        df = strava_etl.extract()
+
+        self.assertEqual(len(df), 4)
+        self.assertEqual(self.strava_api_connector.get_dataset.call_count, 2)
+
+    def test_concurrency_bound(self):
+        """
+        Never more than `concurrency` requests are in flight.
+        """
+        lock = threading.Lock()
+        state = {'active': 0, 'peak': 0}
+
+        def get_dataset(actv_per_page, page_number, header, **params):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            time.sleep(0.01)
+            with lock:
+                state['active'] -= 1
+            return make_page(page_number, actv_per_page)
+
+        self.strava_api_connector.get_dataset.side_effect = get_dataset
+        strava_etl = StravaETL(self.strava_api_connector, 11, 2, [], concurrency=3)
+
+        df = strava_etl.extract()
+
+        self.assertEqual(len(df), 20)
+        self.assertLessEqual(state['peak'], 3)
+
+class TestIncrementalExtract(unittest.TestCase):
+    """
+    Test suite for the incremental (watermark) extract in StravaETL.load()
+
+    Tests:
+        test_after_from_watermark
+        test_full_scan_without_watermark
+        test_up_to_date
+        test_generated_freshness_query
+    """
+    def setUp(self):
+        self.strava_api_connector = MagicMock()
+        self.strava_api_connector.get_dataset.return_value = make_page(1, 1)
+        self.bqc = MagicMock()
+        self.bqc.table_exists.return_value = True
+        self.bqc.newest_data.side_effect = lambda df, df_to_compare, date_col_name: df
+        self.strava_etl = StravaETL(self.strava_api_connector, 5, 10, [], incremental=True)
+        self.strava_etl.transform = MagicMock(side_effect=lambda df: df)
+
+    def test_after_from_watermark(self):
+        """The activities endpoint is called with the watermark minus the lookback"""
+        self.bqc.latest_timestamp.return_value = pd.Timestamp('2024-01-02 00:00:00')
+
+        self.strava_etl.load(self.bqc, 'project', 'dataset', 'table', 'sql', 'date')
+
+        expected_after = int(pd.Timestamp('2024-01-01 00:00:00').timestamp())
+        _, kwargs = self.strava_api_connector.get_dataset.call_args
+        self.assertEqual(kwargs['after'], expected_after)
+        self.bqc.append_to_table.assert_called_once()
+
+    def test_full_scan_without_watermark(self):
+        """No watermark falls back to a full scan"""
+        self.bqc.latest_timestamp.return_value = None
+
+        self.strava_etl.load(self.bqc, 'project', 'dataset', 'table', 'sql', 'date')
+
+        _, kwargs = self.strava_api_connector.get_dataset.call_args
+        self.assertIsNone(kwargs['after'])
+
+    def test_up_to_date(self):
+        """An empty incremental extract skips transform and load"""
+        self.bqc.latest_timestamp.return_value = pd.Timestamp('2024-01-02 00:00:00')
+        self.strava_api_connector.get_dataset.return_value = []
+
+        self.assertTrue(self.strava_etl.load(self.bqc, 'project', 'dataset', 'table', 'sql', 'date'))
+
+        self.strava_etl.transform.assert_not_called()
+        self.bqc.append_to_table.assert_not_called()
+
+    def test_generated_freshness_query(self):
+        """Without a sql_query the compare data comes from bqc.freshness_query"""
+        self.bqc.latest_timestamp.return_value = pd.Timestamp('2024-01-02 00:00:00')
+        self.bqc.freshness_query.return_value = 'pruned sql'
+
+        self.strava_etl.load(self.bqc, 'project', 'dataset', 'table', None, 'date')
+
+        self.bqc.freshness_query.assert_called_once_with('project.dataset.table', 'date')
+        self.bqc.query_table.assert_called_once_with('pruned sql', table_id='project.dataset.table')
+
+class TestStreaming(unittest.TestCase):
+    """
+    Test suite for the page-by-page StravaETL.stream()/load()
+
+    Tests:
+        test_stream_matches_batch
+        test_streaming_first_load
+    """
+    def setUp(self):
+        pages = {1: [make_activity(i) for i in (1, 2)], 2: [make_activity(i) for i in (3, 4)], 3: [make_activity(5)]}
+        self.strava_api_connector = MagicMock()
+        self.strava_api_connector.get_dataset.side_effect = \
+            lambda actv_per_page, page_number, header, **params: pages.get(page_number, [])
+        self.cols_to_drop = ['athlete.id', 'map.summary_polyline']
+
+    def test_stream_matches_batch(self):
+        """Streamed chunks concatenate to the batch transform output"""
+        strava_etl = StravaETL(self.strava_api_connector, 10, 2, self.cols_to_drop)
+
+        chunks = list(strava_etl.stream())
+        batch = strava_etl._prepare(strava_etl.transform(strava_etl.extract()))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        streamed = pd.concat(chunks, ignore_index=True)
+        pd.testing.assert_frame_equal(streamed, batch)
+        self.assertIn('map_id', streamed.columns)
+        self.assertNotIn('start_date_local', streamed.columns)
+
+    def test_streaming_first_load(self):
+        """A first streaming load creates the table from page 1 and appends the rest"""
+        bqc = MagicMock()
+        bqc.table_exists.return_value = False
+        strava_etl = StravaETL(self.strava_api_connector, 10, 2, self.cols_to_drop, streaming=True)
+
+        strava_etl.load(bqc, 'project', 'dataset', 'table', 'sql', 'date')
+
+        bqc.upload_table.assert_called_once()
+        self.assertEqual(bqc.append_to_table.call_count, 2)
+        bqc.query_table.assert_not_called()
+
+    def test_merge_load_mode(self):
+        """load_mode='merge' upserts every chunk without the compare query"""
+        bqc = MagicMock()
+        bqc.table_exists.return_value = True
+        bqc.merge_into_table.side_effect = lambda table_id, df: len(df)
+        strava_etl = StravaETL(self.strava_api_connector, 10, 2, self.cols_to_drop,
+                               streaming=True, load_mode='merge')
+
+        strava_etl.load(bqc, 'project', 'dataset', 'table', 'sql', 'date')
+
+        self.assertEqual(bqc.merge_into_table.call_count, 3)
+        bqc.query_table.assert_not_called()
+        bqc.newest_data.assert_not_called()
+        bqc.append_to_table.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
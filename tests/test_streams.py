@@ -0,0 +1,189 @@
+"""
+Streams Tests
+
+Author: Jairus Martinez
+Date: 10/17/2026
+"""
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+import pandas as pd
+import pyarrow.parquet as pq
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0,parentdir)
+from src.commons.state_store import StateStore
+from src.transformers.streams import StreamsExtractor
+from src.transformers.strava_etl import StravaETL
+
+def make_streams(activity_id: int, num_samples: int) -> dict:
+    """Streams of an activity as returned by get_streams (key_by_type=true)"""
+    offsets = list(range(num_samples))
+    return {
+        'time': {'data': offsets, 'series_type': 'distance'},
+        'latlng': {'data': [[45.0 + i / 1000, -122.0 - i / 1000] for i in offsets]},
+        'heartrate': {'data': [120 + activity_id + i for i in offsets]},
+        'moving': {'data': [True] * num_samples},
+    }
+
+class TestStreamsExtractor(unittest.TestCase):
+    """
+    Test suite for StreamsExtractor
+
+    Tests:
+        test_decode
+        test_decode_nulls
+        test_fractional_samples_rounded
+        test_chunks_hold_whole_activities
+        test_rate_budget
+        test_write_partitioned
+        test_load_replaces_chunk
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.connector = MagicMock()
+        self.connector.rate_budget.return_value = None
+        self.connector.get_streams.side_effect = lambda activity_id, header: (
+            None if activity_id == 404 else make_streams(activity_id, activity_id))
+        self.extractor = StreamsExtractor(self.connector, self.tmp_dir.name, concurrency=2, chunk_rows=5)
+        self.activities = pd.DataFrame({'id': [3, 2, 4, 404],
+                                        'date': pd.to_datetime(['2024-02-01T08:00:00Z', '2024-01-31T07:00:00Z',
+                                                                '2024-02-03T09:00:00Z', '2024-02-04T09:00:00Z'])})
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_decode(self):
+        """One row per sample keyed by activity_id/offset, latlng split, missing streams null"""
+        table = self.extractor.decode(7, '2024-02-01T08:00:00Z', make_streams(7, 3))
+
+        self.assertEqual(table.schema, StreamsExtractor.SCHEMA)
+        self.assertEqual(table.column('activity_id').to_pylist(), [7, 7, 7])
+        self.assertEqual(table.column('offset').to_pylist(), [0, 1, 2])
+        self.assertEqual(table.column('activity_date').to_pylist(), [pd.Timestamp('2024-02-01').date()] * 3)
+        self.assertEqual(table.column('lat').to_pylist(), [45.0, 45.001, 45.002])
+        self.assertEqual(table.column('lng').to_pylist(), [-122.0, -122.001, -122.002])
+        self.assertEqual(table.column('heartrate').to_pylist(), [127, 128, 129])
+        self.assertEqual(table.column('watts').null_count, 3)
+        # decoded cols are single contiguous arrays
+        self.assertEqual(table.column('heartrate').num_chunks, 1)
+        self.assertEqual(table.column('heartrate').chunk(0).buffers()[0], None)
+
+    def test_decode_nulls(self):
+        """Null samples keep their nulls, missing activities decode to an empty table"""
+        table = self.extractor.decode(7, '2024-02-01', {'time': {'data': [0, 1, 2]}, 'watts': {'data': [250, None, 260]}})
+        self.assertEqual(table.column('watts').to_pylist(), [250, None, 260])
+        self.assertEqual(table.column('lat').null_count, 3)
+
+        self.assertEqual(self.extractor.decode(404, '2024-02-01', None).num_rows, 0)
+
+    def test_fractional_samples_rounded(self):
+        """Float samples of an integer stream are rounded, not truncated"""
+        streams = {'time': {'data': [0, 1, 2]}, 'watts': {'data': [150.0, 150.7, 149.4]}}
+        with self.assertLogs('src.transformers.streams', level='WARNING'):
+            table = self.extractor.decode(7, '2024-02-01', streams)
+        self.assertEqual(table.column('watts').to_pylist(), [150, 151, 149])
+
+    def test_chunks_hold_whole_activities(self):
+        """Activities are fetched oldest first and chunks close once chunk_rows is reached"""
+        chunks = list(self.extractor.chunks(self.activities, 'date'))
+
+        self.assertEqual([ids for ids, _ in chunks], [[2, 3], [4, 404]])
+        self.assertEqual([table.num_rows for _, table in chunks], [5, 4])
+        self.assertEqual(chunks[0][1].column('activity_id').to_pylist(), [2, 2, 3, 3, 3])
+
+    def test_rate_budget(self):
+        """Never starts more fetches than the remaining daily budget minus the reserve"""
+        self.connector.rate_budget.return_value = {'daily_remaining': 102}
+        chunks = list(self.extractor.chunks(self.activities, 'date'))
+
+        self.assertEqual(sum(len(ids) for ids, _ in chunks), 2)
+        self.assertEqual(self.connector.get_streams.call_count, 2)
+
+    def test_write_partitioned(self):
+        """A chunk spanning two months is written as one file per month, activity_date kept"""
+        _, table = next(self.extractor.chunks(self.activities, 'date'))
+        paths = self.extractor.write(table, 'chunk')
+
+        self.assertEqual([os.path.relpath(path, self.tmp_dir.name) for path in paths],
+                         [os.path.join('activity_month=2024-01', 'chunk.parquet'),
+                          os.path.join('activity_month=2024-02', 'chunk.parquet')])
+        january = pq.read_table(paths[0])
+        self.assertEqual(january.column('activity_id').to_pylist(), [2, 2])
+        self.assertIn('activity_date', january.column_names)
+
+    def test_load_replaces_chunk(self):
+        """Chunks of an existing table delete their activities first, then load file by file"""
+        bqc = MagicMock()
+        bqc.table_exists.return_value = True
+        bqc.load_parquet.side_effect = lambda table_id, path, **kwargs: pq.read_metadata(path).num_rows
+        loaded_ids = []
+
+        loaded = self.extractor.load(bqc, 'project.dataset.streams', self.activities, 'date', on_chunk=lambda ids, table: loaded_ids.append(ids))
+
+        self.assertEqual(loaded, 9)
+        self.assertEqual(loaded_ids, [[2, 3], [4, 404]])
+        first_delete = bqc.delete_rows.call_args_list[0][0]
+        self.assertEqual(first_delete[:4], ('project.dataset.streams', 'activity_id', [2, 3], 'activity_date'))
+        self.assertEqual(str(first_delete[4]), '2024-01-31')
+        self.assertEqual(bqc.load_parquet.call_count, 3)
+        self.assertEqual(bqc.load_parquet.call_args[1], {'partition_field': 'activity_date',
+                                                         'cluster_fields': ['activity_id']})
+
+class TestLoadStreams(unittest.TestCase):
+    """
+    Test suite for StravaETL.load_streams()
+
+    Tests:
+        test_skips_loaded_activities
+        test_skips_empty_activities
+    """
+    def test_skips_loaded_activities(self):
+        """Activities recorded under the streams table are not fetched again"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            state_store = StateStore(os.path.join(tmp_dir, 'state.db'))
+            extractor = MagicMock()
+            extractor.load.side_effect = lambda bqc, table_id, todo, date_col_name, on_chunk: (
+                on_chunk(todo['id'].tolist(), None) or len(todo))
+            strava_etl = StravaETL(MagicMock(), 1, 1, [], state_store=state_store, streams_extractor=extractor)
+            bqc = MagicMock()
+            bqc.read_table.return_value = iter([
+                pd.DataFrame({'id': [1, 2], 'date': pd.to_datetime(['2024-01-02', '2024-01-01'])}),
+                pd.DataFrame({'id': [3], 'date': pd.to_datetime(['2024-01-03'])}),
+            ])
+            state_store.record_load('project.dataset.table_streams', pd.DataFrame({'id': [1], 'date': ['2024-01-02']}),
+                                    'date')
+
+            strava_etl.load_streams(bqc, 'project', 'dataset', 'table', 'table_streams', 'date')
+
+            bqc.read_table.assert_called_once_with('project.dataset.table', columns=['id', 'date'])
+            todo = extractor.load.call_args[0][2]
+            self.assertEqual(todo['id'].tolist(), [2, 3])
+            self.assertEqual(state_store.known_ids('project.dataset.table_streams'), {1, 2, 3})
+
+    def test_skips_empty_activities(self):
+        """Without a state store, activities that had no samples are not fetched again"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            connector = MagicMock()
+            connector.rate_budget.return_value = None
+            connector.get_streams.side_effect = lambda activity_id, header: (
+                None if activity_id == 404 else make_streams(activity_id, 2))
+            extractor = StreamsExtractor(connector, tmp_dir)
+            strava_etl = StravaETL(MagicMock(), 1, 1, [], streams_extractor=extractor)
+            bqc = MagicMock()
+            bqc.table_exists.return_value = False
+            bqc.read_table.side_effect = lambda table_id, columns: iter([
+                pd.DataFrame({'id': [1, 404], 'date': pd.to_datetime(['2024-01-02', '2024-01-01'])})])
+            bqc.load_parquet.side_effect = lambda table_id, path, **kwargs: pq.read_metadata(path).num_rows
+
+            strava_etl.load_streams(bqc, 'project', 'dataset', 'table', 'table_streams', 'date')
+            self.assertEqual(extractor.empty_ids(), {404})
+
+            connector.get_streams.reset_mock()
+            bqc.table_exists.return_value = True
+            bqc.query_table.return_value = pd.DataFrame({'activity_id': [1]})
+            strava_etl.load_streams(bqc, 'project', 'dataset', 'table', 'table_streams', 'date')
+            connector.get_streams.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+Token Cache Tests
+
+Author: Jairus Martinez
+Date: 10/17/2026
+"""
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock
+parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.sys.path.insert(0,parentdir)
+from src.commons.connectors import StravaAPIConnector
+from src.commons.token_cache import TokenCache
+
+NOW = 1_700_000_000
+
+class TestTokenCache(unittest.TestCase):
+    """
+    Test suite for TokenCache
+
+    Tests:
+        test_refresh_stores_token
+        test_fresh_token_reused
+        test_expiring_token_uses_rotated_refresh_token
+        test_concurrent_refresh_exchanges_once
+        test_connector_uses_cache
+    """
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'tokens.db')
+        self.cache = TokenCache(self.path, refresh_margin=300, clock=lambda: NOW)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_refresh_stores_token(self):
+        """A refreshed token is persisted"""
+        exchange = MagicMock(return_value={'access_token': 'a1', 'expires_at': NOW + 3600, 'refresh_token': 'r1'})
+        self.cache.refresh('client', exchange)
+        exchange.assert_called_once_with(None)
+        self.assertEqual(self.cache.get('client'), {'access_token': 'a1', 'expires_at': NOW + 3600, 'refresh_token': 'r1'})
+
+    def test_fresh_token_reused(self):
+        """A token outside the refresh margin is returned without an exchange"""
+        self.cache.refresh('client', lambda _: {'access_token': 'a1', 'expires_at': NOW + 3600, 'refresh_token': 'r1'})
+        exchange = MagicMock()
+        token = self.cache.refresh('client', exchange)
+        exchange.assert_not_called()
+        self.assertEqual(token['access_token'], 'a1')
+
+    def test_expiring_token_uses_rotated_refresh_token(self):
+        """A token inside the refresh margin is exchanged with the cached refresh token"""
+        self.cache.refresh('client', lambda _: {'access_token': 'a1', 'expires_at': NOW + 60, 'refresh_token': 'r1'})
+        exchange = MagicMock(return_value={'access_token': 'a2', 'expires_at': NOW + 3600, 'refresh_token': 'r2'})
+        token = self.cache.refresh('client', exchange)
+        exchange.assert_called_once_with('r1')
+        self.assertEqual(token['access_token'], 'a2')
+
+    def test_concurrent_refresh_exchanges_once(self):
+        """Workers sharing the cache file only exchange the refresh token once"""
+        exchange = MagicMock(return_value={'access_token': 'a1', 'expires_at': NOW + 3600, 'refresh_token': 'r1'})
+
+        def worker():
+            TokenCache(self.path, clock=lambda: NOW).refresh('client', exchange)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        exchange.assert_called_once()
+
+    def test_connector_uses_cache(self):
+        """get_header() reads the cached token instead of calling the token endpoint"""
+        self.cache.refresh('id', lambda _: {'access_token': 'cached', 'expires_at': 4_000_000_000, 'refresh_token': 'r1'})
+        connector = StravaAPIConnector('auth_url', 'activities_url', {'client_id': 'id'},
+                                       token_cache=TokenCache(self.path))
+        connector.session = MagicMock()
+
+        header = connector.get_header()
+
+        connector.session.post.assert_not_called()
+        self.assertEqual(header, {'Authorization': 'Bearer cached'})
+
+if __name__ == '__main__':
+    unittest.main()
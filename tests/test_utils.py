@@ -8,7 +8,9 @@ import os
 parentdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 os.sys.path.insert(0,parentdir) 
 import unittest
-from src.commons.utils import UnitConversion
+import numpy as np
+import pandas as pd
+from src.commons.utils import UnitConversion, ConversionEngine, DtypeOptimizer, ProgressTracker
 
 class TestUnitConversion(unittest.TestCase):
     """
@@ -43,5 +45,139 @@ class TestUnitConversion(unittest.TestCase):
         self.assertAlmostEqual(self.converter.mps_to_mph(5), 11.18)
         self.assertAlmostEqual(self.converter.mps_to_mph(10), 22.37)
 
+class TestConversionEngine(unittest.TestCase):
+    """
+    Test suite for ConversionEngine class.
+
+    Tests:
+        test_matches_unit_conversion
+        test_mixed_precision
+        test_missing_columns_skipped
+        test_unknown_unit
+    """
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n = 1000
+        self.df = pd.DataFrame({
+            'distance': rng.uniform(0, 100000, n),
+            'moving_time': rng.integers(0, 20000, n),
+            'elapsed_time': rng.integers(0, 20000, n),
+            'total_elevation_gain': rng.uniform(0, 2000, n),
+            'average_speed': rng.uniform(0, 15, n),
+            'max_speed': rng.uniform(0, 25, n),
+            'elev_high': np.where(rng.random(n) < 0.1, np.nan, rng.uniform(0, 3000, n)),
+            'elev_low': rng.uniform(0, 3000, n),
+            'name': ['ride'] * n,
+        })
+
+    def test_matches_unit_conversion(self):
+        """Default spec gives the same values as the per-column UnitConversion calls"""
+        uc = UnitConversion()
+        expected = self.df.copy()
+        expected['distance'] = uc.meters_to_miles(expected['distance'])
+        expected['moving_time'] = uc.sec_to_min(expected['moving_time'])
+        expected['elapsed_time'] = uc.sec_to_min(expected['elapsed_time'])
+        expected['total_elevation_gain'] = uc.meters_to_feet(expected['total_elevation_gain'])
+        expected['average_speed'] = uc.mps_to_mph(expected['average_speed'])
+        expected['max_speed'] = uc.mps_to_mph(expected['max_speed'])
+        expected['elev_high'] = uc.meters_to_feet(expected['elev_high'])
+        expected['elev_low'] = uc.meters_to_feet(expected['elev_low'])
+
+        result = ConversionEngine().apply(self.df.copy())
+
+        pd.testing.assert_frame_equal(result, expected)
+
+    def test_mixed_precision(self):
+        """Each column is rounded to its own precision"""
+        spec = [{'column': 'distance', 'unit': 'meters_to_miles', 'precision': 3},
+                {'column': 'max_speed', 'unit': 'mps_to_mph', 'precision': 0},
+                {'column': 'moving_time', 'unit': 'sec_to_min', 'precision': 3}]
+        result = ConversionEngine(spec).apply(self.df.copy())
+
+        np.testing.assert_array_equal(result['distance'], np.round(self.df['distance'] / 1609.344, 3))
+        np.testing.assert_array_equal(result['max_speed'], np.round(self.df['max_speed'] * 2.23694, 0))
+        np.testing.assert_array_equal(result['moving_time'], np.round(self.df['moving_time'] / 60, 3))
+
+    def test_missing_columns_skipped(self):
+        """Spec columns that are not in the frame are ignored"""
+        df = self.df.drop(columns=['elev_high', 'elev_low'])
+        result = ConversionEngine().apply(df.copy())
+        self.assertNotIn('elev_high', result.columns)
+        self.assertAlmostEqual(result['distance'].iloc[0], round(df['distance'].iloc[0] / 1609.344, 2))
+
+    def test_unknown_unit(self):
+        """Unknown units are rejected when the engine is built"""
+        with self.assertRaises(ValueError):
+            ConversionEngine([{'column': 'distance', 'unit': 'furlongs', 'precision': 2}])
+
+class TestDtypeOptimizer(unittest.TestCase):
+    """
+    Test suite for DtypeOptimizer class.
+
+    Tests:
+        test_compact_dtypes
+        test_values_preserved
+        test_downcast_floats
+    """
+    def setUp(self):
+        n = 200
+        self.df = pd.DataFrame({
+            'id': np.arange(10_000_000_000, 10_000_000_000 + n),
+            'time': np.arange(n) % 24,
+            'distance': np.round(np.linspace(0, 50, n), 2),
+            'sport_type': pd.Series(['Ride', 'Run'] * (n // 2), dtype=object),
+            'name': pd.Series([f'activity {i}' for i in range(n)], dtype=object),
+            'commute': pd.Series([True, None] * (n // 2), dtype=object),
+            'start_latlng': pd.Series([[40.0, -75.0]] * n, dtype=object),
+        })
+
+    def test_compact_dtypes(self):
+        """Ints are downcast, strings encoded, nullable bools converted"""
+        result = DtypeOptimizer().optimize(self.df)
+        self.assertEqual(result['id'].dtype, np.int64)
+        self.assertEqual(result['time'].dtype, np.int8)
+        self.assertEqual(result['distance'].dtype, np.float64)
+        self.assertIsInstance(result['sport_type'].dtype, pd.CategoricalDtype)
+        self.assertEqual(result['name'].dtype, pd.StringDtype('pyarrow'))
+        self.assertEqual(result['commute'].dtype, 'boolean')
+        self.assertEqual(result['start_latlng'].dtype, object)
+        self.assertLess(DtypeOptimizer.memory_usage(result), DtypeOptimizer.memory_usage(self.df))
+
+    def test_values_preserved(self):
+        """Optimized frames hold the same values"""
+        result = DtypeOptimizer().optimize(self.df)
+        for col in ['id', 'time', 'distance', 'sport_type', 'name']:
+            self.assertEqual(result[col].tolist(), self.df[col].tolist())
+
+    def test_downcast_floats(self):
+        """Floats are only downcast when asked"""
+        result = DtypeOptimizer(downcast_floats=True).optimize(self.df)
+        self.assertEqual(result['distance'].dtype, np.float32)
+
+class TestProgressTracker(unittest.TestCase):
+    """
+    Test suite for ProgressTracker class.
+
+    Tests:
+        test_eta_from_measured_rate
+        test_no_rate_yet
+    """
+    def test_eta_from_measured_rate(self):
+        """The ETA comes from this run's rate, resumed units only count as progress"""
+        now = [100.0]
+        tracker = ProgressTracker(10, done=4, clock=lambda: now[0])
+        now[0] += 16
+        tracker.update(2, items=60)
+
+        self.assertAlmostEqual(tracker.rate(), 0.125)
+        self.assertAlmostEqual(tracker.eta_seconds(), 32)
+        self.assertEqual(tracker.report(), '6/10 windows (60%), 60 activities, 0.12 windows/s, ETA 0:00:32')
+
+    def test_no_rate_yet(self):
+        """Before the first unit the ETA is unknown"""
+        tracker = ProgressTracker(3, clock=lambda: 0.0)
+        self.assertIsNone(tracker.eta_seconds())
+        self.assertIn('ETA unknown', tracker.report())
+
 if __name__ == '__main__':
     unittest.main()